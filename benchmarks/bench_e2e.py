@@ -0,0 +1,148 @@
+"""端到端压测：本地假 NapCat 灌群消息，bot 核心无界面运行，量入库吞吐、打包群发延迟、内存增长和事件循环卡顿
+
+用法: python -m benchmarks.bench_e2e [消息数] [每秒消息数] [目标群数] [发送延迟秒] [失败率]
+"""
+from benchmarks import sandbox  # noqa: F401  必须在 core 之前导入
+
+import asyncio
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource   # Windows 上没有
+except ImportError:
+    resource = None
+
+from benchmarks.fake_napcat import FakeNapCat
+from core.state import state
+from core.bot import run_bot, ingest
+from core.api import outbox, enqueue_pack, enqueue_forward
+from core.outbox import DONE, FAILED
+from core.metrics import LoopLagMonitor
+
+sandbox.quiet_logger()
+sandbox.isolate_media()
+sandbox.load()
+
+def pct(values, q: float) -> float:
+    if not values: return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def lag_summary(samples) -> dict:
+    return {'loop_lag_p50_ms': pct(samples, 0.5) * 1000, 'loop_lag_p99_ms': pct(samples, 0.99) * 1000,
+            'loop_lag_max_ms': max(samples, default=0) * 1000}
+
+async def wait_until(cond, timeout: float, step: float = 0.01) -> bool:
+    end = time.perf_counter() + timeout
+    while not cond():
+        if time.perf_counter() > end: return False
+        await asyncio.sleep(step)
+    return True
+
+async def _run(messages: int, rate: float, n_groups: int, latency: float, fail_rate: float, pack_size: int) -> dict:
+    # 内容编号从一个很大的数开始，不和同一进程里先跑的微基准撞去重
+    fake = await FakeNapCat(rate=rate, total=messages, groups=(1001,), latency=latency, fail_rate=fail_rate,
+                            offset=900_000_000).start()
+
+    # 无界面跑：关掉会出网/吃 CPU 的可选功能，发送不限速，只量核心链路
+    state.ws_url, state.ws_backup_urls, state.ws_token = fake.url, [], ""
+    state.source_groups = {1001}
+    state.target_groups = set(range(2001, 2001 + n_groups))
+    state.media_cache_enabled = state.phash_enabled = state.auto_pack = False
+    state.send_group_interval = state.send_jitter = 0
+    state.send_concurrency = max(4, n_groups)
+    outbox.max_attempts = 1
+
+    send_latency, send_failed = [], 0
+    prev_on_change = outbox.on_change
+
+    def on_change(job):
+        nonlocal send_failed
+        if job.status == DONE: send_latency.append(time.time() - job.created)
+        elif job.status == FAILED: send_failed += 1
+        prev_on_change(job)
+    outbox.on_change = on_change
+
+    # 和 /metrics 里的卡顿监测是同一个类，压测时每 10ms 醒一次
+    lag = LoopLagMonitor(interval=0.01, keep_samples=True)
+    tracemalloc.start()
+    mem0 = tracemalloc.get_traced_memory()[0]
+    lag.start()
+    ingest.start()
+    outbox.start()
+    state.running = True
+    bot = asyncio.create_task(run_bot())
+
+    # ---- 入库阶段 ----
+    await wait_until(lambda: state.connected, 10)
+    t0 = time.perf_counter()
+    await wait_until(lambda: fake.flood_done.is_set() and ingest.depth() == 0
+                     and ingest.stats['processed'] + ingest.stats['dropped'] >= messages, 120)
+    ingest_s = time.perf_counter() - t0
+    mem_ingest = tracemalloc.get_traced_memory()[0]
+    media, forward = state.queue.count('media'), state.queue.count('forward')
+
+    # ---- 发送阶段：媒体按 pack_size 打包，记录逐条转发 ----
+    t1 = time.perf_counter()
+    n_jobs = 0
+    for kind in ('media', 'forward'):
+        while state.queue.count(kind):
+            batch = state.queue.head(kind, pack_size)
+            enqueue_pack(batch) if kind == 'media' else enqueue_forward(batch)
+            n_jobs += n_groups if kind == 'media' else n_groups * len(batch)
+            state.remove_items([i.id for i in batch])
+    await wait_until(lambda: len(send_latency) + send_failed >= n_jobs, 300)
+    send_s = time.perf_counter() - t1
+    mem_end, mem_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    state.running = False
+    lag.stop()
+    if state.ws is not None: await state.ws.close()
+    try:
+        await asyncio.wait_for(bot, 10)
+    except asyncio.TimeoutError:
+        bot.cancel()
+    await ingest.stop()
+    await outbox.stop()
+    await fake.stop()
+    outbox.on_change = prev_on_change
+
+    return {
+        'messages': messages,
+        'target_groups': n_groups,
+        'fake_latency_ms': latency * 1000,
+        'fake_fail_rate': fail_rate,
+        'ingest_seconds': ingest_s,
+        'ingest_msgs_per_sec': messages / max(ingest_s, 1e-9),
+        'ingest_dropped': ingest.stats['dropped'],
+        'queued_media': media,
+        'queued_forward': forward,
+        'send_jobs': n_jobs,
+        'send_failed': send_failed,
+        'send_seconds': send_s,
+        'send_jobs_per_sec': n_jobs / max(send_s, 1e-9),
+        'send_latency_p50_ms': pct(send_latency, 0.5) * 1000,
+        'send_latency_p99_ms': pct(send_latency, 0.99) * 1000,
+        'mem_growth_ingest_kb': (mem_ingest - mem0) / 1024,
+        'mem_growth_total_kb': (mem_end - mem0) / 1024,
+        'mem_peak_kb': mem_peak / 1024,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else 0.0,
+        **lag_summary(lag.samples),
+    }
+
+def run(messages: int = 2000, rate: float = 2000, n_groups: int = 5, latency: float = 0.02,
+        fail_rate: float = 0.0, pack_size: int = 20) -> dict:
+    return asyncio.run(_run(messages, rate, n_groups, latency, fail_rate, pack_size))
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    res = run(int(args[0]) if len(args) > 0 else 2000,
+              float(args[1]) if len(args) > 1 else 2000,
+              int(args[2]) if len(args) > 2 else 5,
+              float(args[3]) if len(args) > 3 else 0.02,
+              float(args[4]) if len(args) > 4 else 0.0)
+    for k, v in res.items():
+        print(f"{k:24s} {v:.2f}" if isinstance(v, float) else f"{k:24s} {v}")
@@ -0,0 +1,94 @@
+"""待审条目内存/序列化对比：旧版字典条目 vs PendingItem
+
+用法: python -m benchmarks.bench_items [条数]
+"""
+import json
+import sys
+import time
+import tracemalloc
+import uuid
+
+from core.models import PendingItem, ItemType, make_seg
+
+def fake_url(n: int) -> str:
+    return (f"https://multimedia.nt.qq.com.cn/download?appid=1407&fileid=EhQ{n:08d}"
+            f"7f3c9d1a2b4e6f8091a2b3c4d5e6f7a8b9c0d1e2f3a4b5c6d7e8f9a0b1c2d3e4f5&spec=0&rkey=CAQSKAB6JWENi5LM")
+
+# [重构] 从 fake_napcat 挪过来：不依赖 websockets，--no-e2e 时 bench_micro 也能跑
+def make_group_message(n: int, group_id: int, kind: str = 'image') -> dict:
+    if kind == 'video':
+        seg = {"type": "video", "data": {"file": f"video_{n}.mp4", "url": fake_url(n) + "&v=1"}}
+    elif kind == 'forward':
+        seg = {"type": "forward", "data": {"id": f"fwd{n:012d}"}}
+    else:
+        seg = {"type": "image", "data": {"file": f"{n:032x}.image", "url": fake_url(n)}}
+    return {
+        "post_type": "message", "message_type": "group", "sub_type": "normal",
+        "time": int(time.time()), "self_id": 10000, "group_id": group_id, "user_id": 20000 + n % 97,
+        "message_id": 1_000_000 + n, "message": [seg], "raw_message": "", "font": 14,
+    }
+
+def build_legacy(n: int) -> list:
+    # 复刻旧版 process_message_content 产出的字典
+    items = []
+    for i in range(n):
+        url = fake_url(i)
+        items.append({
+            "id": str(uuid.uuid4()),
+            "type": "image",
+            "content": [{"type": "image", "data": {"file": url, "url": url}}],
+            "previews": [{'type': 'image', 'url': url}],
+            "timestamp": time.time(),
+            "selected": False,
+            "raw_msg_id": 1000000 + i,
+        })
+    return items
+
+def build_legacy_restored(n: int) -> list:
+    # 重启后从 reviews.json 读回来的样子：每个 URL 在 content/previews 里各有一份拷贝
+    return json.loads(json.dumps(build_legacy(n)))
+
+def build_slotted(n: int) -> list:
+    return [PendingItem(i + 1, ItemType.IMAGE, (make_seg('image', fake_url(i)),), time.time(), 1000000 + i)
+            for i in range(n)]
+
+def measure(builder, n: int):
+    tracemalloc.start()
+    base = tracemalloc.take_snapshot()
+    items = builder(n)
+    size = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(base, 'filename'))
+    tracemalloc.stop()
+    return items, size
+
+def run(n: int = 10000) -> dict:
+    legacy, legacy_bytes = measure(build_legacy, n)
+    _, restored_bytes = measure(build_legacy_restored, n)
+    slotted, slotted_bytes = measure(build_slotted, n)
+    # URL 本身是必须保留的载荷，单独算出来，剩下的才是数据结构的开销
+    url_bytes = sum(sys.getsizeof(fake_url(i)) for i in range(n))
+
+    # 旧版 save_reviews 的写法：整表 indent=4
+    t = time.perf_counter()
+    json.dumps({'list': legacy}, indent=4, ensure_ascii=False)
+    legacy_ser = time.perf_counter() - t
+    t = time.perf_counter()
+    json.dumps({'rows': [i.to_row() for i in slotted]}, ensure_ascii=False, separators=(',', ':'))
+    slotted_ser = time.perf_counter() - t
+
+    return {
+        'items': n,
+        'legacy_bytes_per_item': legacy_bytes / n,
+        'legacy_restored_bytes_per_item': restored_bytes / n,
+        'slotted_bytes_per_item': slotted_bytes / n,
+        'url_bytes_per_item': url_bytes / n,
+        'memory_ratio': legacy_bytes / max(1, slotted_bytes),
+        'memory_ratio_restored': restored_bytes / max(1, slotted_bytes),
+        'overhead_ratio': (legacy_bytes - url_bytes) / max(1, slotted_bytes - url_bytes),
+        'legacy_serialize_ms': legacy_ser * 1000,
+        'slotted_serialize_ms': slotted_ser * 1000,
+    }
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    for k, v in run(n).items():
+        print(f"{k:32s} {v:.2f}" if isinstance(v, float) else f"{k:32s} {v}")
@@ -0,0 +1,136 @@
+"""热点函数微基准：每项给出每次调用的耗时（微秒），方便前后两次跑对比
+
+用法: python -m benchmarks.bench_micro [每项次数]
+"""
+from benchmarks import sandbox  # noqa: F401  必须在 core 之前导入
+
+import asyncio
+import json
+import sys
+import time
+
+from benchmarks.bench_items import make_group_message
+from benchmarks.bench_payload import build_nodes
+from core.state import state, EventBus
+from core.utils import process_message_content
+from core.dedup import make_digest
+from core.rpc import RequestTable
+from core.metrics import Counter, Histogram
+from core import payload as wire
+from core.profiling import tracer
+
+sandbox.quiet_logger()
+sandbox.isolate_media()
+sandbox.load()
+
+def per_call_us(fn, inputs) -> float:
+    """对每个输入调用一次，取三轮里最快的一轮的平均值"""
+    best = float('inf')
+    for _ in range(3):
+        t = time.perf_counter()
+        for x in inputs: fn(x)
+        best = min(best, time.perf_counter() - t)
+    return best / max(1, len(inputs)) * 1e6
+
+def bench_parse(n: int) -> float:
+    # 收到的原始帧 -> dict
+    frames = [json.dumps(make_group_message(i, 1001)) for i in range(n)]
+    return per_call_us(json.loads, frames)
+
+def bench_process(n: int) -> float:
+    # process_message_content 含去重：每轮用新的 URL，避免全部命中去重提前返回
+    rounds = iter(range(10))
+    def batch():
+        r = next(rounds)
+        return [make_group_message(r * n + i, 1001)['message'] for i in range(n)]
+    best = float('inf')
+    for _ in range(3):
+        chains = batch()
+        t = time.perf_counter()
+        for c in chains: process_message_content(c)
+        best = min(best, time.perf_counter() - t)
+    return best / n * 1e6
+
+def bench_digest(n: int) -> float:
+    # 没有 file 字段时按完整 URL 算摘要（要先规范化，比短 file id 慢得多）
+    idents = [[make_group_message(i, 1001)['message'][0]['data']['url']] for i in range(n)]
+    return per_call_us(make_digest, idents)
+
+def bench_row(n: int) -> float:
+    # 入队写日志时的序列化
+    items = [process_message_content(make_group_message(10_000_000 + i, 1001)['message']) for i in range(n)]
+    items = [i for i in items if i]
+    return per_call_us(lambda it: json.dumps(it.to_row(), ensure_ascii=False, separators=(',', ':')), items)
+
+def bench_queue(n: int) -> float:
+    # add_item + remove_items 一进一出（含日志追加和事件发布）
+    items = [process_message_content(make_group_message(20_000_000 + i, 1001)['message']) for i in range(n)]
+    items = [i for i in items if i]
+    def cycle(item):
+        state.add_item(item)
+        state.remove_items([item.id])
+    return per_call_us(cycle, items)
+
+def bench_encode_pack(n: int) -> float:
+    # 50 个节点的打包消息体编码
+    nodes = build_nodes(50)
+    return per_call_us(lambda _: wire.encode_params({"messages": nodes}), range(max(1, n // 20)))
+
+def bench_rpc(n: int) -> float:
+    async def go():
+        table = RequestTable()
+        t = time.perf_counter()
+        for _ in range(n):
+            echo, fut = table.create('send_group_msg')
+            table.resolve({'echo': echo, 'status': 'ok'})
+        return (time.perf_counter() - t) / n * 1e6
+    return asyncio.run(go())
+
+def bench_publish(n: int) -> float:
+    async def go():
+        bus = EventBus(maxsize=n + 1)
+        for _ in range(3): bus.subscribe()
+        t = time.perf_counter()
+        for i in range(n): bus.publish('item_added', id=i, kind='media')
+        return (time.perf_counter() - t) / n * 1e6
+    return asyncio.run(go())
+
+def bench_histogram(n: int) -> float:
+    h = Histogram('bench_seconds', labels=('stage',))
+    values = [(i % 1000) / 10000 for i in range(n)]
+    return per_call_us(lambda v: h.observe(v, stage='x'), values)
+
+def bench_counter(n: int) -> float:
+    # 读循环里每条来源群消息打一次点
+    c = Counter('bench_total', labels=('group', 'outcome'))
+    return per_call_us(lambda g: c.inc(group=g, outcome='received'), [1001 + i % 3 for i in range(n)])
+
+def bench_span_off(n: int) -> float:
+    # 追踪关着时热点处多出来的开销
+    def f(_):
+        with tracer.span('bench'): pass
+    return per_call_us(f, range(n))
+
+BENCHES = {
+    'json_parse_frame_us': bench_parse,
+    'process_message_us': bench_process,
+    'make_digest_url_us': bench_digest,
+    'item_to_row_json_us': bench_row,
+    'queue_add_remove_us': bench_queue,
+    'encode_pack_50_nodes_us': bench_encode_pack,
+    'rpc_create_resolve_us': bench_rpc,
+    'event_publish_3_subs_us': bench_publish,
+    'histogram_observe_us': bench_histogram,
+    'counter_inc_us': bench_counter,
+    'span_disabled_us': bench_span_off,
+}
+
+def run(n: int = 5000) -> dict:
+    # 去重索引放大一点，跑的过程中不触发淘汰
+    state.dedup.max_entries = max(state.dedup.max_entries, n * 40)
+    return {name: fn(n) for name, fn in BENCHES.items()}
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for k, v in run(count).items():
+        print(f"{k:28s} {v:.2f}")
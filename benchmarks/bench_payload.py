@@ -0,0 +1,67 @@
+"""打包群发的编码开销：旧版每个群 deepcopy + json.dumps vs 预编码一次、每个群只拼 group_id
+
+用法: python -m benchmarks.bench_payload [节点数] [群数]
+"""
+import copy
+import json
+import sys
+import time
+
+from core import payload as wire
+from benchmarks.bench_items import fake_url
+
+def build_nodes(n: int) -> list:
+    nodes = [{"type": "node", "data": {"name": "搬史机器人 Pro", "uin": "10000", "content": "📅 精选"}}]
+    for i in range(n):
+        url = fake_url(i)
+        nodes.append({"type": "node", "data": {"name": "搬史机器人 Pro", "uin": "10000",
+                                               "content": [{"type": "image", "data": {"file": url, "url": url}}]}})
+    return nodes
+
+def legacy_fan_out(nodes: list, groups: list) -> list:
+    # 旧版 execute_merge_forward + api_call 的做法
+    frames = []
+    for n, gid in enumerate(groups):
+        payload = copy.deepcopy(nodes)
+        frames.append(json.dumps({"action": "send_group_forward_msg",
+                                  "params": {"group_id": gid, "messages": payload}, "echo": f"req_{n}"}))
+    return frames
+
+def template_fan_out(nodes: list, groups: list) -> list:
+    body = wire.encode_params({"messages": nodes})
+    return [wire.frame("send_group_forward_msg", wire.splice(body, group_id=gid), f"req_{n}")
+            for n, gid in enumerate(groups)]
+
+def timed(fn, *args, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+def run(n_nodes: int = 50, n_groups: int = 10) -> dict:
+    nodes = build_nodes(n_nodes)
+    groups = [100000000 + g for g in range(n_groups)]
+    # 两种做法发出去的内容必须一致
+    assert [json.loads(f) for f in legacy_fan_out(nodes, groups)] == [json.loads(f) for f in template_fan_out(nodes, groups)]
+
+    legacy = timed(legacy_fan_out, nodes, groups)
+    template = timed(template_fan_out, nodes, groups)
+    return {
+        'nodes': n_nodes,
+        'groups': n_groups,
+        'json_backend': wire.backend(),
+        'frame_bytes': len(template_fan_out(nodes, groups[:1])[0].encode()),
+        'legacy_ms_total': legacy * 1000,
+        'template_ms_total': template * 1000,
+        'legacy_us_per_group': legacy / n_groups * 1e6,
+        'template_us_per_group': template / n_groups * 1e6,
+        'speedup': legacy / max(template, 1e-9),
+    }
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    g = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    for k, v in run(n, g).items():
+        print(f"{k:24s} {v:.2f}" if isinstance(v, float) else f"{k:24s} {v}")
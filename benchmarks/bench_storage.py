@@ -0,0 +1,68 @@
+"""待审条目存储对比：JSON 快照 + 追加日志 vs SQLite (WAL)
+
+量三件事：写入 N 条并落盘、按 20 条一批发走一半再落盘、冷启动读回全部条目
+用法: python -m benchmarks.bench_storage [条数]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_items import build_slotted
+from core.journal import ReviewJournal
+from core.storage import SqliteStore, SqliteReviewJournal
+
+def _open(kind: str, root: str):
+    if kind == 'json':
+        return ReviewJournal(os.path.join(root, 'reviews.json'), os.path.join(root, 'reviews.journal'))
+    return SqliteReviewJournal(SqliteStore(os.path.join(root, 'banshi.db')))
+
+def _load(journal) -> int:
+    # 和 BotState.load_data 一样：快照 + 回放日志
+    rows = {r[0]: r for r in journal.load_snapshot().get('rows', [])}
+    for rec in journal.replay():
+        if rec['op'] == 'add': rows[rec['row'][0]] = rec['row']
+        elif rec['op'] == 'remove':
+            for i in rec['ids']: rows.pop(i, None)
+    return len(rows)
+
+def _disk_bytes(root: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for f in os.listdir(root))
+
+def bench(kind: str, n: int) -> dict:
+    root = tempfile.mkdtemp(prefix=f'banshi-{kind}-')
+    try:
+        rows = [i.to_row() for i in build_slotted(n)]
+        j = _open(kind, root)
+
+        t = time.perf_counter()
+        for r in rows: j.append('add', row=r)
+        j.flush()
+        add_s = time.perf_counter() - t
+
+        # 一次落盘对应写盘线程攒的一个窗口，这里每 20 条一批
+        t = time.perf_counter()
+        for start in range(0, n // 2, 20):
+            j.append('remove', ids=[r[0] for r in rows[start:start + 20]])
+            if j.needs_compaction(): j.compact(lambda: {'version': 3, 'rows': rows[start + 20:]})
+            j.flush()
+        remove_s = time.perf_counter() - t
+        if kind == 'sqlite': j.store.close()
+
+        t = time.perf_counter()
+        loaded = _load(_open(kind, root))
+        load_s = time.perf_counter() - t
+        return {f'{kind}_add_flush_ms': add_s * 1000, f'{kind}_remove_batches_ms': remove_s * 1000,
+                f'{kind}_cold_load_ms': load_s * 1000, f'{kind}_loaded': loaded,
+                f'{kind}_disk_kb': _disk_bytes(root) / 1024}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def run(n: int = 10000) -> dict:
+    return {'items': n, **bench('json', n), **bench('sqlite', n)}
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    for k, v in run(n).items():
+        print(f"{k:28s} {v:.2f}" if isinstance(v, float) else f"{k:28s} {v}")
@@ -0,0 +1,149 @@
+"""本地假 NapCat（OneBot v11 正向 WebSocket）：压测/调试用，不需要真 QQ
+
+- 按设定速率往连上来的客户端灌群消息（图片/视频/合并转发，可以混一定比例的重复）
+- 应答 send_group_forward_msg / send_group_msg / forward_group_single_msg 等发送接口，延迟和失败率可调
+- 定时发 meta_event 心跳；get_group_list / get_group_info / get_stranger_info 返回假数据
+- 记录每个发送请求的到达时间，方便算端到端延迟
+
+用法: python -m benchmarks.fake_napcat [端口] [每秒消息数]
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import websockets
+
+from benchmarks.bench_items import make_group_message
+
+SEND_ACTIONS = ('send_group_forward_msg', 'send_group_msg', 'forward_group_single_msg')
+
+class FakeNapCat:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, groups=(1001,), rate: float = 100.0,
+                 total: Optional[int] = None, dup_ratio: float = 0.0, mix=(('image', 0.8), ('video', 0.1), ('forward', 0.1)),
+                 latency: float = 0.05, latency_jitter: float = 0.0, fail_rate: float = 0.0,
+                 heartbeat: float = 5.0, seed: int = 1, offset: int = 0):
+        self.host = host
+        self.port = port
+        self.groups = list(groups)
+        self.rate = rate
+        self.total = total
+        self.dup_ratio = dup_ratio
+        self.mix = mix
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.fail_rate = fail_rate
+        self.heartbeat = heartbeat
+        self.offset = offset            # 内容编号起点，同一进程里多次压测时避开前一次的去重记录
+        self.rng = random.Random(seed)
+        self.server = None
+        self.clients = set()
+        self.sent_messages = 0
+        self.flood_done = asyncio.Event()
+        self.requests: Dict[str, int] = {}
+        self.send_log: List[dict] = []      # 每条发送请求：{action, group_id, at, ok}
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await websockets.serve(self._handler, self.host, self.port, max_size=None)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    # ---------- 连接 ----------
+    async def _handler(self, ws):
+        self.clients.add(ws)
+        tasks = [asyncio.create_task(self._heartbeat(ws))]
+        if self.rate > 0: tasks.append(asyncio.create_task(self._flood(ws)))
+        try:
+            async for raw in ws:
+                asyncio.create_task(self._answer(ws, json.loads(raw)))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for t in tasks: t.cancel()
+            self.clients.discard(ws)
+
+    async def _heartbeat(self, ws):
+        while True:
+            await ws.send(json.dumps({"post_type": "meta_event", "meta_event_type": "heartbeat", "time": int(time.time()),
+                                      "self_id": 10000, "interval": int(self.heartbeat * 1000),
+                                      "status": {"online": True, "good": True}}))
+            await asyncio.sleep(self.heartbeat)
+
+    def _pick_kind(self) -> str:
+        r, acc = self.rng.random(), 0.0
+        for kind, share in self.mix:
+            acc += share
+            if r < acc: return kind
+        return self.mix[-1][0]
+
+    async def _flood(self, ws):
+        # 按速率灌消息；追不上节奏时一次补发，保证平均速率
+        start = time.perf_counter()
+        n = 0
+        while self.total is None or n < self.total:
+            due = start + n / self.rate
+            wait = due - time.perf_counter()
+            if wait > 0: await asyncio.sleep(wait)
+            uniq = n if n == 0 or self.rng.random() >= self.dup_ratio else self.rng.randrange(n)
+            msg = make_group_message(self.offset + uniq, self.groups[n % len(self.groups)], self._pick_kind())
+            msg['message_id'] = 1_000_000 + n
+            await ws.send(json.dumps(msg))
+            n += 1
+            self.sent_messages += 1
+        self.flood_done.set()
+
+    # ---------- 接口应答 ----------
+    async def _answer(self, ws, req: dict):
+        action = req.get('action', '')
+        params = req.get('params') or {}
+        echo = req.get('echo')
+        self.requests[action] = self.requests.get(action, 0) + 1
+        arrived = time.perf_counter()
+        delay = self.latency + (self.rng.uniform(0, self.latency_jitter) if self.latency_jitter else 0)
+        if delay > 0: await asyncio.sleep(delay)
+
+        if action in SEND_ACTIONS:
+            ok = self.rng.random() >= self.fail_rate
+            self.send_log.append({'action': action, 'group_id': params.get('group_id'), 'at': arrived, 'ok': ok})
+            resp = {"status": "ok", "retcode": 0, "data": {"message_id": self.rng.randrange(1 << 30)}} if ok else \
+                   {"status": "failed", "retcode": 1200, "data": None, "message": "fake failure", "wording": "假装风控"}
+        elif action == 'get_group_list':
+            resp = {"status": "ok", "retcode": 0, "data": [{"group_id": g, "group_name": f"测试群{g}"} for g in self.groups]}
+        elif action == 'get_group_info':
+            gid = params.get('group_id')
+            resp = {"status": "ok", "retcode": 0, "data": {"group_id": gid, "group_name": f"测试群{gid}"}}
+        elif action == 'get_stranger_info':
+            uid = params.get('user_id')
+            resp = {"status": "ok", "retcode": 0, "data": {"user_id": uid, "nickname": f"用户{uid}"}}
+        else:
+            resp = {"status": "ok", "retcode": 0, "data": None}
+        if echo is None: return
+        resp['echo'] = echo
+        try:
+            await ws.send(json.dumps(resp))
+        except websockets.ConnectionClosed:
+            pass
+
+async def _main(port: int, rate: float):
+    fake = await FakeNapCat(port=port, rate=rate).start()
+    print(f"假 NapCat 已启动: {fake.url}  (每秒 {rate} 条群消息，群号 {fake.groups})")
+    await asyncio.Event().wait()
+
+if __name__ == '__main__':
+    p = int(sys.argv[1]) if len(sys.argv) > 1 else 3001
+    r = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    try:
+        asyncio.run(_main(p, r))
+    except KeyboardInterrupt:
+        pass
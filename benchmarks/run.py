@@ -0,0 +1,87 @@
+"""一次跑完所有压测，结果写成 JSON，两次结果可以直接对比
+
+用法:
+    python -m benchmarks.run                      # 全部跑，写到 bench_results/<时间>.json
+    python -m benchmarks.run --quick --out a.json # 小规模快速跑
+    python -m benchmarks.run --compare a.json b.json
+"""
+from benchmarks import sandbox
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=sandbox.ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ''
+
+def run_all(quick: bool = False, skip_e2e: bool = False) -> dict:
+    from benchmarks import bench_micro, bench_items, bench_payload, bench_storage
+    from core import payload as wire
+    results = {
+        'micro': bench_micro.run(1000 if quick else 5000),
+        'items': bench_items.run(2000 if quick else 10000),
+        'payload': bench_payload.run(50, 10),
+        'storage': bench_storage.run(2000 if quick else 10000),
+    }
+    if not skip_e2e:
+        from benchmarks import bench_e2e
+        results['e2e'] = bench_e2e.run(500 if quick else 2000)
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'json_backend': wire.backend(),
+            'quick': quick,
+        },
+        'results': results,
+    }
+
+def flatten(results: dict) -> dict:
+    return {f"{group}.{k}": v for group, values in results.items() for k, v in values.items()
+            if isinstance(v, (int, float)) and not isinstance(v, bool)}
+
+def compare(base_path: str, new_path: str):
+    with open(base_path, 'r', encoding='utf-8') as f: base = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f: new = json.load(f)
+    a, b = flatten(base['results']), flatten(new['results'])
+    print(f"基准 {base['meta'].get('commit')} ({base['meta'].get('time')})  ->  {new['meta'].get('commit')} ({new['meta'].get('time')})")
+    for key in sorted(a.keys() & b.keys()):
+        old, cur = a[key], b[key]
+        change = f"{(cur - old) / old * 100:+.1f}%" if old else "   n/a"
+        print(f"{key:42s} {old:12.2f} {cur:12.2f} {change:>9s}")
+
+def main():
+    ap = argparse.ArgumentParser(description="搬史机器人压测")
+    ap.add_argument('--quick', action='store_true', help="小规模快速跑")
+    ap.add_argument('--no-e2e', action='store_true', help="跳过端到端压测（没装 websockets 时）")
+    ap.add_argument('--out', help="结果 JSON 路径，默认 bench_results/<时间>.json")
+    ap.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="对比两次结果")
+    args = ap.parse_args()
+
+    if args.compare:
+        base, new = (p if os.path.isabs(p) else os.path.join(sandbox.ORIG_CWD, p) for p in args.compare)
+        compare(base, new)
+        return
+
+    data = run_all(args.quick, args.no_e2e)
+    out = args.out or os.path.join(sandbox.ROOT, 'bench_results', time.strftime('%Y%m%d-%H%M%S') + '.json')
+    if not os.path.isabs(out): out = os.path.join(sandbox.ORIG_CWD, out)
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    for key, v in flatten(data['results']).items():
+        print(f"{key:42s} {v:12.2f}" if isinstance(v, float) else f"{key:42s} {v:12d}")
+    print(f"结果已写入 {out}")
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""压测沙箱：core 的读盘由 core.startup.load_all 做，数据文件（config.json / banshi.db 等）按当前目录算
+需要导入 core.state 的压测先 import 这个模块，切到临时目录，不碰真实数据
+按程序目录算绝对路径的（日志、媒体缓存）切目录管不到，导入 core 之后再调 quiet_logger / isolate_media 改指过来，最后 load"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+ORIG_CWD = os.getcwd()
+WORKDIR = tempfile.mkdtemp(prefix="banshi-bench-")
+os.chdir(WORKDIR)
+atexit.register(shutil.rmtree, WORKDIR, True)
+
+def quiet_logger():
+    """日志不刷屏、不写进真实的 logs/ 目录"""
+    from core.utils import logger
+    logger.echo_stdout = False
+    logger.log_dir = WORKDIR
+    logger.path = os.path.join(WORKDIR, os.path.basename(logger.path))
+
+def isolate_media():
+    """媒体缓存和缩略图的目录是按程序目录算的绝对路径，切目录管不到，这里改指到临时目录"""
+    from core.media_cache import media_cache, thumbnails
+    root = os.path.join(WORKDIR, 'media_cache')
+    media_cache.root = root
+    media_cache.files_dir = os.path.join(root, 'files')
+    media_cache.index_path = os.path.join(root, 'index.json')
+    thumbnails.root = os.path.join(root, 'thumbs')
+
+def load():
+    """跟 main() 一样读一遍盘，读的是临时目录；放在 quiet_logger / isolate_media 之后"""
+    from core.startup import load_all
+    load_all()
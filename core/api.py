@@ -1,103 +1,205 @@
 import asyncio
-import json
+import hashlib
 import time
-import random
+from pathlib import Path
 from typing import List, Tuple
-from core.state import state
+from core.state import state, EVENT_JOB_UPDATED
 from core.utils import add_log
-import copy
+from core.rpc import pending_requests, ConnectionLost, NotConnected
+from core.sender import SendScheduler
+from core.persist import persist
+from core.outbox import Outbox, SendJob, DELIVERED, RETRY, UNCERTAIN, PENDING, DONE, FAILED
+from core.jobs import JobManager
+from core import payload as wire
+from core.media_cache import media_cache
+from core.metrics import counter, gauge
+from core.profiling import tracer
+
+async def api_request(action, params, timeout=15) -> dict:
+    """等回包的请求，失败时抛异常而不是返回 None，方便调用方区分“没发出去”和“发了没回音”
+    没连上/发包失败抛 NotConnected；发出去后断线抛 ConnectionLost；超时抛 asyncio.TimeoutError
+    params 可以是字典，也可以是 core.payload 预先编码好的 JSON 字符串"""
+    ws = state.ws
+    if not ws or not state.connected: raise NotConnected("未连接 NapCat")
+
+    # [重构] echo 由请求表按序号分配，断线时在途请求会被立刻作废
+    echo, future = pending_requests.create(action)
+    try:
+        with tracer.span('api.encode'):
+            frame = wire.frame(action, params, echo)
+        await ws.send(frame)
+    except Exception as e:
+        pending_requests.discard(echo, 'error')
+        raise NotConnected(f"发包失败: {e}")
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        pending_requests.discard(echo, 'timeout')
+        raise
+    except asyncio.CancelledError:
+        pending_requests.discard(echo, 'cancelled')
+        raise
 
 async def api_call(action, params, wait=False, timeout=15):
     # 底层API调用，封装了发包和异步等待响应的逻辑
     if not state.ws or not state.connected: return None
     
     if not wait:
-        try: await state.ws.send(json.dumps({"action": action, "params": params}))
+        try: await state.ws.send(wire.frame(action, params))
         except: pass
         return None
 
-    echo = f"req_{int(time.time()*100000)}"
-    future = asyncio.get_running_loop().create_future()
-    state.api_futures[echo] = future
     try:
-        await state.ws.send(json.dumps({"action": action, "params": params, "echo": echo}))
-        return await asyncio.wait_for(future, timeout)
+        return await api_request(action, params, timeout)
+    except ConnectionLost as e:
+        add_log(f"[API] {action} 未完成: {e}")
+    except asyncio.TimeoutError:
+        add_log(f"[API] {action} 请求超时 ({timeout}s)")
     except Exception as e:
-        add_log(f"[API] 请求超时或报错: {e}")
-        if echo in state.api_futures: del state.api_futures[echo]
-        return None
+        add_log(f"[API] 请求报错: {e}")
+    return None
 
-async def fetch_group_info(gid):
-    await api_call("get_group_info", {"group_id": int(gid), "no_cache": True}, wait=False)
 
-async def fetch_user_info(uid):
-    await api_call("get_stranger_info", {"user_id": int(uid), "no_cache": True}, wait=False)
+# [新增] 按目标群限速的并行发送调度
+sender = SendScheduler(state.send_group_interval, state.send_jitter, state.send_concurrency)
 
+def get_sender() -> SendScheduler:
+    # 配置在页面上随时会改，每次发之前同步一下
+    sender.configure(state.send_group_interval, state.send_jitter, state.send_concurrency)
+    return sender
+
+# ---------- 发件箱 ----------
+# [重构] 发送改成先入发件箱、后台 worker 慢慢发：点按钮立刻返回，失败自动退避重试，重启后接着发
+
+def item_key(item) -> str:
+    # 幂等键：条目 id 单调递增不会复用，带上原消息 id 和入库时间是为了不同实例的数据也撞不上
+    raw = f"{item.raw_msg_id}:{item.timestamp!r}:{item.id}".encode()
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+def item_content(item) -> List[dict]:
+    """发送用的消息段；开了“用本地文件发送”就把已缓存的图片/视频换成 file:// 路径，绕开过期链接
+    NapCat 和本程序不在同一台机器（或容器没挂同一个目录）时别开"""
+    content = item.content
+    if not state.media_send_local: return content
+    for seg in content:
+        if seg['type'] not in ('image', 'video'): continue
+        path = media_cache.local_path(seg['data'].get('url'))
+        if path: seg['data']['file'] = Path(path).as_uri()
+    return content
+
+def _batch_id(prefix: str, keys: List[str]) -> str:
+    return f"{prefix}-" + hashlib.blake2b(",".join(keys).encode(), digest_size=8).hexdigest()
+
+def enqueue_pack(items) -> str:
+    """整批打包成一条合并转发，每个目标群一条任务"""
+    if not items or not state.target_groups: return ''
+    batch = _batch_id('pack', [item_key(i) for i in items])
 
-async def execute_merge_forward(content_list: List[List[dict]], msg_ids: List[int]) -> List[int]:
-    # 打包逻辑
-    if not state.target_groups: return []
-    failed_groups = []
-    
     # 策略1：自定义节点克隆
     nodes_l1 = [{"type": "node", "data": {"name": state.app_title, "uin": "10000", "content": f"📅 {time.strftime('%Y-%m-%d')} 精选"}}]
-    for segments in content_list:
-        nodes_l1.append({"type": "node", "data": {"name": state.app_title, "uin": "10000", "content": segments}})
+    for item in items:
+        nodes_l1.append({"type": "node", "data": {"name": state.app_title, "uin": "10000", "content": item_content(item)}})
 
     # 策略2：单纯引用原始ID
-    nodes_l2 = [{"type": "node", "data": {"id": str(mid)}} for mid in msg_ids] if msg_ids else []
+    msg_ids = [i.raw_msg_id for i in items if i.raw_msg_id]
+    nodes_l2 = [{"type": "node", "data": {"id": str(mid)}} for mid in msg_ids]
 
-    for gid in state.target_groups:
-        success = False
-        gid_int = int(gid)
-        
-        try:
-            # 【深拷贝】防止 NapCat 在连续发群时污染原有的文件缓存结构
-            payload_l1 = copy.deepcopy(nodes_l1)
-            res = await api_call("send_group_forward_msg", {"group_id": gid_int, "messages": payload_l1}, wait=True, timeout=90)
-            if res and res.get('status') == 'ok':
-                add_log(f"[Send] 伪造打包发送成功 -> 群{gid}")
-                success = True
-        except Exception as e:
-            add_log(f"[Warn] L1发送失败 ({e})，尝试降级L2")
-        
-        if not success and nodes_l2:
-            try:
-                payload_l2 = copy.deepcopy(nodes_l2)
-                res = await api_call("send_group_forward_msg", {"group_id": gid_int, "messages": payload_l2}, wait=True, timeout=90)
-                if res and res.get('status') == 'ok':
-                    add_log(f"[Send] 引用打包成功 -> 群{gid}")
-                    success = True
-            except Exception as e:
-                add_log(f"[Error] L2也失败了: {e}")
-
-        if not success:
-            failed_groups.append(gid)
-            add_log(f"[Error] 群{gid} 彻底发送失败，状态保留")
-        
-        await asyncio.sleep(2.0) # 防风控休眠
-
-    return failed_groups
-
-async def execute_direct_media_send(segments: List[dict]):
-    # 单条加随机延迟
-    for gid in state.target_groups:
-        try:
-            await api_call("send_group_msg", {"group_id": int(gid), "message": segments})
-            add_log(f"[Send] 直发媒体 -> 群{gid}")
-            await asyncio.sleep(random.uniform(2.0, 3.5)) 
-        except Exception as e:
-            add_log(f"[Error] 直发失败 群{gid}: {e}")
-
-async def execute_single_forward(msg_id):
-    # 原样转发聊天记录
-    for gid in state.target_groups:
+    # [优化] 消息体只编码一次，所有群共用同一个字符串，发的时候只拼 group_id
+    # 以前每个群 deepcopy 一份是怕 NapCat 那边改了共享的节点结构；现在发出去的是定长字符串，没东西能被改
+    with tracer.span('send.encode'):
+        bodies = [wire.encode_params({"messages": nodes_l1})]
+        if nodes_l2: bodies.append(wire.encode_params({"messages": nodes_l2}))
+    ids = [i.id for i in items]
+    jobs = [SendJob(f"{batch}:{gid}", batch, "send_group_forward_msg", int(gid), bodies, items=ids) for gid in state.target_groups]
+    send_jobs.submit(batch, f"打包 {len(items)} 份媒体", jobs)
+    return batch
+
+def enqueue_direct(items) -> str:
+    """逐条直发，同一个群内按顺序"""
+    if not items or not state.target_groups: return ''
+    keys = [item_key(i) for i in items]
+    batch = _batch_id('media', keys)
+    bodies = [wire.encode_params({"message": item_content(item)}) for item in items]
+    jobs = [SendJob(f"media:{k}:{gid}", batch, "send_group_msg", int(gid), [body], items=[item.id])
+            for gid in state.target_groups for k, body, item in zip(keys, bodies, items)]
+    send_jobs.submit(batch, f"直发 {len(items)} 份媒体", jobs)
+    return batch
+
+def enqueue_forward(items) -> str:
+    """原样转发聊天记录"""
+    if not items or not state.target_groups: return ''
+    keys = [item_key(i) for i in items]
+    batch = _batch_id('forward', keys)
+    bodies = [wire.encode_params({"message_id": str(item.raw_msg_id)}) for item in items]
+    jobs = [SendJob(f"forward:{k}:{gid}", batch, "forward_group_single_msg", int(gid), [body], items=[item.id])
+            for gid in state.target_groups for k, body, item in zip(keys, bodies, items)]
+    send_jobs.submit(batch, f"转发 {len(items)} 条记录", jobs)
+    return batch
+
+# [新增] 每次发送尝试按目标群、接口和消息体变体计数；打包的 l1 是伪造节点、l2 是引用原消息 id
+send_attempts = counter('send_attempts_total', "群发尝试次数（按目标群/接口/策略/结果）", ('group', 'action', 'strategy', 'outcome'))
+_STRATEGIES = {"send_group_forward_msg": ('l1_nodes', 'l2_ids')}
+
+def _strategy(action: str, n: int) -> str:
+    names = _STRATEGIES.get(action)
+    return names[n] if names and n < len(names) else 'single'
+
+async def deliver_job(job: SendJob) -> Tuple[str, str]:
+    """worker 调用：按群节奏把一条任务发出去，依次尝试 payload 里的变体"""
+    timeout = 90 if job.action == "send_group_forward_msg" else 30
+    sched = get_sender()
+    error = ''
+    for n, body in enumerate(job.payload):
+        strategy = _strategy(job.action, n)
         try:
-            await api_call("forward_group_single_msg", {"group_id": int(gid), "message_id": str(msg_id)})
-            add_log(f"[Send] 记录转发 -> 群{gid}")
-            await asyncio.sleep(1.0)
-        except Exception as e:
-            add_log(f"[Error] 记录转发失败 群{gid}: {e}")
+            async with sched.slot(job.group_id):
+                res = await api_request(job.action, wire.splice(body, group_id=job.group_id), timeout)
+        except NotConnected as e:
+            send_attempts.inc(group=job.group_id, action=job.action, strategy=strategy, outcome='not_connected')
+            return RETRY, str(e)
+        except ConnectionLost as e:
+            send_attempts.inc(group=job.group_id, action=job.action, strategy=strategy, outcome='disconnected')
+            return UNCERTAIN, f"发出后连接断开: {e}"
+        except asyncio.TimeoutError:
+            send_attempts.inc(group=job.group_id, action=job.action, strategy=strategy, outcome='timeout')
+            return UNCERTAIN, f"{timeout}s 内没等到回包"
+        ok = res.get('status') == 'ok'
+        send_attempts.inc(group=job.group_id, action=job.action, strategy=strategy, outcome='ok' if ok else 'failed')
+        if ok:
+            return DELIVERED, ''
+        error = res.get('wording') or res.get('message') or 'NapCat 返回失败'
+        if n + 1 < len(job.payload):
+            add_log(f"[Warn] 群{job.group_id} 发送失败 ({error})，尝试降级方案")
+    return RETRY, error
+
+_ACTION_NAMES = {"send_group_forward_msg": "打包", "send_group_msg": "直发媒体", "forward_group_single_msg": "记录转发"}
+
+def on_job_change(job: SendJob):
+    send_jobs.on_send_job(job)
+    name = _ACTION_NAMES.get(job.action, job.action)
+    if job.status == DONE:
+        add_log(f"[Send] {name} -> 群{job.group_id}")
+    elif job.status == PENDING:
+        add_log(f"[Warn] {name} -> 群{job.group_id} 第 {job.attempts} 次失败 ({job.error})，稍后重试")
+    elif job.status == FAILED:
+        add_log(f"[Error] {name} -> 群{job.group_id} 彻底失败: {job.error}")
+        hint = ""
+        if job.action == "send_group_forward_msg":
+            hint = "\n这批内容还留在待审区。可能是包里有已过期或不支持的视频/图片，建议分批(每次3-5个)重新打包排查，或者改用【硬发】"
+        state.notify('negative', f"❌ {name}到群{job.group_id}失败：{job.error}{hint}")
+
+outbox = Outbox(deliver_job, ready=lambda: state.connected)
+outbox.on_change = on_job_change
+gauge('outbox_pending_jobs', "发件箱里没发完的任务数（按状态）", ('status',), fn=lambda: outbox.stats()['jobs'])
+outbox.store.on_dirty = lambda: persist.mark_dirty('outbox')
+persist.register('outbox', outbox.store.flush)
+
+# [新增] 每次点击是一个后台任务，页面上看进度、可以取消；任务之间不再互斥
+# 条目要等带着它的消息全发成功才出待审区，失败/取消的留着给人处理
+send_jobs = JobManager(outbox, on_update=lambda j: state.events.publish(EVENT_JOB_UPDATED, id=j.id),
+                       on_sent=state.remove_items)
+# batch 前缀 -> 任务显示名；启动时 core.startup 读完发件箱按它重建没发完的任务
+JOB_LABELS = {'pack': '打包', 'media': '直发', 'forward': '转发'}
 
 async def send_preview_to_reviewer(raw_msg_id) -> Tuple[bool, str]:
     if not state.swordholder_qq:
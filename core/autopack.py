@@ -0,0 +1,273 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+from core.state import (
+    state, Event, EVENT_ITEM_ADDED, EVENT_ITEM_REMOVED, EVENT_QUEUE_CLEARED, EVENT_OVERFLOW, EVENT_JOB_UPDATED
+)
+from core.utils import add_log
+from core.profiling import tracer
+from core.api import enqueue_pack, enqueue_forward, send_jobs, api_call
+
+# 自动打包引擎：像页面一样订阅事件总线，一批事件只评估一次，不再每来一条消息就起一个任务抢锁
+# 触发条件：条数到了当前批量 / 最老一条等太久 / 媒体包估算体积太大
+# 批量大小按最近 20 次打包的成功率自适应：阈值 × 成功率，不低于最小批量
+# 条目发成功了才出待审区（见 core.jobs）；正在发的不会被重复打包，打包失败的那批留给人工处理，不再自动打包
+
+KINDS = ('media', 'forward')
+# 页面上改了自动打包开关/阈值，塞一条进自己的事件队列，马上评估一次
+POKE = Event('autopack_poke', {})
+
+def estimate_bytes(item) -> int:
+    # 合并转发里每个节点的大致体积：URL 在 file/url 里各出现一次，外加节点外壳
+    return 120 + sum(2 * len(seg.url or '') + 40 for seg in item.segments)
+
+class AutoPacker:
+    def __init__(self):
+        self.batch_size: Dict[str, int] = {k: 0 for k in KINDS}   # 0 = 还没初始化，取阈值
+        self._sizes: Dict[int, Tuple[str, int]] = {}
+        self._bytes: Dict[str, int] = {k: 0 for k in KINDS}
+        self._my_jobs: Dict[str, Tuple[str, List[int]]] = {}        # 自己提交的任务 id -> (栏目, 条目 id)
+        self._held: Dict[int, str] = {}                             # 自动打包失败、留给人工处理的条目 id -> 栏目
+        self.outcomes = {k: deque(maxlen=20) for k in KINDS}        # 最近的打包结果 True/False
+        self._skip: Optional[Set[int]] = None                       # 不参与自动打包的条目，有变化才重算
+        self._busy: Dict[str, int] = {k: 0 for k in KINDS}          # 上面那些里各栏目还在队列里的条数
+        self._warn_task: Optional[asyncio.Task] = None
+        self._events: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {'events': 0, 'evaluations': 0, 'packs': 0}
+
+    # ---------- 生命周期 ----------
+    def start(self):
+        if self._task is not None: return
+        self._events = state.events.subscribe()
+        self._resync()
+        self._task = asyncio.create_task(self._run())
+
+    def poke(self):
+        if self._events is None: return
+        try: self._events.put_nowait(POKE)
+        except asyncio.QueueFull: pass
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._events is not None:
+            state.events.unsubscribe(self._events)
+            self._events = None
+
+    async def _run(self):
+        events = self._events
+        # 启动时队列里可能已经攒够了
+        self._evaluate()
+        while True:
+            try:
+                batch = [await asyncio.wait_for(events.get(), self._next_deadline())]
+            except asyncio.TimeoutError:
+                batch = []
+            while not events.empty(): batch.append(events.get_nowait())
+            self._absorb(batch)
+            try:
+                with tracer.span('autopack.evaluate'):
+                    self._evaluate()
+            except Exception as e:
+                add_log(f"[Auto] 自动打包评估出错: {e}")
+
+    # ---------- 计数 ----------
+    def _resync(self):
+        self._sizes.clear()
+        self._bytes = {k: 0 for k in KINDS}
+        self._held = {i: k for i, k in self._held.items() if i in state.queue}
+        self._skip = None
+        skip = self._skipped()
+        for kind in KINDS:
+            for item in state.queue.items(kind):
+                if item.id not in skip: self._track(item)
+
+    def _track(self, item):
+        if item.kind not in self._bytes or item.id in self._sizes: return
+        size = estimate_bytes(item)
+        self._sizes[item.id] = (item.kind, size)
+        self._bytes[item.kind] += size
+
+    def _untrack(self, ids):
+        for item_id in ids:
+            hit = self._sizes.pop(item_id, None)
+            if hit: self._bytes[hit[0]] -= hit[1]
+
+    def _absorb(self, batch):
+        self.stats['events'] += len(batch)
+        for ev in batch:
+            if ev.type in (EVENT_ITEM_REMOVED, EVENT_QUEUE_CLEARED, EVENT_JOB_UPDATED):
+                self._skip = None
+            if ev.type == EVENT_ITEM_ADDED:
+                item = state.queue.get(ev.data['id'])
+                if item is not None: self._track(item)
+            elif ev.type == EVENT_ITEM_REMOVED:
+                self._untrack(ev.data['ids'])
+                for item_id in ev.data['ids']: self._held.pop(item_id, None)
+            elif ev.type == EVENT_QUEUE_CLEARED:
+                self._sizes.clear()
+                self._bytes = {k: 0 for k in KINDS}
+                self._held.clear()
+            elif ev.type == EVENT_OVERFLOW:
+                self._resync()
+            elif ev.type == EVENT_JOB_UPDATED:
+                self._on_job(ev.data['id'])
+
+    # ---------- 自适应批量 ----------
+    def success_rate(self, kind: str) -> float:
+        window = self.outcomes[kind]
+        return sum(window) / len(window) if window else 1.0
+
+    def current_batch(self, kind: str) -> int:
+        limit = max(1, int(state.auto_pack_threshold))
+        size = limit
+        if kind == 'media':
+            # 只有媒体包会因为个别死图整包失败，记录转发一条一条发，不用缩
+            floor = min(limit, max(1, int(state.auto_pack_min_batch)))
+            size = max(floor, round(limit * self.success_rate(kind)))
+        self.batch_size[kind] = size
+        return size
+
+    def _on_job(self, job_id: str):
+        job = send_jobs.jobs.get(job_id)
+        if job is None: return
+        # 手动提交的也一样：发送中的不计入待打包体积，发失败回到待审区的再算回来
+        if not job.finished:
+            self._untrack(job.items)
+            return
+        hit = self._my_jobs.get(job_id)
+        if hit is None:
+            for item_id in job.items:
+                item = state.queue.get(item_id)
+                if item is not None: self._track(item)
+            return
+        del self._my_jobs[job_id]
+        kind, ids = hit
+        ok = not any(job.failed.values())
+        before = self.current_batch(kind)
+        self.outcomes[kind].append(ok)
+        # 发成功的条目已经出库了，还在队列里的就是发失败/被取消的：保留现场，暂停对它们自动打包
+        left = [i for i in ids if i in state.queue]
+        for item_id in left: self._held[item_id] = kind
+        if left:
+            add_log(f"[Auto] 打包遇阻，{len(left)} 条留在待审区等人工处理，不再自动打包")
+        size = self.current_batch(kind)
+        if size < before:
+            add_log(f"[Auto] 最近打包成功率 {self.success_rate(kind):.0%}，批量缩小到 {size}")
+
+    # ---------- 评估 ----------
+    def _skipped(self) -> Set[int]:
+        # 正在发的（自动、手动提交的都算）和留给人工处理的，都不参与自动打包
+        # 只在任务/删除事件之后重算一次，平时直接用缓存
+        if self._skip is None:
+            skip = send_jobs.sending_ids() | self._held.keys()
+            busy = {k: 0 for k in KINDS}
+            for item_id in skip:
+                item = state.queue.get(item_id)
+                if item is not None and item.kind in busy: busy[item.kind] += 1
+            self._skip, self._busy = skip, busy
+        return self._skip
+
+    def _candidates(self, kind: str, n: int) -> list:
+        # 跳过的条目基本都在队头（最老的先发），多取这么多条再滤掉
+        skip = self._skipped()
+        return [i for i in state.queue.head(kind, n + self._busy[kind]) if i.id not in skip][:n]
+
+    def _count(self, kind: str) -> int:
+        self._skipped()
+        return state.queue.count(kind) - self._busy[kind]
+
+    def _oldest_age(self, kind: str, now: float) -> float:
+        head = self._candidates(kind, 1)
+        return now - head[0].timestamp if head else 0.0
+
+    def _trigger(self, kind: str, now: float) -> Optional[str]:
+        count = self._count(kind)
+        if not count: return None
+        if count >= self.current_batch(kind): return 'count'
+        max_age = state.auto_pack_max_age_minutes * 60
+        if max_age > 0 and self._oldest_age(kind, now) >= max_age: return 'age'
+        max_bytes = state.auto_pack_max_mb * 1024 * 1024
+        if kind == 'media' and max_bytes > 0 and self._bytes[kind] >= max_bytes: return 'bytes'
+        return None
+
+    def _next_deadline(self) -> Optional[float]:
+        # 只有开了按时间触发才需要定时醒来，其余全靠事件
+        max_age = state.auto_pack_max_age_minutes * 60
+        if not state.auto_pack or max_age <= 0: return None
+        now = time.time()
+        waits = [max_age - self._oldest_age(k, now) for k in KINDS if self._count(k)]
+        return max(0.5, min(waits)) if waits else None
+
+    def _evaluate(self):
+        self.stats['evaluations'] += 1
+        self._maybe_warn()
+        if not state.auto_pack or state.auto_pack_threshold <= 0 or not state.target_groups: return
+        now = time.time()
+        for kind in KINDS:
+            while True:
+                reason = self._trigger(kind, now)
+                if reason is None: break
+                self._pack(kind, reason)
+                # 按时间/体积触发的每轮只发一包，剩下的等下一轮
+                if reason != 'count': break
+
+    def _maybe_warn(self):
+        # 堆积警告有自己的间隔，没到时间或者上一次还没发完就不起任务
+        if not state.swordholder_qq or state.warn_interval_minutes <= 0: return
+        if time.time() - state.last_warn_time < state.warn_interval_minutes * 60: return
+        if self._warn_task is not None and not self._warn_task.done(): return
+        self._warn_task = asyncio.create_task(check_and_trigger_warnings())
+
+    def _pack(self, kind: str, reason: str):
+        batch = self._candidates(kind, self.current_batch(kind))
+        why = {'count': f"满 {len(batch)} 条", 'age': "最老一条等太久", 'bytes': "包太大"}[reason]
+        if kind == 'media':
+            add_log(f"[Auto] 媒体{why}，全自动打包 {len(batch)} 条进发件箱")
+            job_id = enqueue_pack(batch)
+        else:
+            add_log(f"[Auto] 情报记录{why}，自动转发 {len(batch)} 条进发件箱")
+            job_id = enqueue_forward(batch)
+        ids = [i.id for i in batch]
+        job = send_jobs.jobs.get(job_id)
+        if job is None or job.finished:
+            # 一条都没进发件箱（比如同样的内容已经发过），别在这一轮里反复挑中同一批
+            for item_id in ids: self._held[item_id] = kind
+            add_log(f"[Auto] 这 {len(ids)} 条没能进发件箱，留在待审区等人工处理")
+        else:
+            self._my_jobs[job_id] = (kind, ids)
+        # 条目先留在待审区，发成功了由发送任务删掉；这里只是不再计入待打包的体积
+        self._untrack(ids)
+        self._skip = None
+        self.stats['packs'] += 1
+
+async def check_and_trigger_warnings():
+    """检测堆积并发送私聊警告"""
+    if not state.swordholder_qq or state.warn_interval_minutes <= 0:
+        return
+    if time.time() - state.last_warn_time < state.warn_interval_minutes * 60:
+        return
+
+    media_count = state.queue.count('media')
+    forward_count = state.queue.count('forward')
+
+    msgs = []
+    if media_count >= state.warn_media_count and state.warn_media_count > 0:
+        msgs.append(f"【警告】媒体库已堆积 {media_count} 条，请及时清理防止卡顿裂图！")
+    if forward_count >= state.warn_forward_count and state.warn_forward_count > 0:
+        msgs.append(f"【警告】情报局已堆积 {forward_count} 条，请及时处理！")
+
+    if msgs:
+        state.last_warn_time = time.time()
+        full_msg = "\n".join(msgs)
+        try:
+            # 伪造私聊发送 API
+            await api_call("send_private_msg", {"user_id": int(state.swordholder_qq), "message": full_msg})
+            add_log("[Warn] 已向审核员发送堆积警告")
+        except Exception as e:
+            add_log(f"[Error] 警告发送失败 (请检查审核员QQ设置): {e}")
+
+autopacker = AutoPacker()
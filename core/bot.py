@@ -1,109 +1,106 @@
 import asyncio
 import json
 import time
-import websockets
-from nicegui import ui
 from core.state import state
-from core.utils import add_log, process_message_content, get_avatar_url
-from core.api import fetch_group_info, fetch_user_info, execute_merge_forward, execute_single_forward, api_call
-
-# [新增] 自动打包互斥锁，防止并发发送冲突
-auto_pack_lock = asyncio.Lock()
-
-async def check_and_trigger_auto_pack():
-    """自动化检查与触发器"""
-    if not state.auto_pack or state.auto_pack_threshold <= 0:
-        return
-        
-    async with auto_pack_lock:
-        # 1. 检测媒体库是否达标
-        media_items = [i for i in state.pending_list if i['type'] in ['image', 'video']]
-        while len(media_items) >= state.auto_pack_threshold:
-            state.is_processing = True
-            try:
-                batch = media_items[:state.auto_pack_threshold]
-                add_log(f"[Auto] 媒体满 {state.auto_pack_threshold} 条，全自动打包发车...")
-                pack_list = [i['content'] for i in batch]
-                msg_ids = [i['raw_msg_id'] for i in batch]
-                
-                failed_groups = await execute_merge_forward(pack_list, msg_ids)
-                if not failed_groups:
-                    # 成功后才清理
-                    sent_ids = {i['id'] for i in batch}
-                    state.pending_list = [i for i in state.pending_list if i['id'] not in sent_ids]
-                    state.save_reviews()
-                    state.request_ui_refresh()
-                    add_log("[Auto] 自动打包完毕并出库")
-                else:
-                    add_log("[Auto] 打包遇阻，暂停自动发送并保留现场")
-                    break # 遇到死图导致失败，跳出循环留给人工处理
-            finally:
-                state.is_processing = False
-            # 刷新列表，看看剩下的够不够再次触发
-            media_items = [i for i in state.pending_list if i['type'] in ['image', 'video']]
-
-        # 2. 检测情报局(转发记录)是否达标
-        forward_items = [i for i in state.pending_list if i['type'] == 'forward']
-        while len(forward_items) >= state.auto_pack_threshold:
-            state.is_processing = True
-            try:
-                batch = forward_items[:state.auto_pack_threshold]
-                add_log(f"[Auto] 情报记录满 {state.auto_pack_threshold} 条，自动转发...")
-                for item in batch:
-                    await execute_single_forward(item['raw_msg_id'])
-                
-                sent_ids = {i['id'] for i in batch}
-                state.pending_list = [i for i in state.pending_list if i['id'] not in sent_ids]
-                state.save_reviews()
-                state.request_ui_refresh()
-                add_log("[Auto] 记录自动转发完毕并出库")
-            finally:
-                state.is_processing = False
-            forward_items = [i for i in state.pending_list if i['type'] == 'forward']
-
-async def check_and_trigger_warnings():
-    """检测堆积并发送私聊警告"""
-    if not state.swordholder_qq or state.warn_interval_minutes <= 0:
-        return
-    if time.time() - state.last_warn_time < state.warn_interval_minutes * 60:
-        return
-        
-    media_items = [i for i in state.pending_list if i['type'] in ['image', 'video']]
-    forward_items = [i for i in state.pending_list if i['type'] == 'forward']
-    
-    msgs = []
-    if len(media_items) >= state.warn_media_count and state.warn_media_count > 0:
-        msgs.append(f"【警告】媒体库已堆积 {len(media_items)} 条，请及时清理防止卡顿裂图！")
-    if len(forward_items) >= state.warn_forward_count and state.warn_forward_count > 0:
-        msgs.append(f"【警告】情报局已堆积 {len(forward_items)} 条，请及时处理！")
-        
-    if msgs:
-        state.last_warn_time = time.time()
-        full_msg = "\n".join(msgs)
-        try:
-            # 伪造私聊发送 API
-            await api_call("send_private_msg", {"user_id": int(state.swordholder_qq), "message": full_msg})
-            add_log("[Warn] 已向审核员发送堆积警告")
-        except Exception as e:
-            add_log(f"[Error] 警告发送失败 (请检查审核员QQ设置): {e}")
+from core.utils import add_log, process_message_content, group_messages
+from core.api import outbox
+from core.meta import meta
+from core.connection import conn
+from core.ingest import IngestPipeline, stage_seconds
+from core.rpc import pending_requests
+from core import phash
+from core.models import ItemType
+from core.media_cache import media_cache
+from core.profiling import tracer
+
+# [新增] 感知哈希近似去重，首次用到时才创建进程池
+near_dup_detector = None
+
+def get_near_dup_detector():
+    global near_dup_detector
+    if near_dup_detector is None:
+        near_dup_detector = phash.NearDupDetector(state.phash_distance, state.phash_history)
+    near_dup_detector.radius = state.phash_distance
+    near_dup_detector.index.capacity = state.phash_history
+    return near_dup_detector
+
+def shutdown_workers():
+    if near_dup_detector is not None:
+        near_dup_detector.shutdown()
+
+def commit_item(item, group_id=None):
+    """入库：写队列，前端刷新和自动化检查都由入库事件驱动"""
+    # 自动打包和堆积警告由 core.autopack 订阅入库事件统一处理，这里不再逐条起任务
+    state.add_item(item)
+    add_log(f"[bot] 捕获新数据入库: {item.type.label}")
+    if group_id is not None: group_messages.inc(group=group_id, outcome='ingested')
+    # [新增] 趁链接还没过期，后台把图片/视频拉到本地
+    if state.media_cache_enabled:
+        media_cache.configure(int(state.media_cache_mb * 1024 * 1024), state.media_cache_workers)
+        media_cache.prefetch(item.media_sources)
+
+async def near_dup_stage(item, group_id=None):
+    """入库前的感知哈希检查；在入库流水线的 worker 里 await，指纹在进程池里算，收消息的循环不等它"""
+    urls = item.image_urls
+    try:
+        match = await get_near_dup_detector().check(item.id, urls)
+    except Exception as e:
+        add_log(f"[phash] 指纹计算失败，按普通消息入库: {e}")
+        match = None
+
+    if match:
+        dist, _ = match
+        if state.phash_action == 'drop':
+            add_log(f"[去重] 发现近似重复图片 (距离 {dist})，已丢弃")
+            if group_id is not None: group_messages.inc(group=group_id, outcome='near_dup')
+            return
+        item.near_dup = dist
+        add_log(f"[去重] 发现近似重复图片 (距离 {dist})，已标记")
+    with tracer.span('ingest.commit'):
+        commit_item(item, group_id)
+
+def wants_near_dup(item) -> bool:
+    return state.phash_enabled and phash.available() and item.type in (ItemType.IMAGE, ItemType.MIXED)
+
+async def ingest_event(data: dict):
+    """流水线 worker 里执行：解析消息段、（可选）感知哈希、入库"""
+    gid = data.get('group_id')
+    with tracer.span('ingest.parse'):
+        item = process_message_content(data.get('message', []), gid)
+    if not item: return     # 重复/纯文字的在 process_message_content 里已经计过数
+    item.raw_msg_id = data.get('message_id')
+    if wants_near_dup(item):
+        # 在 worker 里等指纹算完，同时进行的下载/计算个数由 worker 数兜底
+        await near_dup_stage(item, gid)
+    else:
+        with tracer.span('ingest.commit'):
+            commit_item(item, gid)
+
+# [新增] 读循环和入库处理之间的有界队列
+ingest = IngestPipeline(ingest_event, state.ingest_queue_size, state.ingest_workers, state.ingest_policy)
 
 async def run_bot(on_status_change=None):
     def update_status(status_str):
+        # [重构] 状态变化推给所有打开的页面
+        state.set_status(status_str)
         if on_status_change:
             on_status_change(status_str)
 
-    add_log(f"[WS] 正在连接 {state.ws_url} ...")
-    
+    # 丢弃策略随时可改；队列容量和 worker 数下次启动生效
+    ingest.configure(state.ingest_queue_size, state.ingest_workers, state.ingest_policy)
+
     while state.running:
+        # [重构] 连哪个地址、断了等多久、是否还活着，都交给连接管理器
+        url = conn.next_endpoint()
+        add_log(f"[WS] 正在连接 {url} ...")
+        was_open = False
         try:
-            # [新增] 携带 Token 鉴权头
-            headers = {}
-            if state.ws_token:
-                headers["Authorization"] = f"Bearer {state.ws_token}"
-
-            async with websockets.connect(state.ws_url, additional_headers=headers) as websocket:
+            # [新增] 携带 Token 鉴权头（在 conn.open 里）
+            async with conn.open(url) as websocket:
                 state.ws = websocket
                 state.connected = True
+                was_open = True
+                conn.opened(url)
                 
                 if state.disconnect_time > 0:
                     add_log("[WS] 重新连接成功，重置断线计时")
@@ -111,85 +108,59 @@ async def run_bot(on_status_change=None):
                 
                 add_log("[WS] 连接成功")
                 update_status('connected')
+                # [新增] 连上了就让发件箱把积压的任务发出去
+                outbox.wake()
                 
-                if state.swordholder_qq: 
-                    await fetch_user_info(state.swordholder_qq)
-                for gid in state.source_groups.union(state.target_groups):
-                    await fetch_group_info(gid)
-
-                async for message in websocket:
-                    if not state.running: break
-                    data = json.loads(message)
-                    
-                    if 'echo' in data and data['echo'].startswith('req_'):
-                        echo = data['echo']
-                        if echo in state.api_futures:
-                            future = state.api_futures[echo]
-                            if not future.done(): future.set_result(data)
-                            del state.api_futures[echo]
-                        continue
-
-                    resp_data = data.get('data') or {}
-                    if data.get('status') == 'ok':
-                        if 'group_name' in resp_data:
-                            gid = resp_data.get('group_id')
-                            if gid:
-                                state.group_info_cache[gid] = {
-                                    'name': resp_data.get('group_name', str(gid)),
-                                    'avatar': get_avatar_url(gid)
-                                }
-                                state.request_ui_refresh()
-                        
-                        if 'nickname' in resp_data and 'user_id' in resp_data:
-                            uid = resp_data.get('user_id')
-                            if uid == state.swordholder_qq:
-                                state.user_info_cache[uid] = {
-                                    'name': resp_data.get('nickname', str(uid)),
-                                    'avatar': get_avatar_url(uid, is_group=False)
-                                }
-                                state.request_ui_refresh()
-
-                    if data.get('post_type') == 'message' and data.get('message_type') == 'group':
-                        gid = data.get('group_id')
-                        if gid in state.source_groups:
-                            item = process_message_content(data.get('message', []))
-                            if item:
-                                item['raw_msg_id'] = data.get('message_id')
-                                state.pending_list.append(item)
-                                state.save_reviews()
-                                add_log(f"[bot] 捕获新数据入库: {item['type']}")
-                                state.request_ui_refresh()
-                                
-                                # [新增] 每当有新消息入库，触发一次自动化检查
-                                if state.auto_pack:
-                                    asyncio.create_task(check_and_trigger_auto_pack())
-
-                                # [新增] 触发警告检查
-                                asyncio.create_task(check_and_trigger_warnings())
+                # [重构] 群名/审核员信息走带过期时间的缓存，只在后台刷新过期的
+                meta.on_connected()
+
+                # [新增] 看门狗：一段时间收不到任何帧就 ping，ping 不回直接断开重连
+                async with conn.watch(websocket):
+                    async for message in websocket:
+                        if not state.running: break
+                        t = time.perf_counter()
+                        data = json.loads(message)
+                        conn.saw_frame(data)
+
+                        # 接口回包按 echo 交给等它的请求（群/用户信息也在内），不再按字段猜
+                        if 'echo' in data and pending_requests.resolve(data):
+                            stage_seconds.observe(time.perf_counter() - t, stage='read')
+                            continue
+
+                        # [重构] 读循环只做分拣，来源群的消息交给流水线处理，慢了也不耽误回包
+                        if data.get('post_type') == 'message' and data.get('message_type') == 'group':
+                            gid = data.get('group_id')
+                            if gid in state.source_groups:
+                                group_messages.inc(group=gid, outcome='received')
+                                await ingest.submit(data)
+                        stage_seconds.observe(time.perf_counter() - t, stage='read')
 
         except Exception as e:
-            add_log(f"[WS] 失去连接: {e}")
+            add_log(f"[WS] 失去连接: {e}" if was_open else f"[WS] 连不上 {url}: {e}")
             update_status('error')
             
-            # [核心修复] 把直接调用 ui.notify 改成放进信箱
+            # [核心修复] 不直接调用 ui.notify，改成通过事件总线推给页面
             if state.disconnect_time == 0.0:
                 state.disconnect_time = time.time()
-                state.notify_queue.append(('negative', '❌ 警告：已与 NapCat 失去连接！'))
+                state.notify('negative', '❌ 警告：已与 NapCat 失去连接！')
                 
         finally:
             state.connected = False
+            # [新增] 在途请求不等超时，直接判失败
+            dropped = pending_requests.fail_all("与 NapCat 的连接已断开")
+            if dropped: add_log(f"[API] 连接断开，{dropped} 个在途请求已作废")
             
             if state.disconnect_time > 0 and state.auto_clear_minutes > 0:
                 offline_duration = (time.time() - state.disconnect_time) / 60
                 if offline_duration >= state.auto_clear_minutes:
-                    if state.pending_list:
+                    if len(state.queue):
                         add_log(f"[Warn] 断线超过 {state.auto_clear_minutes} 分钟，为防裂图，自动清空待审队列")
-                        state.pending_list.clear()
-                        state.save_reviews()
-                        state.request_ui_refresh()
+                        state.clear_items()
                         state.disconnect_time = time.time() 
 
-            await asyncio.sleep(3) 
+            # [重构] 固定 3 秒改为退避 + 抖动；有备用地址时先快速切过去
+            conn.failed(url, was_open)
+            if state.running: await asyncio.sleep(conn.next_delay())
             
     add_log("[WS] 进程已停止")
 
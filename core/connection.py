@@ -0,0 +1,182 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+import websockets
+from core.state import state
+from core.utils import add_log
+from core.metrics import counter, histogram
+
+# 连接管理：多个 NapCat 地址自动切换、指数退避 + 抖动重连、心跳/ping 探活
+# 以前固定 sleep(3) 重连，半开的连接要等发消息超时（15~90 秒）才发现
+# 现在：一段时间没收到任何帧（NapCat 的 meta_event 心跳也算）就主动 ping，ping 不回立刻断开重连
+# 主地址断了先重连主地址，连不上再依次试备用地址；一整轮都失败才开始退避
+
+PROBE_TIMEOUT = 5.0
+OPEN_TIMEOUT = 10.0
+FAILOVER_DELAY = 0.2    # 同一轮里换下一个地址前的停顿
+
+connects = counter('napcat_ws_connects_total', "连接尝试次数", ('endpoint', 'outcome'))
+reconnect_seconds = histogram('napcat_ws_reconnect_seconds', "从断线到重新连上的耗时",
+                              buckets=(0.5, 1, 2, 5, 10, 30, 60, 120, 300, 900))
+detect_seconds = histogram('napcat_ws_dead_detect_seconds', "连接失活后多久被发现（最后一次收到数据到判死）",
+                           buckets=(1, 2.5, 5, 10, 15, 20, 30, 60, 90))
+ping_seconds = histogram('napcat_ws_ping_seconds', "ping 往返延迟")
+disconnects = counter('napcat_ws_disconnects_total', "连上之后又断开的次数（每次都会触发重连）")
+
+class Backoff:
+    """指数退避，一半固定一半随机，避免多个实例同时重连"""
+    def __init__(self, base: float = 1.0, cap: float = 60.0):
+        self.base = base
+        self.cap = cap
+        self.attempt = 0
+
+    def next(self) -> float:
+        d = min(self.cap, self.base * (2 ** self.attempt))
+        self.attempt += 1
+        return d / 2 + random.uniform(0, d / 2)
+
+    def reset(self):
+        self.attempt = 0
+
+class ConnectionManager:
+    def __init__(self, connect=websockets.connect):
+        self.connect_fn = connect
+        self.backoff = Backoff(1.0, state.ws_reconnect_max)
+        self.index = 0
+        self._round_start = 0
+        self._lost_at: Optional[float] = None
+        self._delay = 0.0
+        self.endpoint: Optional[str] = None
+        self.last_rx = 0.0
+        self.heartbeat_interval: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.qq_online: Optional[bool] = None
+        self.stats = {'connects': 0, 'failovers': 0, 'probes': 0, 'dead': 0}
+
+    # ---------- 地址与重连节奏 ----------
+    def endpoints(self) -> List[str]:
+        urls = [state.ws_url] + [u for u in state.ws_backup_urls if u]
+        return list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+
+    def next_endpoint(self) -> str:
+        urls = self.endpoints()
+        self.index %= len(urls)
+        return urls[self.index]
+
+    def next_delay(self) -> float:
+        return self._delay
+
+    def opened(self, url: str):
+        now = time.monotonic()
+        if self._lost_at is not None:
+            reconnect_seconds.observe(now - self._lost_at)
+            self._lost_at = None
+        if self.index != 0:
+            self.stats['failovers'] += 1
+            add_log(f"[WS] 主地址不可用，已切换到备用地址 {url}")
+        connects.inc(endpoint=url, outcome='ok')
+        self.stats['connects'] += 1
+        self.endpoint = url
+        self.last_rx = now
+        self.heartbeat_interval = None
+        self.qq_online = None
+        self._round_start = self.index
+        self.backoff.reset()
+
+    def failed(self, url: str, was_open: bool):
+        """连接结束（连不上或中途断开）后调用，算好下一次用哪个地址、等多久"""
+        if was_open:
+            self._lost_at = time.monotonic()
+            disconnects.inc()
+        self.endpoint = None
+        self.backoff.cap = max(1.0, state.ws_reconnect_max)
+        if was_open:
+            # 用着好好的断了：先回主地址重连，稍等一下
+            self.index = self._round_start = 0
+            self._delay = self.backoff.next()
+            return
+        connects.inc(endpoint=url, outcome='error')
+        n = len(self.endpoints())
+        self.index = (self.index + 1) % n
+        if self.index == self._round_start:
+            # 所有地址都试过一遍了，开始退避
+            self._delay = self.backoff.next()
+        else:
+            self._delay = FAILOVER_DELAY
+
+    # ---------- 建立连接 ----------
+    def open(self, url: str):
+        headers = {}
+        if state.ws_token:
+            headers["Authorization"] = f"Bearer {state.ws_token}"
+        # 探活自己做，关掉库自带的 keepalive
+        return self.connect_fn(url, additional_headers=headers, open_timeout=OPEN_TIMEOUT, ping_interval=None)
+
+    # ---------- 探活 ----------
+    def saw_frame(self, data: dict):
+        """收到任何一帧都算活着；顺便看一眼 NapCat 的心跳"""
+        self.last_rx = time.monotonic()
+        if data.get('post_type') != 'meta_event': return
+        if data.get('meta_event_type') == 'heartbeat':
+            interval = data.get('interval')
+            if interval: self.heartbeat_interval = interval / 1000
+            # 应用层的活性：连接还在但 QQ 掉线了，心跳里的 online 会变成 false
+            online = (data.get('status') or {}).get('online')
+            if online is None or online == self.qq_online: return
+            was, self.qq_online = self.qq_online, online
+            if not online:
+                add_log("[WS] NapCat 心跳：QQ 不在线（连接还在，但收发不了消息）")
+                state.notify('warning', '⚠️ NapCat 报告 QQ 已离线，请检查机器人账号')
+                state.set_status('error')
+            elif was is False:
+                add_log("[WS] NapCat 心跳：QQ 已恢复在线")
+                state.set_status('connected')
+
+    def probe_after(self) -> float:
+        # 心跳比探活间隔还密的话，错过两次心跳也该探一下了
+        after = max(1.0, state.ws_probe_after)
+        if self.heartbeat_interval: after = min(after, self.heartbeat_interval * 2)
+        return after
+
+    @asynccontextmanager
+    async def watch(self, ws):
+        task = asyncio.create_task(self._watchdog(ws))
+        try:
+            yield
+        finally:
+            task.cancel()
+
+    async def _watchdog(self, ws):
+        while True:
+            await asyncio.sleep(1)
+            if time.monotonic() - self.last_rx < self.probe_after(): continue
+            self.stats['probes'] += 1
+            sent = time.monotonic()
+            try:
+                pong = await ws.ping()
+                await asyncio.wait_for(pong, PROBE_TIMEOUT)
+            except Exception:
+                silent = time.monotonic() - self.last_rx
+                detect_seconds.observe(silent)
+                self.stats['dead'] += 1
+                add_log(f"[WS] {silent:.0f} 秒没有任何回应，ping 也不回，判定连接已失效，主动断开重连")
+                # 半开的连接 close 握手也等不到，直接掐掉底层连接，读循环会马上报错退出
+                ws.transport.abort()
+                return
+            self.latency = time.monotonic() - sent
+            ping_seconds.observe(self.latency)
+            self.last_rx = time.monotonic()
+
+    def summary(self) -> dict:
+        return {
+            'endpoint': self.endpoint,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'heartbeat_interval': self.heartbeat_interval,
+            'qq_online': self.qq_online,
+            'next_delay': round(self._delay, 2),
+            **self.stats,
+        }
+
+conn = ConnectionManager()
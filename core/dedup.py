@@ -0,0 +1,167 @@
+import hashlib
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+# 去重索引：只存规范化媒体标识的定长摘要 (16 字节 blake2b)
+# 内存里是按时间排序的哈希表，O(1) 判重；磁盘上是定长二进制记录的追加文件 dedup.bin
+# 窗口按条数 + 天数双重限制，过期的从头部淘汰，文件膨胀到一定程度由写盘线程重写
+# [新增] 设了 store（core.storage.SqliteStore）就改存进 SQLite 的 dedup 表，内存里的判重不变
+
+_RECORD = struct.Struct('<d16s')   # 时间戳 + 摘要 = 24 字节
+# QQ 图床链接里每次都会变的签名参数，不参与去重
+_VOLATILE_PARAMS = {'rkey', 'term', 'is_origin', 'spec', 'expire', 'sign', 't'}
+
+def normalize_identifier(ident) -> str:
+    ident = str(ident).strip()
+    if ident.startswith(('http://', 'https://')):
+        parts = urlsplit(ident)
+        query = sorted((k, v) for k, v in parse_qsl(parts.query) if k.lower() not in _VOLATILE_PARAMS)
+        return f"{parts.netloc.lower()}{parts.path}?{urlencode(query)}"
+    return ident.lower()
+
+def make_digest(identifiers: Iterable) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for ident in identifiers:
+        h.update(normalize_identifier(ident).encode('utf-8'))
+        h.update(b'\x1f')
+    return h.digest()
+
+class DedupIndex:
+    def __init__(self, path: str, max_entries: int = 200000, window_days: float = 14):
+        self.path = path
+        self.max_entries = max_entries
+        self.window_days = window_days
+        self.on_dirty = None
+        self.store = None
+        self._entries: "OrderedDict[bytes, float]" = OrderedDict()
+        self._pending: List[bytes] = []
+        self._disk_records = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, digest: bytes) -> bool:
+        ts = self._entries.get(digest)
+        return ts is not None and ts >= self._cutoff()
+
+    def _cutoff(self) -> float:
+        if self.window_days <= 0: return 0.0
+        return time.time() - self.window_days * 86400
+
+    def check_and_add(self, digest: bytes, ts: Optional[float] = None) -> bool:
+        """已经见过返回 True；没见过就记下来并返回 False"""
+        if digest in self: return True
+        self.add(digest, ts)
+        return False
+
+    def add(self, digest: bytes, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._entries[digest] = ts
+            self._entries.move_to_end(digest)
+            self._pending.append(_RECORD.pack(ts, digest))
+            self._evict()
+        if self.on_dirty: self.on_dirty()
+
+    def add_legacy(self, key: str):
+        # 旧版存的是各段标识直接拼接的字符串；单段消息（最常见的单图）迁移后仍能命中
+        self.add(make_digest([key]))
+
+    def _evict(self):
+        cutoff = self._cutoff()
+        entries = self._entries
+        while entries:
+            digest, ts = next(iter(entries.items()))
+            if len(entries) > self.max_entries or ts < cutoff:
+                entries.popitem(last=False)
+            else:
+                break
+
+    # ---------- 磁盘 ----------
+    def load(self):
+        if self.store is not None:
+            with self._lock:
+                n = 0
+                for ts, digest in self.store.load_dedup():
+                    self._entries[digest] = ts
+                    n += 1
+                self._evict()
+            self._disk_records = n
+            return
+        self._load_file()
+
+    def import_file(self) -> int:
+        """把旧的 dedup.bin 读进来并全部排队写进 store，迁移用；返回导入条数"""
+        if not os.path.exists(self.path): return 0
+        self._load_file()
+        with self._lock:
+            self._pending = [_RECORD.pack(ts, d) for d, ts in self._entries.items()]
+            n = len(self._pending)
+        if self.on_dirty: self.on_dirty()
+        return n
+
+    def _load_file(self):
+        if not os.path.exists(self.path): return
+        size = _RECORD.size
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        n = len(data) // size
+        if len(data) % size:
+            # 崩溃时末尾写了半条，截掉，否则后面追加的记录会整体错位
+            with open(self.path, 'r+b') as f:
+                f.truncate(n * size)
+        with self._lock:
+            for i in range(n):
+                ts, digest = _RECORD.unpack_from(data, i * size)
+                self._entries[digest] = ts
+                self._entries.move_to_end(digest)
+            self._evict()
+        self._disk_records = n
+
+    def flush(self):
+        # 写盘线程里执行
+        if self.store is not None:
+            self._flush_store()
+            return
+        with self._lock:
+            batch, self._pending = self._pending, []
+            live = len(self._entries)
+            need_rewrite = self._disk_records + len(batch) > 2 * live + 1000
+            snapshot = list(self._entries.items()) if need_rewrite else None
+
+        if snapshot is not None:
+            tmp = self.path + ".tmp"
+            with open(tmp, 'wb') as f:
+                f.write(b''.join(_RECORD.pack(ts, d) for d, ts in snapshot))
+            os.replace(tmp, self.path)
+            self._disk_records = len(snapshot)
+        elif batch:
+            with open(self.path, 'ab') as f:
+                f.write(b''.join(batch))
+            self._disk_records += len(batch)
+
+    def _flush_store(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            live = len(self._entries)
+            # 内存里淘汰过的，隔一阵在库里批量删一次
+            prune = self._disk_records + len(batch) > live + 1000
+        if not batch and not prune: return
+        records = [(d, ts) for ts, d in _RECORD.iter_unpack(b''.join(batch))]
+        try:
+            if prune:
+                self.store.write_dedup(records, self._cutoff(), self.max_entries)
+                self._disk_records = self.store.count_dedup()
+            else:
+                self.store.write_dedup(records)
+                self._disk_records += len(records)
+        except Exception:
+            with self._lock:
+                self._pending[:0] = batch
+            raise
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional
+from core.utils import add_log
+from core.metrics import counter, gauge, histogram
+
+# 收消息流水线：读循环只管解析 JSON、把接口回包立刻交给等它的请求，群消息丢进有界队列
+# 后面几个 worker 慢慢做解析入库 / 感知哈希，处理慢了也不会拖住 echo 回包和 NapCat 的 socket
+# 队列满了按策略处理：
+#   drop_oldest  挤掉最早排队的（默认，QQ 链接本来就会过期，新的更有价值）
+#   drop_newest  丢掉刚来的
+#   block        读循环停下来等（真正的背压，不丢消息，但期间回包也会跟着等）
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+events_total = counter('ingest_events_total', "收消息流水线事件数", ('outcome',))
+stage_seconds = histogram('ingest_stage_seconds', "流水线各阶段耗时", ('stage',),
+                          buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30))
+
+class IngestPipeline:
+    def __init__(self, handle: Callable[[dict], Awaitable[None]], maxsize: int = 1000, workers: int = 4,
+                 policy: str = DROP_OLDEST):
+        self.handle = handle
+        self.maxsize = max(1, int(maxsize))
+        self.workers = max(1, int(workers))
+        self.policy = policy if policy in POLICIES else DROP_OLDEST
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._last_drop_log = 0.0
+        self.stats = {'accepted': 0, 'dropped': 0, 'processed': 0, 'errors': 0, 'max_depth': 0, 'blocked_s': 0.0}
+        gauge('ingest_queue_depth', "收消息队列当前长度", fn=self.depth)
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def configure(self, maxsize=None, workers=None, policy=None):
+        if policy in POLICIES: self.policy = policy
+        # 队列容量和 worker 数只在下次 start 时生效
+        if maxsize: self.maxsize = max(1, int(maxsize))
+        if workers: self.workers = max(1, int(workers))
+
+    # ---------- 生命周期 ----------
+    def start(self):
+        if self._queue is not None: return
+        self._queue = asyncio.Queue(self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        # 关机时把已经排上队的处理完（最多等几秒），剩下的放弃
+        if self._queue is None: return
+        try:
+            await asyncio.wait_for(self._queue.join(), 5)
+        except asyncio.TimeoutError:
+            add_log(f"[Ingest] 关机时还有 {self.depth()} 条消息没处理，已放弃")
+        for t in self._tasks: t.cancel()
+        self._tasks = []
+        self._queue = None
+
+    # ---------- 入队 ----------
+    async def submit(self, event: dict):
+        """读循环调用：drop_* 策略立刻返回，block 策略在队列满时等空位"""
+        if self._queue is None: self.start()
+        q = self._queue
+        item = (event, time.perf_counter())
+        if not q.full():
+            q.put_nowait(item)
+        elif self.policy == BLOCK:
+            t = time.perf_counter()
+            await q.put(item)
+            waited = time.perf_counter() - t
+            self.stats['blocked_s'] += waited
+            stage_seconds.observe(waited, stage='backpressure')
+        elif self.policy == DROP_OLDEST:
+            q.get_nowait()
+            q.task_done()
+            q.put_nowait(item)
+            self._dropped('dropped_oldest')
+        else:
+            self._dropped('dropped_newest')
+            return
+        self.stats['accepted'] += 1
+        events_total.inc(outcome='accepted')
+        if q.qsize() > self.stats['max_depth']: self.stats['max_depth'] = q.qsize()
+
+    def _dropped(self, outcome: str):
+        self.stats['dropped'] += 1
+        events_total.inc(outcome=outcome)
+        now = time.monotonic()
+        if now - self._last_drop_log >= 10:
+            self._last_drop_log = now
+            add_log(f"[Ingest] 处理跟不上，收消息队列已满 ({self.maxsize})，按 {self.policy} 丢弃（累计 {self.stats['dropped']} 条）")
+
+    # ---------- 消费 ----------
+    async def _worker(self):
+        q = self._queue
+        while True:
+            event, enqueued = await q.get()
+            start = time.perf_counter()
+            stage_seconds.observe(start - enqueued, stage='queue')
+            try:
+                await self.handle(event)
+                self.stats['processed'] += 1
+                events_total.inc(outcome='processed')
+            except Exception as e:
+                self.stats['errors'] += 1
+                events_total.inc(outcome='error')
+                add_log(f"[Ingest] 处理消息出错: {e}")
+            finally:
+                stage_seconds.observe(time.perf_counter() - start, stage='process')
+                q.task_done()
+
+    def summary(self) -> dict:
+        return {'depth': self.depth(), 'maxsize': self.maxsize, 'policy': self.policy, **self.stats}
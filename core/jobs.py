@@ -0,0 +1,192 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from core.outbox import Outbox, SendJob, DONE, FAILED
+
+# 发送任务进度：一次点击 = 一个任务（发件箱里的一个 batch），按群统计发完了几条
+# 任务之间互不加锁，各自在发件箱里排队；同一个群的节奏由发送调度控制
+# 进度只存在内存里，重启后从发件箱里剩下的条目重建（已完成的部分不再计入）
+# 待审条目跟着任务走：带着它的每条消息都发成功了才从待审区删掉；失败、取消的留在待审区，不会丢
+
+class Job:
+    __slots__ = ('id', 'label', 'created', 'total', 'done', 'failed', 'cancelled', 'finished_at', 'items', 'kept')
+
+    def __init__(self, job_id: str, label: str):
+        self.id = job_id
+        self.label = label
+        self.created = time.time()
+        self.total: Dict[int, int] = {}
+        self.done: Dict[int, int] = {}
+        self.failed: Dict[int, int] = {}
+        self.cancelled = 0
+        self.finished_at = 0.0
+        self.items: Dict[int, int] = {}   # 条目 id -> 还没发成功的消息数
+        self.kept: Set[int] = set()       # 有消息被取消/丢弃的条目，发完也不删
+
+    def hold(self, sj: SendJob):
+        for i in sj.items: self.items[i] = self.items.get(i, 0) + 1
+
+    def release(self, sj: SendJob, sent: bool) -> List[int]:
+        """一条消息结束（发成功 / 被撤掉），返回可以从待审区删掉的条目"""
+        if not sent: self.kept.update(sj.items)
+        ready = []
+        for i in sj.items:
+            left = self.items.get(i, 0) - 1
+            if left > 0:
+                self.items[i] = left
+                continue
+            self.items.pop(i, None)
+            if i not in self.kept: ready.append(i)
+        return ready
+
+    def add(self, gid: int, n: int = 1):
+        self.total[gid] = self.total.get(gid, 0) + n
+
+    @property
+    def total_count(self) -> int:
+        return sum(self.total.values())
+
+    @property
+    def settled_count(self) -> int:
+        return sum(self.done.values()) + sum(self.failed.values()) + self.cancelled
+
+    @property
+    def finished(self) -> bool:
+        return self.settled_count >= self.total_count
+
+    @property
+    def progress(self) -> float:
+        total = self.total_count
+        return self.settled_count / total if total else 1.0
+
+    def per_group(self) -> List[tuple]:
+        """[(群号, 已发, 失败, 总数), ...]"""
+        return [(gid, self.done.get(gid, 0), self.failed.get(gid, 0), n) for gid, n in self.total.items()]
+
+class JobManager:
+    def __init__(self, outbox: Outbox, on_update: Optional[Callable[[Job], None]] = None,
+                 on_sent: Optional[Callable[[List[int]], None]] = None, keep_finished: int = 20):
+        self.outbox = outbox
+        self.on_update = on_update
+        self.on_sent = on_sent      # 条目都发出去了，交给上层从待审区删掉
+        self.keep_finished = keep_finished
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    def submit(self, job_id: str, label: str, send_jobs: Iterable[SendJob]) -> Job:
+        send_jobs = list(send_jobs)
+        # 发件箱里失败过的同键消息会被重新排队，先记下它原来属于哪个任务
+        prev = {sj.key: old.batch for sj in send_jobs
+                if (old := self.outbox.jobs.get(sj.key)) is not None and old.status == FAILED}
+        accepted = self.outbox.enqueue(send_jobs)
+        job = self.jobs.get(job_id)
+        if job is None:
+            job = self.jobs[job_id] = Job(job_id, label)
+        for sj in accepted:
+            owner = prev.get(sj.key)
+            if owner == job_id:
+                # 同一批再点一次 = 把失败的重新排队
+                job.failed[sj.group_id] -= 1
+                continue
+            if owner is not None: self._move_out(owner, sj)
+            job.add(sj.group_id)
+            job.hold(sj)
+        job.finished_at = 0.0 if not job.finished else time.time()
+        self._changed(job)
+        return job
+
+    def _move_out(self, job_id: str, sj: SendJob):
+        # 失败的消息被别的任务重新发了：从原任务里去掉，原任务的进度不再算它
+        job = self.jobs.get(job_id)
+        if job is None: return
+        gid = sj.group_id
+        job.failed[gid] -= 1
+        job.total[gid] -= 1
+        if not job.total[gid]:
+            del job.total[gid]
+            job.done.pop(gid, None)
+            job.failed.pop(gid, None)
+        for i in sj.items:
+            left = job.items.get(i, 0) - 1
+            if left > 0: job.items[i] = left
+            else: job.items.pop(i, None)
+        if job.finished and not job.finished_at: job.finished_at = time.time()
+        self._changed(job)
+
+    def restore(self, labels: Dict[str, str]):
+        """启动时按发件箱里剩下的条目重建任务，labels 是 batch 前缀 -> 显示名"""
+        for sj in self.outbox.jobs.values():
+            job = self.jobs.get(sj.batch)
+            if job is None:
+                label = labels.get(sj.batch.split('-', 1)[0], sj.batch)
+                job = self.jobs[sj.batch] = Job(sj.batch, label + " (重启前提交)")
+            job.add(sj.group_id)
+            job.hold(sj)
+            if sj.status == FAILED:
+                job.failed[sj.group_id] = job.failed.get(sj.group_id, 0) + 1
+
+    def on_send_job(self, sj: SendJob):
+        # 发件箱每条任务结束（成功/彻底失败）时调用
+        job = self.jobs.get(sj.batch)
+        if job is None: return
+        if sj.status == DONE:
+            job.done[sj.group_id] = job.done.get(sj.group_id, 0) + 1
+            self._sent(job.release(sj, True))
+        elif sj.status == FAILED:
+            job.failed[sj.group_id] = job.failed.get(sj.group_id, 0) + 1
+        else:
+            return
+        if job.finished and not job.finished_at: job.finished_at = time.time()
+        self._changed(job)
+
+    def cancel(self, job_id: str) -> int:
+        """撤掉还没发的部分（含彻底失败的），正在发的那一条管不了；返回撤掉的条数"""
+        job = self.jobs.get(job_id)
+        if job is None: return 0
+        dropped = self.outbox.cancel_batch(job_id)
+        for sj in dropped:
+            if sj.status == FAILED:
+                # 已经算进失败里的，挪到取消
+                job.failed[sj.group_id] -= 1
+            job.cancelled += 1
+            job.release(sj, False)
+        if job.finished and not job.finished_at: job.finished_at = time.time()
+        self._changed(job)
+        return len(dropped)
+
+    def retry(self, job_id: str) -> int:
+        """彻底失败的部分重新排队；返回重新排上的条数"""
+        job = self.jobs.get(job_id)
+        if job is None: return 0
+        rearmed = self.outbox.retry_failed(job_id)
+        for sj in rearmed:
+            job.failed[sj.group_id] -= 1
+        if rearmed:
+            job.finished_at = 0.0
+            self._changed(job)
+        return len(rearmed)
+
+    def sending_ids(self) -> Set[int]:
+        """还在发的任务里带着的条目，页面上标成发送中、不让再勾"""
+        ids = set()
+        for j in self.active(): ids.update(j.items)
+        return ids
+
+    def active(self) -> List[Job]:
+        return [j for j in self.jobs.values() if not j.finished]
+
+    def recent(self) -> List[Job]:
+        return list(reversed(self.jobs.values()))
+
+    def _sent(self, ids: List[int]):
+        if ids and self.on_sent: self.on_sent(ids)
+
+    def _changed(self, job: Job):
+        self._prune()
+        if self.on_update: self.on_update(job)
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j.finished]
+        for j in finished[:max(0, len(finished) - self.keep_finished)]:
+            # 挤出列表的任务，发件箱里剩下的失败消息也一起丢掉，不然没人能再处理，会一直留在 outbox 文件里
+            if any(j.failed.values()): self.outbox.cancel_batch(j.id)
+            del self.jobs[j.id]
@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+from typing import Callable, Iterator, Optional
+
+# 追加式日志：reviews.json 只作为快照，平时每条变更只往 reviews.journal 末尾追加一行
+# 记录格式: {"op": "add|remove|select|clear", ...}  (旧版还有 dedup，回放时迁移)
+# 调用方只负责把记录编码进内存缓冲，flush() 由写盘线程调用，真正的 IO 不在事件循环里
+# 日志条数超过阈值后，在缓冲里插一个快照标记，写盘线程写到这里时顺便压缩
+
+class ReviewJournal:
+    def __init__(self, snapshot_path: str, journal_path: str, compact_threshold: int = 1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compacting_path = journal_path + ".compacting"
+        self.compact_threshold = compact_threshold
+        self.records = 0
+        self.on_dirty: Optional[Callable[[], None]] = None
+        self._fh = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    # ---------- 读 ----------
+    def load_snapshot(self) -> dict:
+        if not os.path.exists(self.snapshot_path):
+            return {}
+        with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def replay(self) -> Iterator[dict]:
+        # 先回放上次没压缩完的残留日志，再回放当前日志
+        for path in (self.compacting_path, self.journal_path):
+            if not os.path.exists(path): continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line: continue
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        # 崩溃时写了半行，后面的都不可信了
+                        break
+                    if path == self.journal_path: self.records += 1
+                    yield rec
+
+    # ---------- 写（调用方线程） ----------
+    def append(self, op: str, **fields):
+        fields['op'] = op
+        line = json.dumps(fields, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._buffer.append(line)
+        self.records += 1
+        self._notify()
+
+    def needs_compaction(self) -> bool:
+        return self.records >= self.compact_threshold
+
+    def compact(self, make_snapshot: Callable[[], dict]):
+        """make_snapshot 在调用线程执行，只做浅拷贝；序列化留给写盘线程"""
+        data = make_snapshot()
+        with self._lock:
+            self._buffer.append(data)
+        self.records = 0
+        self._notify()
+
+    def _notify(self):
+        if self.on_dirty: self.on_dirty()
+
+    # ---------- 落盘（写盘线程） ----------
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            lines = []
+            for entry in batch:
+                if isinstance(entry, str):
+                    lines.append(entry)
+                    continue
+                # 快照标记：先把前面的记录写完，再切日志、写快照
+                self._write_lines(lines)
+                lines = []
+                self._write_snapshot(entry)
+            self._write_lines(lines)
+
+    def _write_lines(self, lines):
+        if not lines: return
+        if self._fh is None:
+            self._fh = open(self.journal_path, 'a', encoding='utf-8')
+        self._fh.write("\n".join(lines) + "\n")
+        self._fh.flush()
+
+    def _write_snapshot(self, data: dict):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        # 当前日志改名为 .compacting，快照写成功后再删掉；中途崩溃时启动会回放它
+        if os.path.exists(self.journal_path):
+            if os.path.exists(self.compacting_path):
+                with open(self.compacting_path, 'a', encoding='utf-8') as dst, \
+                     open(self.journal_path, 'r', encoding='utf-8') as src:
+                    dst.write(src.read())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.compacting_path)
+
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, self.snapshot_path)
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+
+    def close(self):
+        self.flush()
+        with self._write_lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+from core.persist import persist
+
+# 日志子系统：内存环形缓冲 + 批量落盘 + 按大小/按天轮转 + 可选 JSON Lines
+# 调用方只做字符串拼接和入队，文件 IO 在写盘线程，推送给前端在下一轮事件循环
+
+_TAG_RE = re.compile(r'^\[([^\]]+)\]')
+_ERROR_TAGS = {'error', '错误'}
+_WARN_TAGS = {'warn', 'warning', '警告'}
+
+class BotLogger:
+    def __init__(self, log_dir: str, filename: str = "bot_run.log", ring_size: int = 500):
+        self.log_dir = log_dir
+        self.path = os.path.join(log_dir, filename)
+        self.ring = deque(maxlen=ring_size)   # 最近的日志，新打开的页面可以直接回填
+        self.subscribers: List[Callable[[str], None]] = []
+
+        # 可由配置覆盖
+        self.max_bytes = 5 * 1024 * 1024
+        self.backup_count = 5
+        self.rotate_daily = False
+        self.json_lines = False
+        self.echo_stdout = True
+
+        self._pending: List[dict] = []
+        self._lock = threading.Lock()
+        self._fh = None
+        self._size = 0
+        self._day = time.strftime('%Y-%m-%d')
+        self._fanout: List[str] = []
+        self._fanout_scheduled = False
+
+    def configure(self, max_bytes=None, backup_count=None, rotate_daily=None, json_lines=None):
+        if max_bytes is not None: self.max_bytes = max_bytes
+        if backup_count is not None: self.backup_count = backup_count
+        if rotate_daily is not None: self.rotate_daily = rotate_daily
+        if json_lines is not None: self.json_lines = json_lines
+
+    # ---------- 调用方 ----------
+    def log(self, msg: str):
+        now = time.time()
+        full_msg = f"[{time.strftime('%H:%M:%S', time.localtime(now))}] {msg}"
+        if self.echo_stdout: print(full_msg)
+        self.ring.append(full_msg)
+
+        with self._lock:
+            self._pending.append({'ts': now, 'msg': msg})
+        persist.mark_dirty('log')
+
+        if self.subscribers:
+            self._fanout.append(full_msg)
+            self._schedule_fanout()
+
+    def recent(self, n: Optional[int] = None) -> List[str]:
+        items = list(self.ring)
+        return items if n is None else items[-n:]
+
+    def subscribe(self, fn: Callable[[str], None]):
+        if fn not in self.subscribers:
+            self.subscribers.append(fn)
+
+    def unsubscribe(self, fn: Callable[[str], None]):
+        try: self.subscribers.remove(fn)
+        except ValueError: pass
+
+    def _schedule_fanout(self):
+        if self._fanout_scheduled: return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环里（比如启动阶段），就地推送
+            self._drain_fanout()
+            return
+        self._fanout_scheduled = True
+        loop.call_soon(self._drain_fanout)
+
+    def _drain_fanout(self):
+        self._fanout_scheduled = False
+        lines, self._fanout = self._fanout, []
+        for sub in list(self.subscribers):
+            for line in lines:
+                try: sub(line)
+                except: pass
+
+    # ---------- 写盘线程 ----------
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch: return
+        chunks = []
+        for rec in batch:
+            if self.json_lines:
+                chunks.append(json.dumps(self._to_record(rec), ensure_ascii=False) + "\n")
+            else:
+                stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(rec['ts']))
+                chunks.append(f"[{stamp}] {rec['msg']}\n")
+        data = "".join(chunks)
+        self._maybe_rotate(len(data.encode('utf-8')))
+        if self._fh is None: self._open()
+        self._fh.write(data)
+        self._fh.flush()
+        self._size += len(data.encode('utf-8'))
+
+    def _to_record(self, rec: dict) -> dict:
+        msg = rec['msg']
+        m = _TAG_RE.match(msg)
+        tag = m.group(1) if m else ''
+        level = 'info'
+        if tag.lower() in _ERROR_TAGS: level = 'error'
+        elif tag.lower() in _WARN_TAGS: level = 'warning'
+        return {'ts': round(rec['ts'], 3), 'level': level, 'tag': tag, 'msg': msg}
+
+    def _open(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._fh = open(self.path, "a", encoding="utf-8")
+        self._size = self._fh.tell()
+
+    def _maybe_rotate(self, incoming: int):
+        today = time.strftime('%Y-%m-%d')
+        if self.rotate_daily and today != self._day:
+            self._close()
+            if os.path.exists(self.path):
+                os.replace(self.path, f"{self.path}.{self._day}")
+            self._day = today
+            self._prune_daily()
+            return
+        self._day = today
+        if self.max_bytes <= 0: return
+        if self._fh is None and os.path.exists(self.path):
+            self._size = os.path.getsize(self.path)
+        if self._size + incoming <= self.max_bytes: return
+
+        # 按大小轮转：bot_run.log -> .1 -> .2 ... 超出 backup_count 的丢掉
+        self._close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src): os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0 and os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.1")
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        self._size = 0
+
+    def _prune_daily(self):
+        # [新增] 按天轮转的 bot_run.log.YYYY-MM-DD 也只留最近 backup_count 份，日期名字典序就是时间序
+        base = os.path.basename(self.path)
+        pat = re.compile(re.escape(base) + r'\.\d{4}-\d{2}-\d{2}$')
+        try:
+            olds = sorted(f for f in os.listdir(self.log_dir) if pat.match(f))
+        except OSError:
+            return
+        for f in olds[:max(0, len(olds) - max(self.backup_count, 0))]:
+            try: os.remove(os.path.join(self.log_dir, f))
+            except OSError: pass
+
+    def _close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
@@ -0,0 +1,315 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from typing import Callable, Dict, List, Optional, Tuple
+from core.dedup import normalize_identifier
+from core.persist import persist
+from core.state import state, EVENT_THUMB_READY
+from core.thumbs import ThumbnailService
+from core.utils import BASE_DIR
+
+# 本地媒体缓存：入库时就把图片/视频拉到本地，QQ 链接过期后照样能看、能发
+# 文件按内容的 sha256 存（同一张图不同链接只存一份），索引是 规范化链接 -> 摘要
+# 总量超过预算时按最近访问时间淘汰；索引由写盘线程落到 index.json
+# 静态路由只挂 files/ 子目录，索引和下载中的临时文件不对外
+# 下载走线程池里的 urllib，并发数有上限；fetch 可以换成别的实现，方便拿本地 HTTP 服务测试
+
+MAX_FILE_BYTES = 100 * 1024 * 1024
+CHUNK = 64 * 1024
+_EXTS = {
+    'image/jpeg': '.jpg', 'image/png': '.png', 'image/gif': '.gif', 'image/webp': '.webp',
+    'image/bmp': '.bmp', 'video/mp4': '.mp4', 'video/quicktime': '.mov', 'video/webm': '.webm',
+}
+_KNOWN_EXTS = set(_EXTS.values())
+
+def _ext_from_name(name: Optional[str]) -> str:
+    # [新增] Content-Type 不靠谱（application/octet-stream）时按链接路径/文件名的后缀猜
+    if not name: return ''
+    ext = os.path.splitext(urlsplit(name).path)[1].lower()
+    if ext == '.jpeg': ext = '.jpg'
+    return ext if ext in _KNOWN_EXTS else ''
+
+def _sniff_ext(head: bytes) -> str:
+    # 再不行看文件头
+    if head[:3] == b'\xff\xd8\xff': return '.jpg'
+    if head[:8] == b'\x89PNG\r\n\x1a\n': return '.png'
+    if head[:6] in (b'GIF87a', b'GIF89a'): return '.gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP': return '.webp'
+    if head[:2] == b'BM': return '.bmp'
+    if head[4:8] == b'ftyp': return '.mov' if head[8:10] == b'qt' else '.mp4'
+    if head[:4] == b'\x1a\x45\xdf\xa3': return '.webm'
+    return ''
+
+def http_fetch(url: str, dest: str, timeout: float = 30, max_bytes: int = MAX_FILE_BYTES) -> Tuple[str, int, str]:
+    """下载到 dest，边下边算 sha256；返回 (摘要, 字节数, 扩展名)"""
+    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    h = hashlib.sha256()
+    size = 0
+    head = b''
+    with urllib.request.urlopen(req, timeout=timeout) as resp, open(dest, 'wb') as f:
+        ctype = (resp.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        while True:
+            chunk = resp.read(CHUNK)
+            if not chunk: break
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError("文件太大，不缓存")
+            if not head: head = chunk[:16]
+            h.update(chunk)
+            f.write(chunk)
+    return h.hexdigest(), size, _EXTS.get(ctype) or _sniff_ext(head) or _ext_from_name(url)
+
+class _Entry:
+    __slots__ = ('digest', 'ext', 'size', 'atime')
+
+    def __init__(self, digest: str, ext: str, size: int, atime: float):
+        self.digest = digest
+        self.ext = ext
+        self.size = size
+        self.atime = atime
+
+    @property
+    def name(self) -> str:
+        return f"{self.digest[:2]}/{self.digest}{self.ext}"
+
+class MediaCache:
+    def __init__(self, root: str, budget_bytes: int = 1024 * 1024 * 1024, workers: int = 4,
+                 fetch: Callable[[str, str], Tuple[str, int, str]] = http_fetch, url_prefix: str = '/media'):
+        self.root = root
+        self.budget_bytes = budget_bytes
+        self.workers = workers
+        self.fetch = fetch
+        self.url_prefix = url_prefix
+        self.files_dir = os.path.join(root, 'files')
+        self.index_path = os.path.join(root, 'index.json')
+        self.on_dirty: Optional[Callable[[], None]] = None
+        # 新文件落盘 / 文件被删时的回调（缩略图跟着做、跟着删）
+        self.on_stored: Optional[Callable[[str, _Entry, str], None]] = None
+        self.on_removed: Optional[Callable[[_Entry], None]] = None
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()   # 按访问时间从旧到新
+        self._refs: Dict[str, int] = {}                              # 摘要 -> 引用它的链接数
+        self._sizes: Dict[str, int] = {}
+        self._by_digest: Dict[str, _Entry] = {}                     # [优化] 摘要 -> 条目，按摘要找文件不用扫一遍
+        self.total_bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._queued: "OrderedDict[str, Tuple[str, Optional[str]]]" = OrderedDict()   # 等着预取的 链接键 -> (链接, 文件名)
+        self._pumps = 0
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'downloads': 0, 'failures': 0, 'evicted': 0}
+
+    # ---------- 查询 ----------
+    @staticmethod
+    def key(url: str) -> str:
+        return normalize_identifier(url)
+
+    def __contains__(self, url) -> bool:
+        return bool(url) and self.key(url) in self._entries
+
+    def peek(self, url: str) -> Optional[_Entry]:
+        """只查不算访问，不影响淘汰顺序"""
+        return self._entries.get(self.key(url)) if url else None
+
+    def file_path(self, e: _Entry) -> str:
+        return os.path.abspath(os.path.join(self.files_dir, e.name))
+
+    def _get(self, url: str) -> Optional[_Entry]:
+        if not url: return None
+        k = self.key(url)
+        e = self._entries.get(k)
+        if e is None: return None
+        with self._lock:
+            e.atime = time.time()
+            self._entries.move_to_end(k)
+        # [优化] 只是访问不标脏，访问时间跟着下一次增删一起落盘，不然每渲染一张图就重写一遍 index.json
+        return e
+
+    def local_path(self, url: str) -> Optional[str]:
+        e = self._get(url)
+        return self.file_path(e) if e else None
+
+    def public_url(self, url: str) -> Optional[str]:
+        """静态路由下的地址，浏览器从这里取，不再直连腾讯图床"""
+        e = self._get(url)
+        return f"{self.url_prefix}/{e.name}" if e else None
+
+    def path_for_digest(self, digest: str) -> Optional[str]:
+        e = self._by_digest.get(digest)
+        return os.path.join(self.files_dir, e.name) if e else None
+
+    # ---------- 下载 ----------
+    def prefetch(self, sources: List[Tuple[str, Optional[str]]]):
+        """入库时调用，后台下载，不等结果。sources 是 (链接, 文件名)，文件名用来猜扩展名"""
+        # [优化] 先排队，最多起 workers 个任务慢慢取，刷屏时不会一条链接一个任务
+        for url, name in sources:
+            if not url: continue
+            k = self.key(url)
+            if k in self._entries or k in self._inflight or k in self._queued: continue
+            self._queued[k] = (url, name)
+        while self._queued and self._pumps < max(1, self.workers):
+            self._pumps += 1
+            asyncio.create_task(self._pump())
+
+    async def _pump(self):
+        try:
+            while self._queued:
+                _, (url, name) = self._queued.popitem(last=False)
+                await self.ensure(url, name)
+        finally:
+            self._pumps -= 1
+
+    async def ensure(self, url: str, name: Optional[str] = None) -> Optional[str]:
+        """保证某个链接在本地，返回本地路径；失败返回 None。同一个链接同时只下一次"""
+        path = self.local_path(url)
+        if path:
+            self.stats['hits'] += 1
+            return path
+        k = self.key(url)
+        fut = self._inflight.get(k)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[k] = fut
+        try:
+            result = await self._download(k, url, name)
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            if not fut.done(): fut.set_result(None)
+            if isinstance(e, asyncio.CancelledError): raise
+            return None
+        finally:
+            self._inflight.pop(k, None)
+
+    async def _download(self, k: str, url: str, name: Optional[str] = None) -> Optional[str]:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(max(1, self.workers))
+        async with self._sem:
+            tmp_dir = os.path.join(self.root, 'tmp')
+            os.makedirs(tmp_dir, exist_ok=True)
+            tmp = os.path.join(tmp_dir, hashlib.blake2b(k.encode(), digest_size=8).hexdigest())
+            try:
+                digest, size, ext = await asyncio.to_thread(self.fetch, url, tmp)
+            except Exception:
+                self.stats['failures'] += 1
+                if os.path.exists(tmp): os.remove(tmp)
+                return None
+            entry = _Entry(digest, ext or _ext_from_name(name), size, time.time())
+            dest = os.path.join(self.files_dir, entry.name)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            if os.path.exists(dest):
+                os.remove(tmp)   # 内容一样的文件已经有了
+            else:
+                os.replace(tmp, dest)
+            self.stats['downloads'] += 1
+            self._add(k, entry)
+            if self.on_stored: self.on_stored(k, entry, self.file_path(entry))
+            self._evict()
+            return self.file_path(entry)
+
+    def _add(self, k: str, entry: _Entry):
+        orphan = None
+        with self._lock:
+            n = self._refs.get(entry.digest, 0)
+            self._refs[entry.digest] = n + 1
+            if n == 0:
+                self._sizes[entry.digest] = entry.size
+                self._by_digest[entry.digest] = entry
+                self.total_bytes += entry.size
+            old = self._entries.pop(k, None)
+            # 同一个链接换了内容，旧文件没人用了就删
+            if old is not None and self._unref(old): orphan = old
+            self._entries[k] = entry
+        if orphan is not None: self._delete([orphan])
+        self._notify()
+
+    def _unref(self, entry: _Entry) -> bool:
+        """返回 True 表示这个文件已经没有链接引用，可以删了"""
+        n = self._refs.get(entry.digest, 0) - 1
+        if n > 0:
+            self._refs[entry.digest] = n
+            return False
+        self._refs.pop(entry.digest, None)
+        self._by_digest.pop(entry.digest, None)
+        self.total_bytes -= self._sizes.pop(entry.digest, 0)
+        return True
+
+    def _evict(self):
+        removed = []
+        with self._lock:
+            while self.total_bytes > self.budget_bytes and len(self._entries) > 1:
+                k, e = self._entries.popitem(last=False)
+                if self._unref(e): removed.append(e)
+                self.stats['evicted'] += 1
+        if removed:
+            self._delete(removed)
+            self._notify()
+
+    def _delete(self, entries):
+        for e in entries:
+            try: os.remove(os.path.join(self.files_dir, e.name))
+            except OSError: pass
+            if self.on_removed: self.on_removed(e)
+
+    def configure(self, budget_bytes: int, workers: int):
+        # 页面上改了配置就同步过来；并发数只影响之后排队的下载
+        if workers != self.workers:
+            self.workers = workers
+            self._sem = None
+        if budget_bytes != self.budget_bytes:
+            self.budget_bytes = budget_bytes
+            self._evict()
+
+    # ---------- 索引读写 ----------
+    def _notify(self):
+        if self.on_dirty: self.on_dirty()
+
+    def load(self):
+        # 目录等第一次落盘时再建，只是导入一下（比如压测）不在程序目录里留空文件夹
+        if not os.path.exists(self.index_path): return
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        rows = sorted(data.get('entries', []), key=lambda r: r[4])
+        for k, digest, ext, size, atime in rows:
+            entry = _Entry(digest, ext, size, atime)
+            if not os.path.exists(os.path.join(self.files_dir, entry.name)): continue
+            self._add(k, entry)
+        self._evict()
+
+    def flush(self):
+        # 写盘线程里执行
+        with self._lock:
+            rows = [[k, e.digest, e.ext, e.size, round(e.atime, 1)] for k, e in self._entries.items()]
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'entries': rows}, f, separators=(',', ':'))
+        os.replace(tmp, self.index_path)
+
+# 单例：目录固定在程序目录下（跟 logs 一样用绝对路径），预算和并发取配置
+MEDIA_DIR = os.path.join(BASE_DIR, "media_cache")
+
+media_cache = MediaCache(MEDIA_DIR, int(state.media_cache_mb * 1024 * 1024), state.media_cache_workers)
+media_cache.on_dirty = lambda: persist.mark_dirty('media')
+persist.register('media', media_cache.flush)
+
+# [新增] 缩略图跟着原图走：原图落盘就排队做，原图被淘汰就删
+thumbnails = ThumbnailService(os.path.join(MEDIA_DIR, 'thumbs'), state.thumb_size, state.thumb_format)
+media_cache.on_stored = lambda key, e, path: thumbnails.request(key, e.digest, e.ext, path)
+media_cache.on_removed = lambda e: thumbnails.discard(e.digest, e.ext)
+thumbnails.on_ready = lambda key, url: state.events.publish(EVENT_THUMB_READY, key=key, url=url)
+
+def thumb_url(url) -> Optional[str]:
+    """网格卡片用的小图地址；还没做好返回 None（顺手排上队，比如开这个功能之前就缓存好的原图）"""
+    e = media_cache.peek(url)
+    if e is None: return None
+    hit = thumbnails.lookup(e.digest, e.ext)
+    if hit is None:
+        thumbnails.request(media_cache.key(url), e.digest, e.ext, media_cache.file_path(e))
+    return hit
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Iterable, Optional, Set
+from core.state import state
+from core.persist import persist
+from core.utils import add_log, get_avatar_url
+from core.api import api_request
+from core.metrics import counter
+
+# 群名 / 审核员昵称的解析：带过期时间的缓存 + 后台批量刷新
+# 以前每次（重）连都对每个群发一次 no_cache 的 get_group_info，回包靠在收消息循环里嗅 group_name / nickname 认领
+# 现在：缓存落盘，重启后直接用；过期的先照旧显示，后台慢慢刷新；回包按 echo 对应，不再猜
+# 一次要查好几个群时先拉一次 get_group_list，一个请求拿全，剩下不在列表里的（机器人没进的群）再逐个查
+
+META_FILE = "meta_cache.json"
+FAIL_BACKOFF = 60       # 查失败的 id 至少隔这么久再试
+
+lookups = counter('meta_lookups_total', "群/用户信息查询次数", ('action', 'outcome'))
+
+class MetaResolver:
+    def __init__(self, path: str = META_FILE, concurrency: int = 3):
+        self.path = path
+        self.concurrency = concurrency
+        # 直接用 state 上的两个字典当缓存，页面照旧从这里读
+        self.groups: Dict[int, dict] = state.group_info_cache
+        self.users: Dict[int, dict] = state.user_info_cache
+        self._want = {'group': set(), 'user': set()}
+        self._failed: Dict[tuple, float] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.on_dirty = None
+        self.stats = {'batches': 0, 'list_calls': 0, 'single_calls': 0}
+
+    # ---------- 查询 ----------
+    @property
+    def ttl(self) -> float:
+        return max(0, state.cache_time)
+
+    def _stale(self, entry: Optional[dict], now: float) -> bool:
+        return entry is None or now - entry.get('at', 0) >= self.ttl
+
+    def group(self, gid) -> dict:
+        """取群信息（可能是过期的旧值）；过期或没有就排队刷新，不等结果"""
+        gid = int(gid)
+        self.want_groups([gid])
+        return self.groups.get(gid, {})
+
+    def user(self, uid) -> dict:
+        uid = int(uid)
+        self.want_users([uid])
+        return self.users.get(uid, {})
+
+    def want_groups(self, gids: Iterable, force: bool = False):
+        self._enqueue('group', self.groups, gids, force)
+
+    def want_users(self, uids: Iterable, force: bool = False):
+        self._enqueue('user', self.users, uids, force)
+
+    def _enqueue(self, kind: str, cache: Dict[int, dict], ids: Iterable, force: bool):
+        now = time.time()
+        added = False
+        for i in ids:
+            if not i: continue
+            i = int(i)
+            if not force:
+                if not self._stale(cache.get(i), now): continue
+                if now - self._failed.get((kind, i), 0) < FAIL_BACKOFF: continue
+            if i not in self._want[kind]:
+                self._want[kind].add(i)
+                added = True
+        if added and self._wake is not None: self._wake.set()
+
+    def on_connected(self):
+        # 连上后只查过期/没有的，缓存还新鲜的一个请求都不发
+        self.want_groups(state.source_groups | state.target_groups)
+        if state.swordholder_qq: self.want_users([state.swordholder_qq])
+        if self._wake is not None: self._wake.set()
+
+    # ---------- 后台刷新 ----------
+    def start(self):
+        if self._task is not None: return
+        self._wake = asyncio.Event()
+        if self._want['group'] or self._want['user']: self._wake.set()
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            if not state.connected: continue   # 连上时 on_connected 会再叫醒
+            groups, self._want['group'] = self._want['group'], set()
+            users, self._want['user'] = self._want['user'], set()
+            if not groups and not users: continue
+            try:
+                await self._resolve(groups, users)
+            except Exception as e:
+                add_log(f"[Meta] 刷新群/用户信息出错: {e}")
+
+    async def _resolve(self, groups: Set[int], users: Set[int]):
+        self.stats['batches'] += 1
+        changed = False
+        if len(groups) > 1:
+            changed |= await self._from_group_list(groups)
+        sem = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def one(kind, i):
+            async with sem:
+                return await self._fetch_one(kind, i)
+
+        jobs = [one('group', g) for g in groups] + [one('user', u) for u in users]
+        if jobs:
+            changed |= any(await asyncio.gather(*jobs))
+        if changed:
+            self._mark_dirty()
+            state.request_ui_refresh()
+
+    async def _from_group_list(self, groups: Set[int]) -> bool:
+        """一次 get_group_list 填上所有机器人在的群，命中的从 groups 里拿掉"""
+        self.stats['list_calls'] += 1
+        try:
+            res = await api_request("get_group_list", {"no_cache": True}, 15)
+        except Exception as e:
+            lookups.inc(action='get_group_list', outcome='error')
+            add_log(f"[Meta] 拉群列表失败，改为逐个查询: {e}")
+            return False
+        if res.get('status') != 'ok':
+            lookups.inc(action='get_group_list', outcome='failed')
+            return False
+        lookups.inc(action='get_group_list', outcome='ok')
+        now = time.time()
+        hit = False
+        for g in res.get('data') or []:
+            gid = g.get('group_id')
+            if gid in groups:
+                self.groups[gid] = self._group_entry(gid, g, now)
+                groups.discard(gid)
+                hit = True
+        return hit
+
+    async def _fetch_one(self, kind: str, i: int) -> bool:
+        self.stats['single_calls'] += 1
+        if kind == 'group':
+            action, params = "get_group_info", {"group_id": i, "no_cache": True}
+        else:
+            action, params = "get_stranger_info", {"user_id": i, "no_cache": True}
+        try:
+            res = await api_request(action, params, 15)
+        except Exception as e:
+            lookups.inc(action=action, outcome='error')
+            self._failed[(kind, i)] = time.time()
+            add_log(f"[Meta] {action}({i}) 没拿到: {e or type(e).__name__}")
+            return False
+        data = res.get('data') or {}
+        if res.get('status') != 'ok' or not data:
+            lookups.inc(action=action, outcome='failed')
+            self._failed[(kind, i)] = time.time()
+            return False
+        lookups.inc(action=action, outcome='ok')
+        self._failed.pop((kind, i), None)
+        now = time.time()
+        if kind == 'group':
+            self.groups[i] = self._group_entry(i, data, now)
+        else:
+            self.users[i] = {'name': data.get('nickname') or str(i), 'avatar': get_avatar_url(i, is_group=False), 'at': now}
+        return True
+
+    @staticmethod
+    def _group_entry(gid: int, data: dict, now: float) -> dict:
+        return {'name': data.get('group_name') or str(gid), 'avatar': get_avatar_url(gid), 'at': now}
+
+    # ---------- 落盘 ----------
+    def _mark_dirty(self):
+        if self.on_dirty: self.on_dirty()
+
+    def load(self):
+        if not os.path.exists(self.path): return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for gid, entry in data.get('groups', {}).items():
+            self.groups[int(gid)] = entry
+        for uid, entry in data.get('users', {}).items():
+            self.users[int(uid)] = entry
+
+    def flush(self):
+        # 写盘线程里执行
+        data = {'version': 1, 'groups': dict(self.groups), 'users': dict(self.users)}
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, self.path)
+
+meta = MetaResolver()
+meta.on_dirty = lambda: persist.mark_dirty('meta')
+persist.register('meta', meta.flush)
@@ -0,0 +1,213 @@
+import asyncio
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 进程内的轻量指标：计数器、仪表和直方图，按标签分组
+# 只做累加，不依赖 prometheus_client；要看数据就调 snapshot()，或者访问 /metrics 拿 Prometheus 文本格式
+
+# 默认的延迟分桶（秒），覆盖 NapCat 普通接口的几毫秒到合并转发的几十秒
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 90)
+
+def _key(names: Tuple, labels: dict) -> Tuple:
+    # 打点在热路径上，列表推导比生成器快一截
+    return tuple([str(labels.get(n, '')) for n in names])
+
+class Counter:
+    def __init__(self, name: str, doc: str = "", labels: Iterable[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _key(self.label_names, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = _key(self.label_names, labels)
+        return self._values.get(key, 0)
+
+    def snapshot(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+class Gauge:
+    """当前值（队列深度之类）；也可以给一个函数，读的时候现算
+    带标签的 fn 返回 {标签值元组: 数值}，不带标签的直接返回数值"""
+    def __init__(self, name: str, doc: str = "", labels: Iterable[str] = (), fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self.fn = fn
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = _key(self.label_names, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        key = _key(self.label_names, labels)
+        return self.snapshot().get(key, 0)
+
+    def snapshot(self) -> Dict[Tuple, float]:
+        if self.fn is not None:
+            v = self.fn()
+            if not isinstance(v, dict): return {(): v}
+            return {tuple(str(x) for x in (k if isinstance(k, tuple) else (k,))): n for k, n in v.items()}
+        with self._lock:
+            return dict(self._values)
+
+class _HistogramSeries:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * (n_buckets + 1)   # 最后一格是 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+class Histogram:
+    """定长分桶直方图，observe 是 O(log 桶数)，不保存原始样本"""
+    def __init__(self, name: str, doc: str = "", labels: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _key(self.label_names, labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = _HistogramSeries(len(self.buckets))
+            s.counts[idx] += 1
+            s.sum += value
+            s.count += 1
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """按分桶估算分位数（取所在桶的上界），没有样本返回 None"""
+        key = _key(self.label_names, labels)
+        s = self._series.get(key)
+        if s is None or not s.count: return None
+        want = q * s.count
+        seen = 0
+        for i, c in enumerate(s.counts):
+            seen += c
+            if seen >= want:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def snapshot(self) -> Dict[Tuple, dict]:
+        with self._lock:
+            return {key: {'counts': list(s.counts), 'sum': s.sum, 'count': s.count}
+                    for key, s in self._series.items()}
+
+# ---------- 全局注册表 ----------
+_registry: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+def counter(name: str, doc: str = "", labels: Iterable[str] = ()) -> Counter:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter(name, doc, labels)
+        return _registry[name]
+
+def histogram(name: str, doc: str = "", labels: Iterable[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(name, doc, labels, buckets)
+        return _registry[name]
+
+def gauge(name: str, doc: str = "", labels: Iterable[str] = (), fn: Optional[Callable[[], float]] = None) -> Gauge:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Gauge(name, doc, labels, fn)
+        return _registry[name]
+
+def all_metrics() -> List[object]:
+    with _registry_lock:
+        return list(_registry.values())
+
+# ---------- 事件循环卡顿 ----------
+loop_lag_seconds = histogram('event_loop_lag_seconds', "事件循环醒来比预定晚了多久（被同步代码占住的时间）",
+                             buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+
+class LoopLagMonitor:
+    """每隔一会儿 sleep 一下，醒晚了多少就是这段时间里事件循环被卡了多久；开销是每秒两次唤醒
+    压测里用更短的间隔、keep_samples=True 留下每次的测量，自己算分位数"""
+    def __init__(self, interval: float = 0.5, keep_samples: bool = False):
+        self.interval = interval
+        self.last = 0.0
+        self.samples: Optional[List[float]] = [] if keep_samples else None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None: self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None: self._task.cancel()
+        self._task = None
+
+    async def _run(self):
+        while True:
+            t = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.last = max(0.0, time.perf_counter() - t - self.interval)
+            loop_lag_seconds.observe(self.last)
+            if self.samples is not None: self.samples.append(self.last)
+
+loop_lag = LoopLagMonitor()
+gauge('event_loop_lag_last_seconds', "最近一次测到的事件循环卡顿", fn=lambda: loop_lag.last)
+
+# ---------- Prometheus 文本格式 ----------
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _num(v) -> str:
+    v = float(v)
+    if math.isinf(v): return '+Inf' if v > 0 else '-Inf'
+    if math.isnan(v): return 'NaN'
+    return repr(int(v)) if v.is_integer() and abs(v) < 1e15 else repr(v)
+
+def _labels(names: Tuple, values: Tuple, extra: str = '') -> str:
+    parts = []
+    for n, v in zip(names, values):
+        v = v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{n}="{v}"')
+    if extra: parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+def render_prometheus() -> str:
+    """把注册表里的全部指标导出成 Prometheus 的文本格式；只在被抓取时做一次快照，不影响打点"""
+    out = []
+    for m in all_metrics():
+        doc = (m.doc or m.name).replace('\\', '\\\\').replace('\n', '\\n')
+        out.append(f"# HELP {m.name} {doc}")
+        if isinstance(m, Histogram):
+            out.append(f"# TYPE {m.name} histogram")
+            for key, s in m.snapshot().items():
+                acc = 0
+                for bound, c in zip(m.buckets + (float('inf'),), s['counts']):
+                    acc += c
+                    le = 'le="%s"' % _num(bound)
+                    out.append(f"{m.name}_bucket{_labels(m.label_names, key, le)} {acc}")
+                out.append(f"{m.name}_sum{_labels(m.label_names, key)} {_num(s['sum'])}")
+                out.append(f"{m.name}_count{_labels(m.label_names, key)} {s['count']}")
+        else:
+            kind = 'counter' if isinstance(m, Counter) else 'gauge'
+            out.append(f"# TYPE {m.name} {kind}")
+            try:
+                values = m.snapshot()
+            except Exception:
+                continue    # 现算的仪表出错就跳过这一项，别让整个抓取失败
+            for key, v in values.items():
+                out.append(f"{m.name}{_labels(m.label_names, key)} {_num(v)}")
+    return '\n'.join(out) + '\n'
@@ -0,0 +1,110 @@
+import sys
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import List, NamedTuple, Optional, Tuple
+
+# 待审条目的紧凑表示：slots 数据类 + 整数 id + 枚举类型 + 复用的 URL 字符串
+# previews / content 不再单独存一份，按需从 segments 现算
+# 持久化用 to_row()/from_row() 的定长列表，比字典 JSON 小得多也快得多
+# 勾选状态不在这里：每个审核员页面各自记自己选了哪些（见 ui/views.py 的 ReviewSession）
+
+class ItemType(IntEnum):
+    IMAGE = 1
+    VIDEO = 2
+    FORWARD = 3
+    MIXED = 4
+
+    @property
+    def label(self) -> str:
+        return _TYPE_LABELS[self]
+
+    @property
+    def kind(self) -> str:
+        # 队列栏目：左边媒体库，右边情报局，其余（图文混合等）不上墙
+        if self in (ItemType.IMAGE, ItemType.VIDEO): return 'media'
+        if self is ItemType.FORWARD: return 'forward'
+        return 'other'
+
+    @classmethod
+    def from_label(cls, label: str) -> "ItemType":
+        return _LABEL_TYPES.get(label, cls.MIXED)
+
+_TYPE_LABELS = {ItemType.IMAGE: 'image', ItemType.VIDEO: 'video', ItemType.FORWARD: 'forward', ItemType.MIXED: 'mixed'}
+_LABEL_TYPES = {v: k for k, v in _TYPE_LABELS.items()}
+
+class Seg(NamedTuple):
+    type: str               # image / video / forward / node
+    url: Optional[str]
+    file: Optional[str]     # 视频的 file id；图片发出去时 file 就用 url
+    raw: Optional[dict]     # 转发/节点段保留 NapCat 给的原始 data
+
+def make_seg(seg_type: str, url=None, file=None, raw=None) -> Seg:
+    # 同一条 URL 在队列、去重、发送之间只留一份字符串
+    return Seg(sys.intern(seg_type), sys.intern(url) if url else None,
+               sys.intern(file) if file and file != url else None, raw)
+
+@dataclass(slots=True, eq=False)
+class PendingItem:
+    id: int
+    type: ItemType
+    segments: Tuple[Seg, ...]
+    timestamp: float
+    raw_msg_id: int = 0
+    near_dup: Optional[int] = None
+
+    @property
+    def kind(self) -> str:
+        return self.type.kind
+
+    @property
+    def preview_url(self) -> Optional[str]:
+        for seg in self.segments:
+            if seg.url: return seg.url
+        return None
+
+    @property
+    def image_urls(self) -> List[str]:
+        return [seg.url for seg in self.segments if seg.type == 'image' and seg.url]
+
+    @property
+    def media_sources(self) -> List[Tuple[str, Optional[str]]]:
+        # (链接, 文件名)，媒体缓存拿文件名兜底猜扩展名
+        return [(seg.url, seg.file) for seg in self.segments if seg.type in ('image', 'video') and seg.url]
+
+    @property
+    def content(self) -> List[dict]:
+        """发送时用的 OneBot 消息段"""
+        out = []
+        for seg in self.segments:
+            if seg.type == 'image':
+                out.append({"type": "image", "data": {"file": seg.url, "url": seg.url}})
+            elif seg.type == 'video':
+                out.append({"type": "video", "data": {"file": seg.file or seg.url, "url": seg.url}})
+            else:
+                out.append({"type": seg.type, "data": dict(seg.raw or {})})
+        return out
+
+    # ---------- 序列化 ----------
+    def to_row(self) -> list:
+        segs = [[s.type, s.url, s.file, s.raw] for s in self.segments]
+        return [self.id, int(self.type), round(self.timestamp, 3), self.raw_msg_id, self.near_dup, segs]
+
+    @classmethod
+    def from_row(cls, row: list) -> "PendingItem":
+        item_id, item_type, ts, raw_msg_id, near_dup, segs = row
+        return cls(item_id, ItemType(item_type), tuple(make_seg(*s) for s in segs),
+                   ts, raw_msg_id, near_dup)
+
+    @classmethod
+    def from_legacy(cls, item_id: int, d: dict) -> "PendingItem":
+        """旧版 reviews.json 里的字典条目"""
+        segs = []
+        for seg in d.get('content', []):
+            stype = seg.get('type')
+            data = seg.get('data', {})
+            if stype in ('image', 'video'):
+                segs.append(make_seg(stype, data.get('url'), data.get('file')))
+            else:
+                segs.append(make_seg(stype, raw=data))
+        return cls(item_id, ItemType.from_label(d.get('type', 'mixed')), tuple(segs),
+                   d.get('timestamp', 0.0), d.get('raw_msg_id') or 0, d.get('near_dup'))
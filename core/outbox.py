@@ -0,0 +1,308 @@
+import asyncio
+import hashlib
+import random
+import time
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+from core.journal import ReviewJournal
+from core import metrics
+
+# 持久化发件箱：点发送只是把“往哪个群发什么”写进队列，后台 worker 慢慢发
+# 每条任务 = 一个群 + 一份消息，带幂等键；同一个键发成功过就不会再发第二次
+# 发之前先把“正在发”落盘，崩溃重启后这类任务不自动重发（不知道到底发出去没有），只标记失败等人工处理
+# 存储复用 ReviewJournal：outbox.json 是快照，outbox.journal 是追加日志
+# 消息体（预编码的 JSON）按摘要只写一次，群发的 N 条任务只存引用，不会把同一个大包在日志里写 N 遍
+
+OUTBOX_FILE = "outbox.json"
+OUTBOX_JOURNAL = "outbox.journal"
+
+# deliver 的结果
+DELIVERED = 'ok'
+RETRY = 'retry'           # 明确没发出去（没连上、NapCat 报错），退避后重试
+UNCERTAIN = 'uncertain'   # 请求发出去了但没等到回包，为防重复不自动重发
+
+PENDING, SENDING, DONE, FAILED = 'pending', 'sending', 'done', 'failed'
+
+outbox_jobs = metrics.counter('outbox_jobs_total', '发件箱任务结束时的结果', labels=('action', 'outcome'))
+
+@dataclass(slots=True)
+class SendJob:
+    key: str                 # 幂等键，一般是 动作:内容摘要:群号
+    batch: str               # 同一次点击生成的一组任务
+    action: str              # NapCat 接口名
+    group_id: int
+    payload: list            # 参数变体（预编码的 params JSON，不含 group_id），按顺序尝试（比如打包的 L1 伪造节点 / L2 引用原消息）
+    attempts: int = 0
+    next_at: float = 0.0
+    status: str = PENDING
+    error: str = ''
+    created: float = 0.0
+    items: list = field(default_factory=list)   # 这条消息带着的待审条目 id，全部发完才从待审区删掉
+
+Deliver = Callable[[SendJob], Awaitable[Tuple[str, str]]]
+
+class Outbox:
+    def __init__(self, deliver: Deliver, ready: Optional[Callable[[], bool]] = None,
+                 snapshot_path: str = OUTBOX_FILE, journal_path: str = OUTBOX_JOURNAL,
+                 max_attempts: int = 6, base_delay: float = 5.0, max_delay: float = 300.0,
+                 keep_done: int = 20000):
+        self.deliver = deliver
+        self.ready = ready
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.keep_done = keep_done
+        self.store = ReviewJournal(snapshot_path, journal_path, compact_threshold=500)
+        self.jobs: Dict[str, SendJob] = {}          # 没发完的（含失败待处理的）
+        self._lanes: Dict[int, Deque[str]] = {}     # 每个群一条道，保证同群按顺序发
+        self._done: "OrderedDict[str, float]" = OrderedDict()
+        self._bodies: Dict[str, str] = {}           # 摘要 -> 消息体，读盘时用
+        self._written: Dict[str, str] = {}          # 本轮日志里已经写过的消息体，压缩后清空
+        self._ref_cache: Dict[int, Tuple[str, str]] = {}
+        self._active: Dict[int, asyncio.Task] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # 任务状态变化时回调（发完 / 失败 / 重试），给上层发通知、算进度
+        self.on_change: Optional[Callable[[SendJob], None]] = None
+
+    def __len__(self):
+        return sum(1 for j in self.jobs.values() if j.status in (PENDING, SENDING))
+
+    # ---------- 读盘 ----------
+    def load(self):
+        data = self.store.load_snapshot()
+        self._bodies.update(data.get('bodies', {}))
+        for d in data.get('jobs', []):
+            self._restore(self._decode(d))
+        for key in data.get('done', []):
+            self._done[key] = 0.0
+        for rec in self.store.replay():
+            self._apply(rec)
+        self._bodies.clear()
+        # 上次退出时正在发的：不知道发没发出去，不能自动重发
+        for job in self.jobs.values():
+            if job.status == SENDING:
+                job.status = FAILED
+                job.error = '程序退出时正在发送，结果未知，为防重复未自动重发'
+                self._journal('state', key=job.key, status=job.status, attempts=job.attempts,
+                              next_at=job.next_at, error=job.error)
+
+    def _restore(self, job: SendJob):
+        self.jobs[job.key] = job
+        if job.status in (PENDING, SENDING):
+            self._lanes.setdefault(job.group_id, deque()).append(job.key)
+
+    def _apply(self, rec: dict):
+        op = rec.get('op')
+        if op == 'body':
+            self._bodies[rec['h']] = rec['body']
+        elif op == 'put':
+            self._restore(self._decode(rec['job']))
+        elif op == 'state':
+            job = self.jobs.get(rec['key'])
+            if job is None: return
+            job.status = rec['status']
+            job.attempts = rec.get('attempts', job.attempts)
+            job.next_at = rec.get('next_at', job.next_at)
+            job.error = rec.get('error', '')
+            job.batch = rec.get('batch', job.batch)
+            job.items = rec.get('items', job.items)
+            if job.status == PENDING and rec['key'] not in self._lanes.get(job.group_id, ()):
+                self._lanes.setdefault(job.group_id, deque()).append(job.key)
+        elif op == 'done':
+            self._forget(rec['key'])
+        elif op == 'drop':
+            self.jobs.pop(rec['key'], None)
+
+    def _snapshot(self) -> dict:
+        bodies: Dict[str, str] = {}
+        jobs = [self._encode(j, bodies) for j in self.jobs.values()]
+        # 快照之后的日志重新从头写消息体
+        self._written = {}
+        return {'version': 2, 'bodies': bodies, 'jobs': jobs, 'done': list(self._done)}
+
+    def _ref(self, body: str) -> str:
+        # 群发时各群的任务共用同一个字符串对象，按对象缓存摘要，一批只算一次
+        hit = self._ref_cache.get(id(body))
+        if hit is not None and hit[0] is body: return hit[1]
+        h = hashlib.blake2b(body.encode(), digest_size=12).hexdigest()
+        if len(self._ref_cache) > 1024: self._ref_cache.clear()
+        self._ref_cache[id(body)] = (body, h)
+        return h
+
+    def _encode(self, job: SendJob, bodies: Dict[str, str]) -> dict:
+        d = asdict(job)
+        refs = []
+        for body in job.payload:
+            h = self._ref(body)
+            bodies[h] = body
+            refs.append('#' + h)
+        d['payload'] = refs
+        return d
+
+    def _decode(self, d: dict) -> SendJob:
+        job = SendJob(**d)
+        job.payload = [self._bodies[p[1:]] for p in job.payload]
+        return job
+
+    def _put(self, job: SendJob):
+        new_bodies: Dict[str, str] = {}
+        d = self._encode(job, new_bodies)
+        for h, body in new_bodies.items():
+            if h in self._written: continue
+            self._written[h] = body
+            self.store.append('body', h=h, body=body)
+        self._journal('put', job=d)
+
+    def _journal(self, op: str, **fields):
+        self.store.append(op, **fields)
+        if self.store.needs_compaction():
+            self.store.compact(self._snapshot)
+
+    def _forget(self, key: str):
+        self.jobs.pop(key, None)
+        self._done[key] = time.time()
+        while len(self._done) > self.keep_done:
+            self._done.popitem(last=False)
+
+    # ---------- 入队 ----------
+    def enqueue(self, jobs: Iterable[SendJob]) -> List[SendJob]:
+        """返回真正入队的任务；发成功过或正在排队的同键任务会被跳过，失败过的会重新排队"""
+        accepted = []
+        now = time.time()
+        for job in jobs:
+            if job.key in self._done: continue
+            old = self.jobs.get(job.key)
+            if old is not None:
+                if old.status != FAILED: continue
+                # 失败过的重新排队时归到这次的批次下，进度和条目都算新任务的
+                old.batch, old.items = job.batch, job.items
+                self._rearm(old)
+                accepted.append(old)
+                continue
+            job.created = job.created or now
+            self._restore(job)
+            self._put(job)
+            accepted.append(job)
+        if accepted: self.wake()
+        return accepted
+
+    def retry_failed(self, batch: Optional[str] = None) -> List[SendJob]:
+        """把彻底失败的重新排队（次数清零），返回重新排上的"""
+        rearmed = []
+        for job in list(self.jobs.values()):
+            if job.status == FAILED and (batch is None or job.batch == batch):
+                self._rearm(job)
+                rearmed.append(job)
+        if rearmed: self.wake()
+        return rearmed
+
+    def _rearm(self, job: SendJob):
+        job.status, job.attempts, job.next_at, job.error = PENDING, 0, 0.0, ''
+        self._lanes.setdefault(job.group_id, deque()).append(job.key)
+        self._journal('state', key=job.key, status=job.status, attempts=0, next_at=0.0, error='',
+                      batch=job.batch, items=job.items)
+
+    def cancel_batch(self, batch: str) -> List[SendJob]:
+        """撤掉某一批里还没发的（含失败待处理的），正在发的那条不动"""
+        dropped = []
+        for job in list(self.jobs.values()):
+            if job.batch != batch or job.status not in (PENDING, FAILED): continue
+            del self.jobs[job.key]
+            self._journal('drop', key=job.key)
+            dropped.append(job)
+        if dropped: self.wake()
+        return dropped
+
+    # ---------- 后台发送 ----------
+    def start(self):
+        if self._task is not None: return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for t in list(self._active.values()): t.cancel()
+        self.store.flush()
+
+    def wake(self):
+        if self._wake is not None: self._wake.set()
+
+    def _head(self, gid: int) -> Optional[SendJob]:
+        lane = self._lanes.get(gid)
+        while lane:
+            job = self.jobs.get(lane[0])
+            if job is not None and job.status in (PENDING, SENDING): return job
+            lane.popleft()
+        return None
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            now = time.time()
+            next_due = None
+            if self.ready is None or self.ready():
+                for gid in list(self._lanes):
+                    if gid in self._active: continue
+                    job = self._head(gid)
+                    if job is None:
+                        del self._lanes[gid]
+                        continue
+                    if job.next_at <= now:
+                        self._active[gid] = asyncio.create_task(self._send(job))
+                    elif next_due is None or job.next_at < next_due:
+                        next_due = job.next_at
+            elif self._lanes:
+                # 没连上的时候低频看一眼，连上后 bot 会主动 wake
+                next_due = now + 5
+            timeout = None if next_due is None else max(0.05, next_due - now)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, job: SendJob):
+        try:
+            job.status = SENDING
+            job.attempts += 1
+            self._journal('state', key=job.key, status=job.status, attempts=job.attempts, next_at=job.next_at)
+            # 发之前先落盘，保证崩溃后知道这条可能已经发出去了
+            await asyncio.to_thread(self.store.flush)
+            try:
+                outcome, error = await self.deliver(job)
+            except Exception as e:
+                outcome, error = RETRY, str(e)
+
+            if outcome == DELIVERED:
+                job.status, job.error = DONE, ''
+                self._forget(job.key)
+                self._journal('done', key=job.key)
+            elif outcome == RETRY and job.attempts < self.max_attempts:
+                job.status, job.error = PENDING, error
+                job.next_at = time.time() + self.backoff(job.attempts)
+                self._journal('state', key=job.key, status=job.status, attempts=job.attempts,
+                              next_at=job.next_at, error=error)
+            else:
+                job.status, job.error = FAILED, error
+                self._journal('state', key=job.key, status=job.status, attempts=job.attempts,
+                              next_at=job.next_at, error=error)
+            if job.status != PENDING:
+                outbox_jobs.inc(action=job.action, outcome=outcome if job.status == FAILED else DELIVERED)
+            if self.on_change: self.on_change(job)
+        finally:
+            self._active.pop(job.group_id, None)
+            self.wake()
+
+    def backoff(self, attempts: int) -> float:
+        # 指数退避 + 抖动：一半固定一半随机，避免一堆失败任务同一时刻一起重试
+        d = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return d / 2 + random.uniform(0, d / 2)
+
+    def stats(self) -> dict:
+        by_status: Dict[str, int] = {}
+        for j in self.jobs.values():
+            by_status[j.status] = by_status.get(j.status, 0) + 1
+        return {'jobs': by_status, 'active': len(self._active), 'done_keys': len(self._done)}
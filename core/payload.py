@@ -0,0 +1,38 @@
+import json
+from typing import Union
+
+# 发包用的 JSON 编码：装了 orjson 就用它，没装退回标准库
+# 群发时同一份消息体只编码一次，每个群只把 group_id 拼到前面，不再 deepcopy + 重新 dumps
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def backend() -> str:
+    return 'orjson' if orjson is not None else 'json'
+
+def dumps(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+def encode_params(params: dict) -> str:
+    """预先编码 params（JSON 对象），不含 group_id / user_id 之类按目标变化的字段"""
+    return dumps(params)
+
+def splice(body: str, **fields) -> str:
+    """把少量按目标变化的字段拼到编码好的 params 前面：{"group_id":123,<原来的内容>}"""
+    head = ",".join(f"{dumps(k)}:{dumps(v)}" for k, v in fields.items())
+    if not head: return body
+    rest = body[1:].lstrip()
+    return "{" + head + ("}" if rest.startswith("}") else "," + rest)
+
+def frame(action: str, params: Union[str, dict], echo: str = None) -> str:
+    """整条 OneBot 请求：params 可以是字典，也可以是已经编码好的 JSON"""
+    if not isinstance(params, str):
+        params = dumps(params)
+    out = '{"action":' + dumps(action) + ',"params":' + params
+    if echo is not None:
+        out += ',"echo":' + dumps(echo)
+    return out + "}"
@@ -0,0 +1,86 @@
+import atexit
+import threading
+import time
+from typing import Callable, Dict
+from core.profiling import tracer
+
+# 写盘后台线程：事件循环里只打个“脏”标记，真正的 open/write 全在这条线程里做
+# 同一个窗口期内的多次标记会被合并成一次落盘
+
+class PersistWorker:
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._handlers: Dict[str, Callable[[], None]] = {}
+        self._dirty: set = set()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+        # 统计：notify_count 是收到的标记数，flush_count 是实际落盘次数
+        self.notify_count = 0
+        self.flush_count = 0
+        self.coalesced_count = 0
+
+    def register(self, name: str, handler: Callable[[], None]):
+        self._handlers[name] = handler
+
+    def start(self):
+        if self._thread is not None: return
+        self._thread = threading.Thread(target=self._run, name="persist-worker", daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self, name: str):
+        with self._cond:
+            self.notify_count += 1
+            if name in self._dirty:
+                self.coalesced_count += 1
+            else:
+                self._dirty.add(name)
+                self._cond.notify()
+        if self._thread is None and not self._stopping:
+            self.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._stopping:
+                    self._cond.wait()
+                if self._stopping: return
+            # 攒一会儿，让这段时间内的标记合并
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._cond:
+                names, self._dirty = self._dirty, set()
+            for name in names:
+                handler = self._handlers.get(name)
+                if handler is None: continue
+                try:
+                    with tracer.span('persist.' + name):
+                        handler()
+                    self.flush_count += 1
+                except Exception as e:
+                    print(f"[Error] 后台写盘失败 ({name}): {e}")
+
+    def stop(self):
+        # 关机时保证最后一批数据落盘
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            'notify': self.notify_count,
+            'flush': self.flush_count,
+            'coalesced': self.coalesced_count,
+            'pending': len(self._dirty),
+        }
+
+persist = PersistWorker()
+atexit.register(persist.stop)
@@ -0,0 +1,170 @@
+import asyncio
+import io
+import os
+import sys
+import urllib.request
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# 感知哈希近似去重：同一张梗图被压缩/缩放后重发，精确去重拦不住，这里用 dHash 比汉明距离
+# 注意：这个模块会被进程池的子进程导入，不要在顶层 import core.state（会在子进程里重新读配置、起写盘线程）
+# spawn 出来的子进程还会重新导入 main.py，所以 main.py 顶层也不能有副作用，启动逻辑都在 main() 里
+# Pillow 是可选依赖，没装的话这一层直接关闭
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+
+def available() -> bool:
+    return Image is not None
+
+# ---------- 子进程里跑的纯函数 ----------
+def dhash_image(img, size: int = 8) -> int:
+    # 缩成 (size+1) x size 灰度图，逐行比较相邻像素亮度，得到 size*size 位指纹
+    img = img.convert('L').resize((size + 1, size), Image.LANCZOS)
+    px = list(img.getdata())
+    bits = 0
+    for row in range(size):
+        base = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (px[base + col] > px[base + col + 1])
+    return bits
+
+def hash_file(path: str) -> int:
+    with Image.open(path) as img:
+        img.seek(0)   # GIF 只取第一帧
+        return dhash_image(img)
+
+def hash_url(url: str, timeout: float = 10) -> int:
+    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        data = resp.read(MAX_DOWNLOAD_BYTES + 1)
+    if len(data) > MAX_DOWNLOAD_BYTES:
+        raise ValueError("图片太大，跳过感知哈希")
+    with Image.open(io.BytesIO(data)) as img:
+        img.seek(0)
+        return dhash_image(img)
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+# ---------- BK 树 ----------
+class BKTree:
+    """按汉明距离组织的 BK 树，查半径 r 内的邻居只需访问一小部分节点"""
+    def __init__(self):
+        self.root = None   # 节点: [hash, key, {distance: child}]
+        self.size = 0
+
+    def add(self, h: int, key):
+        self.size += 1
+        if self.root is None:
+            self.root = [h, key, {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, key, {}]
+                return
+            node = child
+
+    def search(self, h: int, radius: int) -> List[Tuple[int, object]]:
+        if self.root is None: return []
+        found, stack = [], [self.root]
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= radius: found.append((d, node[1]))
+            for cd, child in node[2].items():
+                if d - radius <= cd <= d + radius:
+                    stack.append(child)
+        found.sort(key=lambda x: x[0])
+        return found
+
+class NearDupIndex:
+    """最近 N 张图的指纹库。BK 树不好删节点，超量后整棵按保留窗口重建"""
+    def __init__(self, capacity: int = 5000):
+        self.capacity = capacity
+        self.tree = BKTree()
+        self.history = deque()
+
+    def lookup(self, h: int, radius: int) -> Optional[Tuple[int, object]]:
+        hits = self.tree.search(h, radius)
+        return hits[0] if hits else None
+
+    def add(self, h: int, key):
+        self.history.append((h, key))
+        self.tree.add(h, key)
+        if len(self.history) > self.capacity * 2:
+            while len(self.history) > self.capacity:
+                self.history.popleft()
+            self.tree = BKTree()
+            for hh, kk in self.history: self.tree.add(hh, kk)
+
+class NearDupDetector:
+    """挂在入库前的一层：下载图片、进程池里算指纹、查近邻"""
+    def __init__(self, radius: int = 6, capacity: int = 5000, workers: int = 2):
+        self.radius = radius
+        self.index = NearDupIndex(capacity)
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def hash_urls(self, urls: List[str]) -> List[Optional[int]]:
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        futs = [loop.run_in_executor(pool, hash_url, u) for u in urls]
+        results = await asyncio.gather(*futs, return_exceptions=True)
+        return [r if isinstance(r, int) else None for r in results]
+
+    async def check(self, key, urls: List[str]) -> Optional[Tuple[int, object]]:
+        """返回 (距离, 命中的旧 key)；没有近似重复返回 None。本次的指纹会记入库"""
+        hashes = [h for h in await self.hash_urls(urls) if h is not None]
+        match = None
+        for h in hashes:
+            hit = self.index.lookup(h, self.radius)
+            if hit and (match is None or hit[0] < match[0]): match = hit
+        for h in hashes:
+            self.index.add(h, key)
+        return match
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+def scan_directory(path: str, radius: int = 6) -> Dict[str, List[Tuple[int, str]]]:
+    """离线调试：对本地图片目录算指纹，返回 {文件: [(距离, 相似的更早文件), ...]}"""
+    index = NearDupIndex(capacity=1 << 30)
+    result = {}
+    for name in sorted(os.listdir(path)):
+        if not name.lower().endswith(IMAGE_EXTS): continue
+        full = os.path.join(path, name)
+        try: h = hash_file(full)
+        except Exception as e:
+            print(f"[phash] 跳过 {name}: {e}")
+            continue
+        hits = index.tree.search(h, radius)
+        if hits: result[name] = hits
+        index.add(h, name)
+    return result
+
+if __name__ == '__main__':
+    # 用法: python -m core.phash <图片目录> [汉明距离阈值]
+    if not available():
+        sys.exit("需要先 pip install Pillow")
+    if len(sys.argv) < 2:
+        sys.exit("用法: python -m core.phash <图片目录> [汉明距离阈值]")
+    radius = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    for name, hits in scan_directory(sys.argv[1], radius).items():
+        print(f"{name}: " + ", ".join(f"{k} (d={d})" for d, k in hits))
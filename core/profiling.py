@@ -0,0 +1,178 @@
+import asyncio
+import cProfile
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Optional, Tuple
+from core.metrics import counter, histogram
+
+# 可选的性能排查工具，默认全关，关着的时候打点处只多一次属性判断：
+#   span        给入库 / 落盘 / 渲染 / 发送几个热点阶段计时，超过阈值的写日志
+#   慢回调检测   事件循环里单个回调跑太久（同步代码卡住了整个面板）就记下是谁
+#   profile     按需抓 N 秒的 cProfile 或采样火焰图，/admin/profile 下载
+# 这里不导入 core.state（persist 也要用它），配置由外面调 configure 传进来
+
+span_seconds = histogram('span_seconds', "热点阶段耗时（开启追踪后才记录）", ('stage',),
+                         buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+slow_callbacks = counter('asyncio_slow_callbacks_total', "事件循环里超过阈值的回调次数（开启追踪后才记录）", ('callback',))
+
+_NULL = nullcontext()
+_handle_run = asyncio.events.Handle._run
+
+def describe_handle(handle) -> str:
+    # 协程一步步往下跑时回调是 Task 的 step，报协程名更有用
+    cb = getattr(handle, '_callback', None)
+    owner = getattr(cb, '__self__', None)
+    if isinstance(owner, asyncio.Task):
+        coro = owner.get_coro()
+        return getattr(coro, '__qualname__', None) or repr(coro)
+    return getattr(cb, '__qualname__', None) or repr(cb)
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.slow_ms = 100.0
+        self.log: Callable[[str], None] = print
+        self.recent = deque(maxlen=100)     # 最近的慢记录，页面/接口上看
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._patched = False
+
+    def configure(self, enabled: bool, slow_ms: float = 100.0):
+        """在事件循环里调用；关掉时把慢回调检测的补丁也撤掉，回到零开销"""
+        self.slow_ms = max(1.0, float(slow_ms or 100.0))
+        try:
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread = threading.get_ident()
+        except RuntimeError:
+            pass
+        if bool(enabled) == self.enabled: return
+        self.enabled = bool(enabled)
+        if self.enabled:
+            self._install()
+            self.log(f"[Trace] 已开启性能追踪（慢阈值 {self.slow_ms:.0f}ms）")
+        else:
+            self._uninstall()
+            self.log("[Trace] 已关闭性能追踪")
+
+    # ---------- span ----------
+    def span(self, stage: str):
+        """with tracer.span('persist.queue'): ...  关着的时候返回共享的空上下文"""
+        if not self.enabled: return _NULL
+        return self._span(stage)
+
+    @contextmanager
+    def _span(self, stage: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            d = time.perf_counter() - t
+            span_seconds.observe(d, stage=stage)
+            if d * 1000 >= self.slow_ms: self._slow(f"[Trace] {stage} 耗时 {d * 1000:.0f}ms")
+
+    def _slow(self, msg: str):
+        self.recent.append((time.time(), msg))
+        # 落盘线程里的慢记录转回事件循环再写日志，日志推送会碰页面
+        if self._loop is not None and threading.get_ident() != self._loop_thread:
+            try:
+                self._loop.call_soon_threadsafe(self.log, msg)
+            except RuntimeError:
+                pass
+            return
+        self.log(msg)
+
+    # ---------- 慢回调检测 ----------
+    def _install(self):
+        # 和 asyncio 调试模式的 slow_callback_duration 一个思路，但不打开整个调试模式
+        # （调试模式会让跨线程的 call_soon 直接报错）；uvloop 之类的循环不走这里，只能看 /metrics 里的卡顿
+        if self._patched: return
+        tracer = self
+
+        def timed_run(handle):
+            t = time.perf_counter()
+            try:
+                _handle_run(handle)
+            finally:
+                d = time.perf_counter() - t
+                if d * 1000 >= tracer.slow_ms:
+                    name = describe_handle(handle)
+                    slow_callbacks.inc(callback=name)
+                    tracer._slow(f"[Trace] 事件循环被 {name} 占住了 {d * 1000:.0f}ms")
+
+        asyncio.events.Handle._run = timed_run
+        self._patched = True
+        if self._loop is not None and not isinstance(self._loop, asyncio.BaseEventLoop):
+            self.log(f"[Trace] 当前事件循环是 {type(self._loop).__name__}，慢回调检测不生效")
+
+    def _uninstall(self):
+        if not self._patched: return
+        asyncio.events.Handle._run = _handle_run
+        self._patched = False
+
+tracer = Tracer()
+
+# ---------- 按需 profile ----------
+MODES = ('cprofile', 'sample')
+
+class Profiler:
+    """同一时间只抓一份；cProfile 只看事件循环线程，采样模式另起一条线程定时抓栈"""
+    def __init__(self, sample_interval: float = 0.005):
+        self.sample_interval = sample_interval
+        self._busy = False
+
+    @property
+    def busy(self) -> bool:
+        return self._busy
+
+    async def capture(self, seconds: float, mode: str = 'cprofile') -> Tuple[str, bytes]:
+        """返回 (下载文件名, 内容)"""
+        if self._busy: raise RuntimeError("已经有一个 profile 在抓了")
+        if mode not in MODES: raise ValueError(f"不支持的模式: {mode}")
+        self._busy = True
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        try:
+            if mode == 'cprofile':
+                return f"profile_{stamp}.prof", await self._cprofile(seconds)
+            return f"profile_{stamp}.folded.txt", await self._sample(seconds)
+        finally:
+            self._busy = False
+
+    async def _cprofile(self, seconds: float) -> bytes:
+        # 产物是 pstats 格式：python -m pstats 文件名，或者 snakeviz 打开
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            prof.disable()
+        prof.create_stats()
+        return marshal.dumps(prof.stats)
+
+    async def _sample(self, seconds: float) -> bytes:
+        # 产物是折叠栈（每行 “栈;栈;栈 次数”），flamegraph.pl / speedscope 直接能画
+        target = threading.get_ident()
+        return await asyncio.to_thread(self._sample_thread, target, seconds)
+
+    def _sample_thread(self, target: int, seconds: float) -> bytes:
+        stacks = {}
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            frame = sys._current_frames().get(target)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                key = ';'.join(reversed(names))
+                stacks[key] = stacks.get(key, 0) + 1
+            time.sleep(self.sample_interval)
+        lines = [f"{k} {v}" for k, v in sorted(stacks.items(), key=lambda kv: -kv[1])]
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+profiler = Profiler()
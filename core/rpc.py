@@ -0,0 +1,90 @@
+import asyncio
+import itertools
+import time
+from typing import Dict, Tuple
+from core import metrics
+
+# 请求/响应配对：echo 用单调递增的序号，不会像时间戳那样同一刻撞号
+# 连接一断，所有还在等回包的请求立刻失败，不再傻等 15~90 秒超时
+
+ECHO_PREFIX = "req_"
+
+class NotConnected(Exception):
+    """还没连上 NapCat，请求根本没发出去，可以放心重试"""
+
+class ConnectionLost(Exception):
+    """发出去的请求还没等到回包，连接就断了。对方可能已经执行了"""
+
+api_latency = metrics.histogram(
+    'napcat_api_latency_seconds', 'NapCat 接口从发出到收到回包的耗时', labels=('action', 'outcome'))
+api_requests = metrics.counter(
+    'napcat_api_requests_total', 'NapCat 接口请求数', labels=('action', 'outcome'))
+
+class _Pending:
+    __slots__ = ('action', 'future', 'started')
+
+    def __init__(self, action: str, future: asyncio.Future, started: float):
+        self.action = action
+        self.future = future
+        self.started = started
+
+class RequestTable:
+    def __init__(self):
+        self._seq = itertools.count(1)
+        self._pending: Dict[str, _Pending] = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, echo) -> bool:
+        return echo in self._pending
+
+    def create(self, action: str) -> Tuple[str, asyncio.Future]:
+        echo = f"{ECHO_PREFIX}{next(self._seq)}"
+        future = asyncio.get_running_loop().create_future()
+        self._pending[echo] = _Pending(action, future, time.monotonic())
+        return echo, future
+
+    def resolve(self, data: dict) -> bool:
+        """收到带 echo 的回包时调用，认领成功返回 True"""
+        echo = data.get('echo')
+        if not isinstance(echo, str) or not echo.startswith(ECHO_PREFIX): return False
+        p = self._pending.pop(echo, None)
+        if p is None: return True   # 已经超时/作废的请求，回包直接丢掉
+        outcome = 'ok' if data.get('status') == 'ok' else 'failed'
+        self._record(p, outcome)
+        if not p.future.done(): p.future.set_result(data)
+        return True
+
+    def discard(self, echo: str, outcome: str = 'timeout'):
+        # 超时或发送失败时由调用方清理
+        p = self._pending.pop(echo, None)
+        if p is not None: self._record(p, outcome)
+
+    def fail_all(self, reason: str = "连接已断开") -> int:
+        # 断线时统一作废在途请求，调用方马上拿到 ConnectionLost
+        pending, self._pending = self._pending, {}
+        for p in pending.values():
+            self._record(p, 'disconnected')
+            if not p.future.done(): p.future.set_exception(ConnectionLost(reason))
+        return len(pending)
+
+    def _record(self, p: _Pending, outcome: str):
+        api_latency.observe(time.monotonic() - p.started, action=p.action, outcome=outcome)
+        api_requests.inc(action=p.action, outcome=outcome)
+
+    def latency_summary(self) -> Dict[str, dict]:
+        """每个接口成功请求的次数和 p50/p95，调试用"""
+        out = {}
+        for (action, outcome), s in api_latency.snapshot().items():
+            if outcome != 'ok': continue
+            out[action] = {
+                'count': s['count'],
+                'avg': s['sum'] / s['count'] if s['count'] else 0,
+                'p50': api_latency.quantile(0.5, action=action, outcome='ok'),
+                'p95': api_latency.quantile(0.95, action=action, outcome='ok'),
+            }
+        return out
+
+# 全局唯一的在途请求表
+pending_requests = RequestTable()
@@ -0,0 +1,70 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+# 发送调度：每个目标群一个令牌桶控制节奏（防风控），不同群之间并行发
+# 全局再用一个信号量限制同时在途的请求数，免得一下子把 NapCat 打满
+# N 个群的总耗时接近最慢的那个群，而不是 N 个群的耗时之和
+
+class TokenBucket:
+    """容量 burst、每 interval 秒回一个令牌；取令牌时额外随机等 0~jitter 秒"""
+    def __init__(self, interval: float, burst: int = 1, jitter: float = 0.0):
+        self.interval = interval
+        self.burst = burst
+        self.jitter = jitter
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        if self.interval <= 0:
+            self._tokens = float(self.burst)
+        else:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+        self._updated = now
+
+    async def acquire(self):
+        # 排队取令牌，同一个群的发送严格按先来后到
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) * self.interval)
+            if self.jitter > 0:
+                await asyncio.sleep(random.uniform(0, self.jitter))
+
+class SendScheduler:
+    def __init__(self, interval: float = 2.0, jitter: float = 0.0, concurrency: int = 4):
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = max(1, int(concurrency))
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._sem = asyncio.Semaphore(self.concurrency)
+
+    def configure(self, interval=None, jitter=None, concurrency=None):
+        if interval is not None: self.interval = interval
+        if jitter is not None: self.jitter = jitter
+        for b in self._buckets.values():
+            b.interval, b.jitter = self.interval, self.jitter
+        if concurrency is not None and max(1, int(concurrency)) != self.concurrency:
+            # 信号量没法改容量，换一个新的；旧的在途请求照常放行
+            self.concurrency = max(1, int(concurrency))
+            self._sem = asyncio.Semaphore(self.concurrency)
+
+    def bucket(self, gid: int) -> TokenBucket:
+        b = self._buckets.get(gid)
+        if b is None:
+            b = self._buckets[gid] = TokenBucket(self.interval, jitter=self.jitter)
+        return b
+
+    @asynccontextmanager
+    async def slot(self, gid: int):
+        """发一条消息之前进来：先等本群的令牌，再占一个全局并发名额"""
+        await self.bucket(gid).acquire()
+        async with self._sem:
+            yield
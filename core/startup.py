@@ -0,0 +1,39 @@
+from core.api import JOB_LABELS, outbox, send_jobs
+from core.media_cache import media_cache, thumbnails
+from core.meta import meta
+from core.state import state
+from core.utils import logger
+
+# [重构] 启动时读盘：配置、待审队列、发件箱、群信息缓存、媒体缓存索引
+# 以前各模块一导入就读写磁盘，进程池子进程、压测导入 core 都会碰到真实数据；现在只由 main() 调一次
+# 顺序有讲究：先读配置和队列，按配置调好日志/媒体缓存，再接上没发完的发送任务（要按条目 id 找回待审区的条目）
+
+def load_all():
+    state.load_data()
+
+    # 单例是导入时按默认配置建的，读完配置再按实际的调一遍
+    logger.configure(
+        max_bytes=int(state.log_max_mb * 1024 * 1024),
+        backup_count=state.log_backup_count,
+        rotate_daily=state.log_rotate_daily,
+        json_lines=state.log_json,
+    )
+    media_cache.configure(int(state.media_cache_mb * 1024 * 1024), state.media_cache_workers)
+    thumbnails.size = state.thumb_size
+    thumbnails.fmt = state.thumb_format if state.thumb_format in ('webp', 'jpeg') else 'webp'
+
+    try:
+        meta.load()
+    except Exception as e:
+        print(f"[Error] 读群信息缓存失败: {e}")
+
+    try:
+        media_cache.load()
+    except Exception as e:
+        print(f"[Error] 媒体缓存索引读取失败，从空缓存开始: {e}")
+
+    try:
+        outbox.load()
+    except Exception as e:
+        print(f"[Error] 读发件箱失败: {e}")
+    send_jobs.restore(JOB_LABELS)
@@ -1,11 +1,180 @@
 import json
 import os
 import asyncio
-from typing import Dict, Set, List
-from collections import OrderedDict
+from typing import Dict, Set, List, Iterable, Iterator, NamedTuple, Optional, Tuple
+from core.journal import ReviewJournal
+from core import storage
+from core.dedup import DedupIndex
+from core.persist import persist
+from core.models import PendingItem
+from core.metrics import gauge
 
 CONFIG_FILE = "config.json"
 REVIEWS_FILE = "reviews.json"
+JOURNAL_FILE = "reviews.journal"
+DEDUP_FILE = "dedup.bin"
+# 换成 SQLite 后导入并改名留底的旧文件
+LEGACY_FILES = (REVIEWS_FILE, JOURNAL_FILE, JOURNAL_FILE + ".compacting", DEDUP_FILE)
+
+class _OrderedView:
+    """某一类条目的有序 id 列表：删除只打墓碑 O(1)，翻页前按需压实，之后切片 O(page_size)"""
+    def __init__(self):
+        self.ids: List[Optional[int]] = []
+        self.pos: Dict[int, int] = {}
+        self.holes = 0
+
+    def __len__(self):
+        return len(self.pos)
+
+    def append(self, item_id: int):
+        self.pos[item_id] = len(self.ids)
+        self.ids.append(item_id)
+
+    def discard(self, item_id: int):
+        idx = self.pos.pop(item_id, None)
+        if idx is None: return
+        self.ids[idx] = None
+        self.holes += 1
+
+    def compact(self):
+        if not self.holes: return
+        self.ids = [i for i in self.ids if i is not None]
+        self.pos = {item_id: idx for idx, item_id in enumerate(self.ids)}
+        self.holes = 0
+
+    def slice(self, start: int, stop: int) -> List[int]:
+        self.compact()
+        return self.ids[start:stop]
+
+    def index(self, item_id: int) -> int:
+        self.compact()
+        return self.pos[item_id]
+
+    def __iter__(self):
+        return (i for i in self.ids if i is not None)
+
+class PendingQueue:
+    """待审队列：id 索引 + 按栏目的有序子视图，全部操作不扫整表"""
+    def __init__(self):
+        self._items: Dict[int, PendingItem] = {}
+        self._views: Dict[str, _OrderedView] = {k: _OrderedView() for k in ('media', 'forward', 'other')}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[PendingItem]:
+        return iter(list(self._items.values()))
+
+    def __contains__(self, item_id) -> bool:
+        return item_id in self._items
+
+    def get(self, item_id) -> Optional[PendingItem]:
+        return self._items.get(item_id)
+
+    def add(self, item: PendingItem):
+        if item.id in self._items: return
+        self._items[item.id] = item
+        self._views[item.kind].append(item.id)
+
+    def remove(self, ids: Iterable) -> List[PendingItem]:
+        removed = []
+        for item_id in ids:
+            item = self._items.pop(item_id, None)
+            if item is None: continue
+            self._views[item.kind].discard(item_id)
+            removed.append(item)
+        return removed
+
+    def clear(self):
+        self.__init__()
+
+    # ---------- 按栏目查询 ----------
+    def count(self, kind: str) -> int:
+        return len(self._views[kind])
+
+    def items(self, kind: str) -> Iterator[PendingItem]:
+        return (self._items[i] for i in list(self._views[kind]))
+
+    def head(self, kind: str, n: int) -> List[PendingItem]:
+        return [self._items[i] for i in self._views[kind].slice(0, n)]
+
+    def page(self, kind: str, page: int, size: int) -> List[Tuple[int, PendingItem]]:
+        """返回 [(栏目内序号, 条目), ...]"""
+        start = (page - 1) * size
+        ids = self._views[kind].slice(start, start + size)
+        return [(start + n, self._items[i]) for n, i in enumerate(ids)]
+
+    def at(self, kind: str, index: int) -> Optional[PendingItem]:
+        ids = self._views[kind].slice(index, index + 1)
+        return self._items[ids[0]] if ids else None
+
+    def index_of(self, item_id) -> int:
+        return self._views[self._items[item_id].kind].index(item_id)
+
+    def resolve(self, ids: Iterable) -> List[PendingItem]:
+        """按 id 取回仍在队列里的条目，按入队顺序排（id 是递增分配的）"""
+        return [self._items[i] for i in sorted(ids) if i in self._items]
+
+# ---------- 事件总线 ----------
+# 后台（收消息、自动打包、断线）只管 publish，每个打开的页面有自己的有界队列，收到就立刻处理
+# 页面闲着时 await 在空队列上，不占 CPU；队列满了丢最老的事件并标记 overflow，页面收到后整页刷新一次
+
+EVENT_ITEM_ADDED = 'item_added'
+EVENT_ITEM_REMOVED = 'item_removed'
+EVENT_QUEUE_CLEARED = 'queue_cleared'
+EVENT_META_CHANGED = 'meta_changed'
+EVENT_STATUS_CHANGED = 'status_changed'
+EVENT_NOTIFY = 'notify'
+EVENT_JOB_UPDATED = 'job_updated'
+EVENT_OVERFLOW = 'overflow'
+# [新增] 某个媒体的缩略图做好了，页面把对应卡片换成小图
+EVENT_THUMB_READY = 'thumb_ready'
+
+QUEUE_EVENTS = {EVENT_ITEM_ADDED, EVENT_ITEM_REMOVED, EVENT_QUEUE_CLEARED, EVENT_OVERFLOW}
+
+class Event(NamedTuple):
+    type: str
+    data: dict
+
+class EventBus:
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._subscribers: List[asyncio.Queue] = []
+
+    def subscribe(self) -> asyncio.Queue:
+        q = asyncio.Queue(maxsize=self.maxsize)
+        self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        try: self._subscribers.remove(q)
+        except ValueError: pass
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def publish(self, event_type: str, **data):
+        if not self._subscribers: return
+        ev = Event(event_type, data)
+        for q in self._subscribers:
+            try:
+                q.put_nowait(ev)
+            except asyncio.QueueFull:
+                self._overflow(q, ev)
+
+    def _overflow(self, q: asyncio.Queue, ev: Event):
+        # 慢客户端：队列里的增删改事件全部作废，换成一条 overflow 让它整页刷新；通知和状态保留
+        kept = []
+        while not q.empty():
+            old = q.get_nowait()
+            if old.type in (EVENT_NOTIFY, EVENT_STATUS_CHANGED): kept.append(old)
+        kept = kept[-(self.maxsize // 2):]
+        q.put_nowait(Event(EVENT_OVERFLOW, {}))
+        for old in kept: q.put_nowait(old)
+        # 增删改事件已经被 overflow 覆盖，不用再塞
+        if ev.type not in QUEUE_EVENTS:
+            try: q.put_nowait(ev)
+            except asyncio.QueueFull: pass
 
 class BotState:
     def __init__(self):
@@ -27,32 +196,91 @@ class BotState:
         self.warn_interval_minutes: int = 30
         self.last_warn_time: float = 0.0
 
-        # [新增] 分页控制
-        self.media_page: int = 1
-        self.media_page_max: int = 1
-        self.forward_page: int = 1
-        self.forward_page_max: int = 1
+        # [新增] 去重窗口：按天数和条数双重限制
+        self.dedup_window_days: float = 14
+        self.dedup_max_entries: int = 200000
+
+        # [新增] 感知哈希近似去重（需要 Pillow），动作: flag 只标记 / drop 直接丢弃
+        self.phash_enabled: bool = False
+        self.phash_distance: int = 6
+        self.phash_action: str = "flag"
+        self.phash_history: int = 5000
+
+        # [新增] 运行日志轮转设置
+        self.log_max_mb: float = 5
+        self.log_backup_count: int = 5
+        self.log_rotate_daily: bool = False
+        self.log_json: bool = False
+
+        # [新增] 发送调度：每个目标群两条消息之间的最小间隔(秒) + 随机抖动，全局同时在途的请求数
+        self.send_group_interval: float = 2.0
+        self.send_jitter: float = 1.5
+        self.send_concurrency: int = 4
+
+        # [新增] 自动打包的另外两种触发：最老一条等了多久(分钟) / 媒体包估算体积(MB)，0 为不启用；失败后批量最小缩到多少
+        self.auto_pack_max_age_minutes: float = 0
+        self.auto_pack_max_mb: float = 0
+        self.auto_pack_min_batch: int = 3
+
+        # [新增] 本地媒体缓存：入库就下到本地，防裂图；发送时可以改用本地文件
+        self.media_cache_enabled: bool = True
+        self.media_cache_mb: float = 1024
+        self.media_cache_workers: int = 4
+        self.media_send_local: bool = False
+
+        # [新增] 媒体网格缩略图：边长（像素）和格式 webp / jpeg
+        self.thumb_size: int = 320
+        self.thumb_format: str = 'webp'
+
+        # [新增] 连接管理：备用 NapCat 地址（主地址连不上时依次尝试）、重连最长间隔、静默多久发 ping 探活
+        self.ws_backup_urls: List[str] = []
+        self.ws_reconnect_max: float = 60.0
+        self.ws_probe_after: float = 10.0
+
+        # [新增] 收消息流水线：读循环和入库处理之间的有界队列；满了怎么办 drop_oldest / drop_newest / block
+        self.ingest_queue_size: int = 1000
+        self.ingest_workers: int = 4
+        self.ingest_policy: str = 'drop_oldest'
+
+        # [新增] 性能排查（默认关）：热点阶段计时 + 慢回调检测，/admin/profile 抓 profile
+        self.trace_enabled: bool = False
+        self.trace_slow_ms: float = 100.0
+        self.profile_endpoint: bool = False
+
+        # [新增] 存储后端：sqlite（banshi.db，WAL 模式）或 json（reviews.json + 日志）；第一次用 sqlite 会自动导入旧文件
+        self.storage_backend: str = 'sqlite'
+
+        # [新增] 审核区显示方式的默认值：False 固定分页，True 滚动加载（每个页面可以自己切）
+        self.ui_virtual_scroll: bool = False
         
         self.connected = False
         self.running = False
         self.ws = None
         
-        self.pending_list: List[dict] = []
-        self.dedup_dict: OrderedDict = OrderedDict() 
-        self.MAX_DEDUP_SIZE = 2000 
+        # [重构] 待审队列改为带索引的结构，按 id 增删 O(1)，按栏目翻页不扫全表
+        self.queue = PendingQueue()
+        self._next_item_id = 1
+        self._legacy_ids: Dict[str, int] = {}
+        # [重构] 去重改为定长摘要索引，单独存 dedup.bin，不再塞进 reviews.json
+        self.dedup = DedupIndex(DEDUP_FILE, self.dedup_max_entries, self.dedup_window_days)
+        self.dedup.on_dirty = lambda: persist.mark_dirty('dedup')
+        persist.register('dedup', self.dedup.flush)
+        # [新增] 队列变更走追加日志，reviews.json 只做快照
+        self.journal = ReviewJournal(REVIEWS_FILE, JOURNAL_FILE)
+        # [新增] 所有写盘都交给后台线程，这里只打标记
+        self.journal.on_dirty = lambda: persist.mark_dirty('reviews')
+        # 读完配置后可能换成 SQLite 版，落盘时取当前的那个
+        persist.register('reviews', lambda: self.journal.flush())
+        self.db: Optional[storage.SqliteStore] = None
+        persist.register('config', self._write_config)
         
         self.group_info_cache: Dict[int, dict] = {} 
         self.user_info_cache: Dict[int, dict] = {} 
         
-        self.ui_needs_refresh = False
-        self.api_futures: Dict[str, asyncio.Future] = {} 
+        # [重构] 前端刷新改为事件推送，取代 1 秒轮询的 ui_needs_refresh / notify_queue
+        self.events = EventBus()
         
-        self.preview_index: int = -1
-        self.is_processing: bool = False 
         self.disconnect_time: float = 0.0 
-        
-        # [新增] 专门给后台任务给前端发通知的信箱
-        self.notify_queue: List[tuple] = [] 
 
     def load_data(self):
         if os.path.exists(CONFIG_FILE):
@@ -72,23 +300,129 @@ class BotState:
                     self.warn_media_count = data.get('warn_media_count', 50)
                     self.warn_forward_count = data.get('warn_forward_count', 20)
                     self.warn_interval_minutes = data.get('warn_interval_minutes', 30)
+                    self.dedup_window_days = data.get('dedup_window_days', 14)
+                    self.dedup_max_entries = data.get('dedup_max_entries', 200000)
+                    self.phash_enabled = data.get('phash_enabled', False)
+                    self.phash_distance = data.get('phash_distance', 6)
+                    self.phash_action = data.get('phash_action', "flag")
+                    self.phash_history = data.get('phash_history', 5000)
+                    self.ui_virtual_scroll = data.get('ui_virtual_scroll', False)
+                    self.log_max_mb = data.get('log_max_mb', 5)
+                    self.log_backup_count = data.get('log_backup_count', 5)
+                    self.log_rotate_daily = data.get('log_rotate_daily', False)
+                    self.log_json = data.get('log_json', False)
+                    self.send_group_interval = data.get('send_group_interval', 2.0)
+                    self.send_jitter = data.get('send_jitter', 1.5)
+                    self.send_concurrency = data.get('send_concurrency', 4)
+                    self.auto_pack_max_age_minutes = data.get('auto_pack_max_age_minutes', 0)
+                    self.auto_pack_max_mb = data.get('auto_pack_max_mb', 0)
+                    self.auto_pack_min_batch = data.get('auto_pack_min_batch', 3)
+                    self.media_cache_enabled = data.get('media_cache_enabled', True)
+                    self.media_cache_mb = data.get('media_cache_mb', 1024)
+                    self.media_cache_workers = data.get('media_cache_workers', 4)
+                    self.media_send_local = data.get('media_send_local', False)
+                    self.thumb_size = data.get('thumb_size', 320)
+                    self.thumb_format = data.get('thumb_format', 'webp')
+                    self.ws_backup_urls = data.get('ws_backup_urls', [])
+                    self.ws_reconnect_max = data.get('ws_reconnect_max', 60.0)
+                    self.ws_probe_after = data.get('ws_probe_after', 10.0)
+                    self.ingest_queue_size = data.get('ingest_queue_size', 1000)
+                    self.ingest_workers = data.get('ingest_workers', 4)
+                    self.ingest_policy = data.get('ingest_policy', 'drop_oldest')
+                    self.trace_enabled = data.get('trace_enabled', False)
+                    self.trace_slow_ms = data.get('trace_slow_ms', 100.0)
+                    self.profile_endpoint = data.get('profile_endpoint', False)
+                    self.storage_backend = data.get('storage_backend', 'sqlite')
             except Exception as e:
                 print(f"[Error] 读配置挂了: {e}")
 
-        if os.path.exists(REVIEWS_FILE):
-            try:
-                with open(REVIEWS_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.pending_list = data.get('list', [])
-                    saved_dedups = data.get('dedup', [])
-                    for d in saved_dedups:
-                        self.dedup_dict[d] = True
-                        if len(self.dedup_dict) > self.MAX_DEDUP_SIZE:
-                            self.dedup_dict.popitem(last=False)
-            except Exception as e:
-                print(f"[Error] 读本地历史数据失败: {e}")
+        self.dedup.max_entries = self.dedup_max_entries
+        self.dedup.window_days = self.dedup_window_days
+
+        # [新增] 按配置选存储后端；第一次用 SQLite 时从旧的 reviews.json / 日志 / dedup.bin 导入
+        migrating = False
+        db = self._open_storage()
+        if db is not None and storage.migrated_at(db) is None:
+            if any(os.path.exists(p) for p in LEGACY_FILES): migrating = True
+            else: storage.mark_migrated(db)
+        source = ReviewJournal(REVIEWS_FILE, JOURNAL_FILE) if migrating else self.journal
+
+        try:
+            if migrating: self.dedup.import_file()
+            else: self.dedup.load()
+        except Exception as e:
+            print(f"[Error] 读去重索引失败: {e}")
+
+        legacy_dedup = False
+        try:
+            data = source.load_snapshot()
+            # [新增] 编号只增不减：队列清空重启后不会复用旧编号，回放旧日志也删不到新条目
+            self._next_item_id = max(self._next_item_id, int(data.get('next_id', 0)))
+            for row in data.get('rows', []):
+                self._restore(PendingItem.from_row(row))
+            # 旧版快照存的是字典条目 + uuid，转成新结构
+            for d in data.get('list', []):
+                self._restore(self._from_legacy(d))
+            # 旧版快照里的去重键，迁移进新索引
+            for d in data.get('dedup', []):
+                self.dedup.add_legacy(d)
+                legacy_dedup = True
+        except Exception as e:
+            print(f"[Error] 读本地历史数据失败: {e}")
+
+        try:
+            for rec in source.replay():
+                self._apply(rec)
+        except Exception as e:
+            print(f"[Error] 回放队列日志失败: {e}")
+
+        # 迁移完旧去重键 / 旧字典条目后重压一次快照，下次启动就不会重复迁移
+        if migrating:
+            self._migrate_to_sqlite(db, source)
+        elif legacy_dedup or self._legacy_ids:
+            self.save_reviews()
+        self._legacy_ids = {}
+
+    def _open_storage(self) -> Optional[storage.SqliteStore]:
+        if self.storage_backend != 'sqlite': return None
+        if not storage.available():
+            print("[Warn] 当前 Python 没有 sqlite3 模块，继续用 JSON 文件存储")
+            return None
+        try:
+            db = storage.SqliteStore(storage.DB_FILE)
+        except Exception as e:
+            print(f"[Error] 打不开 {storage.DB_FILE}，继续用 JSON 文件存储: {e}")
+            return None
+        self.db = db
+        self.journal = storage.SqliteReviewJournal(db)
+        self.journal.on_dirty = lambda: persist.mark_dirty('reviews')
+        self.dedup.store = db
+        return db
+
+    def _migrate_to_sqlite(self, db: storage.SqliteStore, legacy: ReviewJournal):
+        # 整表写进库并同步提交，成功后旧文件改名留底 (.migrated)，下次启动不再导入
+        try:
+            self.save_reviews()
+            self.journal.flush()
+            self.dedup.flush()
+            storage.mark_migrated(db)
+        except Exception as e:
+            # 导入失败这次就还用旧文件，别让两边数据分叉
+            print(f"[Error] 导入旧数据到 {storage.DB_FILE} 失败，本次继续用 JSON 文件: {e}")
+            self.db = None
+            self.journal = legacy
+            self.journal.on_dirty = lambda: persist.mark_dirty('reviews')
+            self.dedup.store = None
+            return
+        for path in LEGACY_FILES:
+            if os.path.exists(path): os.replace(path, path + ".migrated")
+        print(f"[Storage] 旧数据已导入 {storage.DB_FILE}：待审 {len(self.queue)} 条，去重记录 {len(self.dedup)} 条")
 
     def save_config(self):
+        persist.mark_dirty('config')
+
+    def _write_config(self):
+        # 写盘线程里执行，读到的是落盘那一刻的最新配置
         data = {
             'ws_url': self.ws_url,
             'ws_token': self.ws_token,
@@ -102,28 +436,142 @@ class BotState:
             'auto_pack_threshold': self.auto_pack_threshold,
             'warn_media_count': self.warn_media_count,
             'warn_forward_count': self.warn_forward_count,
-            'warn_interval_minutes': self.warn_interval_minutes
+            'warn_interval_minutes': self.warn_interval_minutes,
+            'dedup_window_days': self.dedup_window_days,
+            'dedup_max_entries': self.dedup_max_entries,
+            'phash_enabled': self.phash_enabled,
+            'phash_distance': self.phash_distance,
+            'phash_action': self.phash_action,
+            'phash_history': self.phash_history,
+            'ui_virtual_scroll': self.ui_virtual_scroll,
+            'log_max_mb': self.log_max_mb,
+            'log_backup_count': self.log_backup_count,
+            'log_rotate_daily': self.log_rotate_daily,
+            'log_json': self.log_json,
+            'send_group_interval': self.send_group_interval,
+            'send_jitter': self.send_jitter,
+            'send_concurrency': self.send_concurrency,
+            'auto_pack_max_age_minutes': self.auto_pack_max_age_minutes,
+            'auto_pack_max_mb': self.auto_pack_max_mb,
+            'auto_pack_min_batch': self.auto_pack_min_batch,
+            'media_cache_enabled': self.media_cache_enabled,
+            'media_cache_mb': self.media_cache_mb,
+            'media_cache_workers': self.media_cache_workers,
+            'media_send_local': self.media_send_local,
+            'thumb_size': self.thumb_size,
+            'thumb_format': self.thumb_format,
+            'ws_backup_urls': self.ws_backup_urls,
+            'ws_reconnect_max': self.ws_reconnect_max,
+            'ws_probe_after': self.ws_probe_after,
+            'ingest_queue_size': self.ingest_queue_size,
+            'ingest_workers': self.ingest_workers,
+            'ingest_policy': self.ingest_policy,
+            'trace_enabled': self.trace_enabled,
+            'trace_slow_ms': self.trace_slow_ms,
+            'profile_endpoint': self.profile_endpoint,
+            'storage_backend': self.storage_backend
         }
-        try:
-            with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-        except: pass
+        # [优化] 先写临时文件再替换，写到一半崩溃不会留下半截 config.json
+        tmp = CONFIG_FILE + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp, CONFIG_FILE)
 
     def save_reviews(self):
-        data = {
-            'list': self.pending_list,
-            'dedup': list(self.dedup_dict.keys())
-        }
+        # 强制压一次完整快照，平时的增删改都走下面的日志接口
+        self.journal.compact(self._snapshot)
+
+    def _snapshot(self) -> dict:
+        # 在事件循环线程里先转成行，写盘线程只管 json.dump，不会读到正被修改的条目
+        return {'version': 3, 'next_id': self._next_item_id, 'rows': [i.to_row() for i in self.queue]}
+
+    # ---------- 审核网格分页 ----------
+    def count_items(self, kind: str) -> int:
+        if self.db is None or not self._sync_db(): return self.queue.count(kind)
+        return self.db.count_items(kind)
+
+    def page_items(self, kind: str, page: int, size: int) -> List[Tuple[int, PendingItem]]:
+        """SQLite 后端直接按 (kind, id) 索引分页，JSON 后端用内存里的队列；返回 [(栏目内序号, 条目), ...]"""
+        if self.db is None or not self._sync_db(): return self.queue.page(kind, page, size)
+        start = (page - 1) * size
+        # 条目对象还是用内存里那一份，页面上的勾选/卡片按对象和 id 认
+        items = [self.queue.get(row[0]) for row in self.db.page_items(kind, start, size)]
+        return [(start + n, item) for n, item in enumerate(i for i in items if i is not None)]
+
+    def _sync_db(self) -> bool:
+        # 写盘线程还没提交的增删先写进库，查出来的才和内存一致；写不进去这次就退回内存分页
         try:
-            with open(REVIEWS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
-        except: pass
+            self.journal.flush()
+            return True
+        except Exception as e:
+            print(f"[Error] 待审条目写库失败，先按内存分页: {e}")
+            return False
 
-    def request_ui_refresh(self):
-        self.ui_needs_refresh = True
+    def new_item_id(self) -> int:
+        item_id = self._next_item_id
+        self._next_item_id += 1
+        return item_id
 
-state = BotState()
+    def _restore(self, item: PendingItem):
+        self.queue.add(item)
+        if item.id >= self._next_item_id: self._next_item_id = item.id + 1
+
+    def _from_legacy(self, d: dict) -> PendingItem:
+        return PendingItem.from_legacy(self._legacy_id(d['id']), d)
 
-state.load_data()
+    def _legacy_id(self, item_id):
+        if isinstance(item_id, int): return item_id
+        if item_id not in self._legacy_ids:
+            self._legacy_ids[item_id] = self.new_item_id()
+        return self._legacy_ids[item_id]
 
+    def _apply(self, rec: dict):
+        # 回放单条日志，所有操作都是幂等的，重复回放不会出错
+        op = rec.get('op')
+        if op == 'add':
+            self._restore(PendingItem.from_row(rec['row']))
+        elif op == 'remove':
+            self.queue.remove(rec.get('ids', []))
+        elif op == 'clear':
+            self.queue.clear()
+
+    def _journal(self, op: str, **fields):
+        self.journal.append(op, **fields)
+        if self.journal.needs_compaction():
+            self.journal.compact(self._snapshot)
+
+    # ---------- 队列操作（每次只追加一条日志，O(1)） ----------
+    def add_item(self, item: PendingItem):
+        self.queue.add(item)
+        self._journal('add', row=item.to_row())
+        self.events.publish(EVENT_ITEM_ADDED, id=item.id, kind=item.kind)
+
+    def remove_items(self, ids) -> List[PendingItem]:
+        removed = self.queue.remove(ids)
+        if removed:
+            self._journal('remove', ids=[i.id for i in removed])
+            self.events.publish(EVENT_ITEM_REMOVED, ids=[i.id for i in removed])
+        return removed
+
+    def clear_items(self):
+        self.queue.clear()
+        self._journal('clear')
+        self.events.publish(EVENT_QUEUE_CLEARED)
+
+    def notify(self, msg_type: str, text: str):
+        # 后台任务给所有打开的页面弹通知
+        self.events.publish(EVENT_NOTIFY, type=msg_type, text=text)
+
+    def set_status(self, status: str):
+        self.events.publish(EVENT_STATUS_CHANGED, status=status)
+
+    def request_ui_refresh(self):
+        # 群/审核员信息之类的元数据有更新
+        self.events.publish(EVENT_META_CHANGED)
+
+state = BotState()
 
+# [新增] 待审队列各栏目的长度，/metrics 抓取时现算
+gauge('pending_queue_depth', "待审队列长度（按栏目）", ('type',),
+      fn=lambda: {k: state.queue.count(k) for k in ('media', 'forward', 'other')})
+gauge('napcat_connected', "当前是否连着 NapCat", fn=lambda: int(state.connected))
@@ -0,0 +1,205 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from itertools import groupby
+from typing import Iterator, List, Optional, Tuple
+from core.models import ItemType
+
+try:
+    import sqlite3
+except ImportError:   # 个别精简版 Python 没带 sqlite3，就继续用 JSON 文件
+    sqlite3 = None
+
+# SQLite 存储（WAL 模式）：待审条目和去重摘要放进同一个 banshi.db
+# 启动只读一张表，不用解析快照再回放日志；写入由写盘线程攒一批、一个事务提交，崩溃时要么整批生效要么整批不算
+# 对外接口和 ReviewJournal 一样（append / compact / flush / load_snapshot / replay），BotState 不关心底下是哪种存储
+
+DB_FILE = "banshi.db"
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    type INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    row TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_kind ON items (kind, id);
+CREATE INDEX IF NOT EXISTS items_type_ts ON items (type, ts);
+CREATE TABLE IF NOT EXISTS dedup (digest BLOB PRIMARY KEY, ts REAL NOT NULL) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS dedup_ts ON dedup (ts);
+"""
+
+def available() -> bool:
+    return sqlite3 is not None
+
+class SqliteStore:
+    def __init__(self, path: str = DB_FILE):
+        self.path = path
+        # 读写都在加锁的前提下进行，事件循环线程（启动加载）和写盘线程共用一个连接
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            # WAL 下 NORMAL 只在断电时可能丢最后一个事务，不会损坏库
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(_SCHEMA)
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema', ?)", (str(SCHEMA_VERSION),))
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                yield cur
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            cur.execute("COMMIT")
+
+    def _query(self, sql: str, args=()) -> list:
+        with self._lock:
+            return self.conn.execute(sql, args).fetchall()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def set_meta(self, key: str, value: str):
+        with self.transaction() as cur:
+            cur.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # ---------- 待审条目 ----------
+    def load_item_rows(self) -> List[list]:
+        return [json.loads(r[0]) for r in self._query("SELECT row FROM items ORDER BY id")]
+
+    def count_items(self, kind: Optional[str] = None) -> int:
+        if kind is None: return self._query("SELECT COUNT(*) FROM items")[0][0]
+        return self._query("SELECT COUNT(*) FROM items WHERE kind = ?", (kind,))[0][0]
+
+    def page_items(self, kind: str, offset: int, limit: int) -> List[list]:
+        """按栏目分页，走 (kind, id) 索引；和 PendingQueue.page 的顺序一致"""
+        rows = self._query("SELECT row FROM items WHERE kind = ? ORDER BY id LIMIT ? OFFSET ?",
+                           (kind, int(limit), int(offset)))
+        return [json.loads(r[0]) for r in rows]
+
+    # ---------- 去重摘要 ----------
+    def load_dedup(self) -> Iterator[Tuple[float, bytes]]:
+        return iter(self._query("SELECT ts, digest FROM dedup ORDER BY ts"))
+
+    def count_dedup(self) -> int:
+        return self._query("SELECT COUNT(*) FROM dedup")[0][0]
+
+    def write_dedup(self, records: List[Tuple[bytes, float]], cutoff: float = 0.0, max_entries: int = 0):
+        with self.transaction() as cur:
+            if records:
+                cur.executemany("INSERT OR REPLACE INTO dedup (digest, ts) VALUES (?, ?)", records)
+            if cutoff > 0:
+                cur.execute("DELETE FROM dedup WHERE ts < ?", (cutoff,))
+            if max_entries > 0:
+                cur.execute("DELETE FROM dedup WHERE digest IN "
+                            "(SELECT digest FROM dedup ORDER BY ts LIMIT max(0, (SELECT COUNT(*) FROM dedup) - ?))",
+                            (max_entries,))
+
+    def close(self):
+        with self._lock:
+            try:
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                self.conn.close()
+
+class SqliteReviewJournal:
+    """ReviewJournal 的 SQLite 版：调用方线程只往缓冲里记操作，flush 时一个事务批量写"""
+    def __init__(self, store: SqliteStore):
+        self.store = store
+        self.records = 0
+        self.on_dirty = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    # ---------- 读 ----------
+    def load_snapshot(self) -> dict:
+        return {'version': 3, 'next_id': int(self.store.get_meta('next_item_id') or 0),
+                'rows': self.store.load_item_rows()}
+
+    def replay(self) -> Iterator[dict]:
+        # 每次提交都是完整事务，没有需要回放的日志
+        return iter(())
+
+    # ---------- 写（调用方线程） ----------
+    def append(self, op: str, **fields):
+        with self._lock:
+            self._buffer.append((op, fields))
+        self.records += 1
+        self._notify()
+
+    def needs_compaction(self) -> bool:
+        return False
+
+    def compact(self, make_snapshot):
+        # 整表替换（迁移旧数据、强制保存时用）
+        data = make_snapshot()
+        with self._lock:
+            self._buffer.append(('snapshot', data))
+        self.records = 0
+        self._notify()
+
+    def _notify(self):
+        if self.on_dirty: self.on_dirty()
+
+    # ---------- 落盘（写盘线程） ----------
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch: return
+            try:
+                with self.store.transaction() as cur:
+                    next_id = 0
+                    # 连续的同类操作合成一次 executemany，顺序不变
+                    for op, group in groupby(batch, key=lambda e: e[0]):
+                        fields = [f for _, f in group]
+                        if op == 'add':
+                            self._insert(cur, [f['row'] for f in fields])
+                            next_id = max(next_id, max(f['row'][0] for f in fields) + 1)
+                        elif op == 'remove':
+                            cur.executemany("DELETE FROM items WHERE id = ?",
+                                            [(i,) for f in fields for i in f.get('ids', [])])
+                        elif op == 'clear':
+                            cur.execute("DELETE FROM items")
+                        elif op == 'snapshot':
+                            cur.execute("DELETE FROM items")
+                            self._insert(cur, fields[-1].get('rows', []))
+                            next_id = max(next_id, fields[-1].get('next_id', 0))
+                    # 编号高水位单独记在 meta 里，表清空了也不会回退
+                    if next_id:
+                        cur.execute("INSERT INTO meta (key, value) VALUES ('next_item_id', ?) "
+                                    "ON CONFLICT (key) DO UPDATE SET value = max(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER))",
+                                    (str(next_id),))
+            except Exception:
+                # 整批没提交（比如库被别的进程锁住），放回缓冲等下一次
+                with self._lock:
+                    self._buffer[:0] = batch
+                self._notify()
+                raise
+
+    @staticmethod
+    def _insert(cur, rows: list):
+        params = [(r[0], ItemType(r[1]).kind, r[1], r[2], json.dumps(r, ensure_ascii=False, separators=(',', ':')))
+                  for r in rows]
+        cur.executemany("INSERT OR REPLACE INTO items (id, kind, type, ts, row) VALUES (?, ?, ?, ?, ?)", params)
+
+    def close(self):
+        self.flush()
+
+def migrated_at(store: SqliteStore) -> Optional[float]:
+    v = store.get_meta('migrated_json')
+    return float(v) if v else None
+
+def mark_migrated(store: SqliteStore):
+    store.set_meta('migrated_json', repr(time.time()))
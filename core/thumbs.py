@@ -0,0 +1,132 @@
+import asyncio
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Set
+
+# 缩略图：媒体网格只显示小图，原图只在全屏画廊里加载
+# 图片用 Pillow 缩成 WebP（或 JPEG），视频有 ffmpeg 就截一帧当封面；都在进程池里跑，不卡事件循环
+# 按内容摘要 + 尺寸缓存，同一张图不管来自哪个链接只做一次
+# 注意：这个模块会被进程池的子进程导入，不要在顶层 import core.state / core.media_cache
+# spawn 方式（Windows）的子进程还会以 __mp_main__ 导入 main.py，启动逻辑要留在 main() 里，别放回 main.py 顶层
+# Pillow、ffmpeg 都是可选的，缺哪个就关哪一半，网格退回原来的显示方式
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+VIDEO_EXTS = ('.mp4', '.mov', '.webm')
+
+def available() -> bool:
+    return Image is not None
+
+def find_ffmpeg() -> Optional[str]:
+    return shutil.which('ffmpeg')
+
+# ---------- 子进程里跑的纯函数 ----------
+def render_image(src: str, dest: str, size: int, fmt: str = 'webp') -> str:
+    tmp = dest + '.part'
+    with Image.open(src) as img:
+        img.seek(0)   # GIF 只取第一帧
+        img.thumbnail((size, size))
+        if fmt == 'webp':
+            if img.mode not in ('RGB', 'RGBA'): img = img.convert('RGBA')
+            img.save(tmp, 'WEBP', quality=75, method=4)
+        else:
+            if img.mode != 'RGB': img = img.convert('RGB')
+            img.save(tmp, 'JPEG', quality=80, optimize=True, progressive=True)
+    os.replace(tmp, dest)
+    return dest
+
+def render_video_poster(src: str, dest: str, size: int, ffmpeg: str) -> str:
+    tmp = dest + '.part.jpg'
+    scale = f"scale='min({size},iw)':'min({size},ih)':force_original_aspect_ratio=decrease"
+    # 先取第 1 秒（开头常是黑屏），太短的视频再退回第一帧
+    for seek in ('1', '0'):
+        subprocess.run([ffmpeg, '-v', 'error', '-y', '-ss', seek, '-i', src, '-frames:v', '1', '-vf', scale, tmp],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30)
+        if os.path.exists(tmp) and os.path.getsize(tmp) > 0: break
+    else:
+        raise RuntimeError("ffmpeg 没截出画面")
+    os.replace(tmp, dest)
+    return dest
+
+class ThumbnailService:
+    """挂在媒体缓存后面：原图落盘后排队生成缩略图，做好了回调一下让页面换图"""
+    def __init__(self, root: str, size: int = 320, fmt: str = 'webp', workers: int = 2, url_prefix: str = '/thumbs'):
+        self.root = root
+        self.size = size
+        self.fmt = fmt if fmt in ('webp', 'jpeg') else 'webp'
+        self.workers = workers
+        self.url_prefix = url_prefix
+        self.ffmpeg = find_ffmpeg()
+        self.on_ready: Optional[Callable[[str, str], None]] = None   # (媒体缓存的 key, 缩略图地址)
+        self._ready: Set[str] = set()
+        self._inflight: Set[str] = set()
+        self._failed: Set[str] = set()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.stats = {'made': 0, 'failed': 0}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def can_render(self, ext: str) -> bool:
+        if ext in VIDEO_EXTS: return self.ffmpeg is not None
+        return available()
+
+    def name_for(self, digest: str, ext: str) -> str:
+        out = '.jpg' if ext in VIDEO_EXTS or self.fmt == 'jpeg' else '.webp'
+        return f"{digest[:2]}/{digest}_{self.size}{out}"
+
+    def lookup(self, digest: str, ext: str) -> Optional[str]:
+        """做好了返回地址，没做好返回 None（不排队）"""
+        name = self.name_for(digest, ext)
+        if name not in self._ready:
+            if not os.path.exists(os.path.join(self.root, name)): return None
+            self._ready.add(name)
+        return f"{self.url_prefix}/{name}"
+
+    def request(self, key: str, digest: str, ext: str, src: str):
+        """排队生成；同一份内容同时只做一次，做不了/做失败过的不再重试"""
+        if not self.can_render(ext): return
+        name = self.name_for(digest, ext)
+        if name in self._ready or name in self._inflight or name in self._failed: return
+        self._inflight.add(name)
+        asyncio.create_task(self._render(key, name, ext, src))
+
+    async def _render(self, key: str, name: str, ext: str, src: str):
+        dest = os.path.join(self.root, name)
+        try:
+            if not os.path.exists(dest):
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                loop = asyncio.get_running_loop()
+                if ext in VIDEO_EXTS:
+                    job = loop.run_in_executor(self._get_pool(), render_video_poster, src, dest, self.size, self.ffmpeg)
+                else:
+                    job = loop.run_in_executor(self._get_pool(), render_image, src, dest, self.size, self.fmt)
+                await job
+                self.stats['made'] += 1
+            self._ready.add(name)
+            if self.on_ready: self.on_ready(key, f"{self.url_prefix}/{name}")
+        except Exception as e:
+            self._failed.add(name)
+            self.stats['failed'] += 1
+            print(f"[thumb] 缩略图生成失败 ({os.path.basename(src)}): {e}")
+        finally:
+            self._inflight.discard(name)
+
+    def discard(self, digest: str, ext: str):
+        # 原图被淘汰时缩略图一起删
+        name = self.name_for(digest, ext)
+        self._ready.discard(name)
+        try: os.remove(os.path.join(self.root, name))
+        except OSError: pass
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -1,10 +1,12 @@
 import time
-import uuid
 import os
 from typing import Optional, List
 from core.state import state
-
-log_subscribers = []
+from core.persist import persist
+from core.logger import BotLogger
+from core.dedup import make_digest
+from core.models import PendingItem, ItemType, make_seg
+from core.metrics import counter
 
 # [修复权限报错] 获取项目根目录的绝对路径，并安全地创建 logs 文件夹
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -14,35 +16,26 @@ try:
 except Exception as e:
     print(f"[警告] 无法创建日志文件夹: {e}")
 
-def add_log(msg: str):
-    timestamp = time.strftime("%H:%M:%S")
-    full_msg = f"[{timestamp}] {msg}"
-    print(full_msg)
-    
-    try:
-        # 使用绝对路径写入日志
-        log_file = os.path.join(LOG_DIR, "bot_run.log")
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {msg}\n")
-    except: pass
+# [重构] 日志交给 BotLogger：环形缓冲 + 批量落盘 + 轮转
+# 轮转参数要等读完配置，由 core.startup 设
+logger = BotLogger(LOG_DIR)
+persist.register('log', logger.flush)
 
-    for sub in log_subscribers:
-        try: sub(full_msg)
-        except: pass
+# [新增] 来源群消息按处理结果计数：received / ingested / deduped / ignored / near_dup
+group_messages = counter('group_messages_total', "来源群消息数（按处理结果）", ('group', 'outcome'))
+
+def add_log(msg: str):
+    logger.log(msg)
 
 def get_avatar_url(id_val, is_group=True):
     if is_group:
         return f"https://p.qlogo.cn/gh/{id_val}/{id_val}/100"
     return f"https://q1.qlogo.cn/g?b=qq&nk={id_val}&s=100"
 
-def generate_uuid():
-    return str(uuid.uuid4())
-
-def process_message_content(message_chain: List[dict]) -> Optional[dict]:
+def process_message_content(message_chain: List[dict], group_id=None) -> Optional[PendingItem]:
     if not message_chain: return None
     
-    clean_segments = [] 
-    previews = []       
+    segments = [] 
     unique_hashes = []  
     msg_type = "unknown" 
     has_text = False
@@ -57,8 +50,7 @@ def process_message_content(message_chain: List[dict]) -> Optional[dict]:
         elif stype == 'image':
             url = data.get('url')
             if url:
-                clean_segments.append({"type": "image", "data": {"file": url, "url": url}})
-                previews.append({'type': 'image', 'url': url})
+                segments.append(make_seg('image', url))
                 unique_hashes.append(data.get('file') or url)
                 if msg_type == "unknown": msg_type = "image"
                 elif msg_type != "image": msg_type = "mixed"
@@ -67,37 +59,30 @@ def process_message_content(message_chain: List[dict]) -> Optional[dict]:
             url = data.get('url')
             file_id = data.get('file') or url 
             if url:
-                clean_segments.append({"type": "video", "data": {"file": file_id, "url": url}})
-                previews.append({'type': 'video', 'url': url})
+                segments.append(make_seg('video', url, file_id))
                 unique_hashes.append(file_id)
                 msg_type = "video" 
             
         elif stype in ['forward', 'node']:
             resid = data.get('id') or data.get('file')
-            clean_segments.append(seg) 
-            previews.append({'type': 'forward', 'id': resid}) 
+            segments.append(make_seg(stype, raw=data))
             unique_hashes.append(resid)
             msg_type = "forward"
 
-    if has_text or not clean_segments: return None
+    if has_text or not segments:
+        if group_id is not None: group_messages.inc(group=group_id, outcome='ignored')
+        return None
 
-    combined_hash = "".join(str(h) for h in unique_hashes)
-    
-    # [修复核心] 确保这里用的是 dedup_dict 而不是 dedup_set
-    if combined_hash in state.dedup_dict:
+    # [重构] 规范化后的媒体标识取定长摘要，丢进去重索引
+    digest = make_digest(unique_hashes)
+    if state.dedup.check_and_add(digest):
         add_log("[去重] 发现重复内容，已丢弃")
+        if group_id is not None: group_messages.inc(group=group_id, outcome='deduped')
         return None
     
-    state.dedup_dict[combined_hash] = True
-    if len(state.dedup_dict) > state.MAX_DEDUP_SIZE:
-        state.dedup_dict.popitem(last=False)
-    
-    return {
-        "id": generate_uuid(),
-        "type": msg_type,
-        "content": clean_segments, 
-        "previews": previews,
-        "timestamp": time.time(),
-        "selected": False,
-        "raw_msg_id": 0 
-    }
\ No newline at end of file
+    return PendingItem(
+        id=state.new_item_id(),
+        type=ItemType.from_label(msg_type),
+        segments=tuple(segments),
+        timestamp=time.time(),
+    )
@@ -1,8 +1,60 @@
-from nicegui import ui
+import multiprocessing
 
-# 这行导入会自动执行 views.py 里的 @ui.page('/') 注册
-from ui.views import main_page
+from nicegui import app, ui
+
+# 查重、缩略图用的进程池在 Windows 上是 spawn 方式起子进程，子进程会把本文件当 __mp_main__ 重新导入一遍
+# 所以读数据、开数据库、注册后台任务这些全放进 main()，只有主进程真正往下走
+def main():
+    if multiprocessing.current_process().name != 'MainProcess': return
+    from core.persist import persist
+    from core.bot import shutdown_workers, ingest
+    from core.api import outbox
+    from core.autopack import autopacker
+    from core.media_cache import thumbnails
+    from core.meta import meta
+    from core.metrics import loop_lag
+    from core.profiling import tracer
+    from core.startup import load_all
+    from core.state import state
+    from core.utils import add_log
+
+    # [重构] 配置、待审队列、发件箱、各种缓存在这里统一读盘，导入模块本身不碰磁盘
+    load_all()
+
+    # 这行导入会自动执行 views.py 里的 @ui.page('/') 注册
+    from ui.views import main_page
+    # 同理注册 /media、/thumbs 两个带长缓存头的文件路由
+    from ui.static import serve_media, serve_thumb
+    # /metrics：Prometheus 文本格式的运行指标
+    from ui.metrics import serve_metrics
+    # /admin/profile：按需抓 profile（配置里打开 profile_endpoint 才有）
+    from ui.admin import capture_profile
+
+    # [新增] 发件箱 worker 跟着服务一起起停，没发完的任务下次启动接着发
+    app.on_startup(outbox.start)
+    app.on_shutdown(outbox.stop)
+    # [新增] 自动打包引擎订阅入库事件，常驻一个任务
+    app.on_startup(autopacker.start)
+    app.on_shutdown(autopacker.stop)
+    # [新增] 收消息流水线的 worker
+    app.on_startup(ingest.start)
+    app.on_shutdown(ingest.stop)
+    # [新增] 群名/审核员信息后台刷新
+    app.on_startup(meta.start)
+    app.on_shutdown(meta.stop)
+    # [新增] 测事件循环卡顿，结果在 /metrics 里
+    app.on_startup(loop_lag.start)
+    app.on_shutdown(loop_lag.stop)
+    # [新增] 性能追踪默认关，配置里开了才装上计时和慢回调检测
+    tracer.log = add_log
+    app.on_startup(lambda: tracer.configure(state.trace_enabled, state.trace_slow_ms))
+    # [新增] 关机前把还没落盘的配置、队列日志、运行日志全部写完
+    app.on_shutdown(persist.stop)
+    app.on_shutdown(shutdown_workers)
+    app.on_shutdown(thumbnails.shutdown)
 
-if __name__ in {"__main__", "__mp_main__"}:
     # 启动服务器
-    ui.run(title="搬史机器人 Pro", port=8080, reload=False, show=False)
\ No newline at end of file
+    ui.run(title="搬史机器人 Pro", port=8080, reload=False, show=False)
+
+if __name__ in {"__main__", "__mp_main__"}:
+    main()
@@ -0,0 +1,49 @@
+import asyncio
+from core.outbox import Outbox, SendJob, DELIVERED, RETRY
+from core.jobs import JobManager
+
+def direct(batch, ids, groups):
+    return [SendJob(f"media:{i}:{g}", batch, "send_group_msg", g, ['{}'], items=[i]) for g in groups for i in ids]
+
+async def settle(cond, timeout=5.0):
+    end = asyncio.get_running_loop().time() + timeout
+    while not cond():
+        assert asyncio.get_running_loop().time() < end, "等不到任务结束"
+        await asyncio.sleep(0.01)
+
+def test_resend_failed_subset_finishes_new_job(tmp_path):
+    async def main():
+        fail = {"media:2:20"}
+
+        async def deliver(sj):
+            return (RETRY, "boom") if sj.key in fail else (DELIVERED, "")
+
+        outbox = Outbox(deliver, snapshot_path=str(tmp_path / "outbox.json"),
+                        journal_path=str(tmp_path / "outbox.journal"), max_attempts=1)
+        sent = []
+        jobs = JobManager(outbox, on_sent=sent.extend)
+        outbox.on_change = jobs.on_send_job
+        outbox.start()
+        try:
+            # 第一次：条目 1、2 发两个群，条目 2 在群 20 失败
+            jobs.submit("b1", "直发", direct("b1", [1, 2], [10, 20]))
+            old = jobs.jobs["b1"]
+            await settle(lambda: old.finished)
+            assert sum(old.failed.values()) == 1
+            assert sent == [1]
+
+            # 重新勾上条目 2 再发：群 10 发过了跳过，群 20 那条失败的重新排队，归到新任务
+            fail.clear()
+            jobs.submit("b2", "直发", direct("b2", [2], [10, 20]))
+            new = jobs.jobs["b2"]
+            await settle(lambda: new.finished)
+            assert new.total_count == 1 and sum(new.done.values()) == 1
+            assert sorted(sent) == [1, 2]
+            assert jobs.sending_ids() == set()
+            # 原任务不再算这条：进度不会超过总数
+            assert old.finished and old.settled_count == old.total_count == 3
+            assert outbox.jobs == {}
+        finally:
+            await outbox.stop()
+
+    asyncio.run(main())
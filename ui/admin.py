@@ -0,0 +1,23 @@
+from fastapi import HTTPException
+from fastapi.responses import Response
+from nicegui import app
+from core.state import state
+from core.utils import add_log
+from core.profiling import profiler, MODES
+
+# 按需抓 profile：/admin/profile?seconds=10&mode=cprofile（或 mode=sample 出折叠栈火焰图）
+# 面板没有登录，这个接口默认关着，要在配置里打开 profile_endpoint 才有
+
+MAX_SECONDS = 120
+
+@app.get('/admin/profile')
+async def capture_profile(seconds: float = 10, mode: str = 'cprofile'):
+    if not state.profile_endpoint: raise HTTPException(status_code=404)
+    if mode not in MODES: raise HTTPException(status_code=400, detail=f"mode 只能是 {' / '.join(MODES)}")
+    if profiler.busy: raise HTTPException(status_code=409, detail="已经有一个 profile 在抓了，等它结束")
+    seconds = min(max(1.0, seconds), MAX_SECONDS)
+    add_log(f"[Profile] 开始抓取 {seconds:.0f} 秒 ({mode})")
+    name, data = await profiler.capture(seconds, mode)
+    add_log(f"[Profile] 抓取完成: {name} ({len(data) // 1024} KB)")
+    return Response(data, media_type='application/octet-stream',
+                    headers={'Content-Disposition': f'attachment; filename="{name}"'})
@@ -0,0 +1,83 @@
+from typing import Callable, Collection, Dict, List, Tuple
+from nicegui import ui
+from core.models import PendingItem
+
+# 审核网格的增量渲染：按条目 id 记住已经画出来的卡片
+# 刷新时只删掉离开本页的、补上新进来的、给序号/勾选变化的卡片改字改样式，不再整块 clear 重建
+
+class CardRef:
+    __slots__ = ('card', 'checkbox', 'index_label', 'pos', 'selected')
+
+    def __init__(self, card, checkbox, index_label, pos: int, selected: bool):
+        self.card = card
+        self.checkbox = checkbox
+        self.index_label = index_label
+        self.pos = pos
+        self.selected = selected
+
+class CardGrid:
+    def __init__(self, container, build_card: Callable[[int, PendingItem], CardRef],
+                 selected_cls: str, idle_cls: str):
+        self.container = container
+        self.build_card = build_card
+        self.selected_cls = selected_cls
+        self.idle_cls = idle_cls
+        self.cards: Dict[int, CardRef] = {}
+        # 统计一下每次刷新实际动了多少卡片，方便排查
+        self.last_stats = {'added': 0, 'removed': 0, 'updated': 0}
+
+    def style_for(self, selected: bool) -> str:
+        return self.selected_cls if selected else self.idle_cls
+
+    def sync(self, entries: List[Tuple[int, PendingItem]], selected: Collection[int]):
+        added = removed = updated = 0
+        wanted = {item.id for _, item in entries}
+
+        for item_id in [i for i in self.cards if i not in wanted]:
+            ref = self.cards.pop(item_id)
+            self.container.remove(ref.card)
+            removed += 1
+
+        for n, (pos, item) in enumerate(entries):
+            ref = self.cards.get(item.id)
+            if ref is None:
+                with self.container:
+                    ref = self.build_card(pos, item)
+                self.cards[item.id] = ref
+                added += 1
+            else:
+                changed = False
+                if ref.pos != pos:
+                    ref.index_label.set_text(str(pos + 1))
+                    ref.pos = pos
+                    changed = True
+                is_sel = item.id in selected
+                if ref.selected != is_sel:
+                    ref.card.classes(self.style_for(is_sel), remove=self.style_for(ref.selected))
+                    ref.selected = is_sel
+                    ref.checkbox.value = is_sel
+                    changed = True
+                if changed: updated += 1
+            # 顺序不对才挪，大多数情况下一个都不用动
+            children = self.container.default_slot.children
+            if n >= len(children) or children[n] is not ref.card:
+                ref.card.move(self.container, target_index=n)
+
+        self.last_stats = {'added': added, 'removed': removed, 'updated': updated}
+
+    def mark_selected(self, item_id: int, value: bool):
+        # 用户自己点勾选框时只改样式，不等整页刷新
+        ref = self.cards.get(item_id)
+        if ref is None or ref.selected == value: return
+        ref.card.classes(self.style_for(value), remove=self.style_for(ref.selected))
+        ref.selected = value
+
+    def invalidate(self, item_ids):
+        # 卡片内容变了（比如缩略图做好了），删掉等下次 sync 原位重建
+        for item_id in item_ids:
+            ref = self.cards.pop(item_id, None)
+            if ref is not None: self.container.remove(ref.card)
+
+    def reset(self):
+        self.container.clear()
+        self.cards.clear()
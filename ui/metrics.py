@@ -0,0 +1,11 @@
+from fastapi.responses import PlainTextResponse
+from nicegui import app
+from core.metrics import render_prometheus, CONTENT_TYPE
+
+# Prometheus 抓取入口：收消息、去重、队列、接口延迟、群发结果、重连、事件循环卡顿都在这里
+# 打点只是内存里累加，渲染只在被抓取时做一次，抓取间隔 15~60 秒就够了
+
+@app.get('/metrics')
+async def serve_metrics():
+    # 放在事件循环里渲染，读队列长度之类的时候不用担心和别的协程抢
+    return PlainTextResponse(render_prometheus(), media_type=CONTENT_TYPE)
@@ -0,0 +1,27 @@
+import os
+import re
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+from nicegui import app
+from core.media_cache import media_cache, thumbnails
+
+# 本地缓存的原图和缩略图：文件名就是内容摘要，同一个地址的内容永远不会变，让浏览器长期缓存
+# 多个审核员页面、来回翻页都不用重新下载
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+_NAME = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{64}(_\d+)?(\.[a-z0-9]{1,5})?$')
+
+def _serve(root: str, name: str) -> FileResponse:
+    # 只认摘要格式的文件名，顺便挡掉 ../ 之类的路径
+    if not _NAME.match(name): raise HTTPException(status_code=404)
+    path = os.path.join(root, name)
+    if not os.path.isfile(path): raise HTTPException(status_code=404)
+    return FileResponse(path, headers={'Cache-Control': IMMUTABLE})
+
+@app.get('/media/{name:path}')
+def serve_media(name: str):
+    return _serve(media_cache.files_dir, name)
+
+@app.get('/thumbs/{name:path}')
+def serve_thumb(name: str):
+    return _serve(thumbnails.root, name)
@@ -1,192 +1,379 @@
 import asyncio
+import math
 from datetime import datetime
 from nicegui import ui
-from core.state import state
+from core.state import (
+    state, QUEUE_EVENTS, EVENT_NOTIFY, EVENT_STATUS_CHANGED, EVENT_META_CHANGED,
+    EVENT_ITEM_REMOVED, EVENT_QUEUE_CLEARED, EVENT_OVERFLOW, EVENT_JOB_UPDATED, EVENT_THUMB_READY
+)
+from core.models import ItemType
 from core.bot import run_bot
-from core.utils import log_subscribers, get_avatar_url
+from core.utils import logger, get_avatar_url
+from core.media_cache import media_cache, thumb_url
+from ui.grid import CardGrid, CardRef
 from core.api import (
-    execute_direct_media_send, execute_merge_forward,
-    execute_single_forward, send_preview_to_reviewer, fetch_user_info, fetch_group_info
+    enqueue_direct, enqueue_pack, enqueue_forward, send_jobs, send_preview_to_reviewer
 )
-
-# 全局组件占位符
-log_view = None
-status_indicator = None
-review_container_left = None
-review_container_right = None
-badge_media = None
-badge_forward = None
-groups_s_refreshable = None 
-groups_t_refreshable = None
-reviewer_panel_refreshable = None 
-loading_dialog = None 
-global_viewer_dialog = None
-global_viewer_content = None
-media_pagination = None
-forward_pagination = None
-
-def with_lock(func):
-    # 包装器：防止瞎点按钮导致并发冲突
-    async def wrapper(*args, **kwargs):
-        if state.is_processing:
-            ui.notify("后端正在发力，别点太快...", type='warning')
-            return
-        state.is_processing = True
-        if loading_dialog: loading_dialog.open()
-        try:
-            await func(*args, **kwargs)
-        finally:
-            state.is_processing = False
-            if loading_dialog: loading_dialog.close()
-    return wrapper
-
-def open_global_viewer(index: int):
-    if index < 0 or index >= len(state.pending_list): return
-    state.preview_index = index
-    render_global_viewer()
-    global_viewer_dialog.open()
-
-def render_global_viewer():
-    if state.preview_index < 0 or state.preview_index >= len(state.pending_list): return
-    item = state.pending_list[state.preview_index]
-    global_viewer_content.clear()
-    
-    with global_viewer_content:
-        ui.label(f"{state.preview_index + 1} / {len(state.pending_list)}").classes('absolute top-4 left-4 text-white font-bold z-50 bg-black/50 px-2 rounded')
+from core.meta import meta
+from core.autopack import autopacker
+from core.profiling import tracer
+
+
+PAGE_SIZE = 20
+# [新增] 滚动加载模式：每次多展开的条数
+SCROLL_STEP = 40
+
+MEDIA_SELECTED_CLS = 'border-blue-500 bg-blue-50 dark:bg-blue-900'
+FORWARD_SELECTED_CLS = 'border-purple-500 bg-purple-50 dark:bg-purple-900'
+IDLE_CLS = 'border-transparent bg-white dark:bg-gray-800 shadow'
+
+def media_src(url):
+    # [新增] 已经缓存到本地的走 /media 静态路由，没缓存好的先用原链接
+    return media_cache.public_url(url) or url
+
+class ReviewSession:
+    """每个打开的页面一份：自己的组件引用、页码、勾选、画廊位置、事件队列和日志订阅
+    以前这些都是模块级全局变量 / 挂在 state 上，多开几个审核员页面就互相覆盖、翻页打架"""
+
+    def __init__(self, client):
+        self.client = client
+        self.virtual_scroll: bool = state.ui_virtual_scroll
+        self.media_page = 1
+        self.forward_page = 1
+        self.page_max = {'media': 1, 'forward': 1}
+        self.scroll_window = {'media': SCROLL_STEP, 'forward': SCROLL_STEP}
+        # 勾选只属于当前页面，按条目 id 记
+        self.selected = {'media': set(), 'forward': set()}
+        self.preview_kind = 'media'
+        self.preview_index = -1
+
+        self.log_view = None
+        self.status_indicator = None
+        self.btn_run = None
+        self.jobs_panel = None
+        self.viewer_dialog = None
+        self.viewer_content = None
+        self.badges = {}
+        self.paginations = {}
+        self.grids = {}
+        self.meta_refreshables = []
+        # 已经交给发件箱、还没发完的条目：卡片标成发送中，不能再勾
+        self.sending = send_jobs.sending_ids()
+
+        self.events = None
+        self._pump_task = None
+
+    # ---------- 生命周期 ----------
+    def start(self):
+        self._subscribe()
+        # 网络抖一下断开后，浏览器在 reconnect_timeout 内重连回来还是同一个页面，所以断开时先摘掉，连回来再接上
+        self.client.on_disconnect(self.close)
+        self.client.on_connect(self.resume)
+
+    def _subscribe(self) -> bool:
+        if self._pump_task is not None: return False
+        self.events = state.events.subscribe()
+        logger.subscribe(self.on_log)
+        self._pump_task = asyncio.create_task(self._pump_events())
+        return True
+
+    def resume(self):
+        # 第一次连上时已经订阅过了；断线重连回来的，断开期间错过的事件靠整页补刷一次
+        if not self._subscribe(): return
+        with self.client:
+            self.on_status('connected' if state.connected else 'disconnected')
+            for r in self.meta_refreshables: r.refresh()
+            if self.jobs_panel: self.jobs_panel.refresh()
+            self._sync_sending()
+            self.refresh_review_panel()
+
+    def close(self):
+        # 页面关掉后把自己从所有广播里摘掉，不然日志和事件会一直往死页面上推
+        if self._pump_task: self._pump_task.cancel()
+        self._pump_task = None
+        if self.events is not None: state.events.unsubscribe(self.events)
+        self.events = None
+        logger.unsubscribe(self.on_log)
+
+    def on_log(self, msg):
+        try: self.log_view.push(msg)
+        except Exception: pass
+
+    def on_status(self, status):
+        indicator = self.status_indicator
+        if indicator is None: return
+        if status == 'connected':
+            indicator.classes('bg-green-500', remove='bg-red-500 bg-yellow-500')
+        elif status == 'error':
+            indicator.classes('bg-yellow-500', remove='bg-green-500 bg-red-500')
+        else:
+            indicator.classes('bg-red-500', remove='bg-green-500 bg-yellow-500')
+
+    # ---------- 事件 ----------
+    def handle_events(self, batch):
+        queue_changed = meta_changed = jobs_changed = False
+        thumb_keys = set()
+        for ev in batch:
+            if ev.type == EVENT_NOTIFY:
+                ui.notify(ev.data['text'], type=ev.data['type'], position='top', timeout=5000)
+            elif ev.type == EVENT_STATUS_CHANGED:
+                self.on_status(ev.data['status'])
+            elif ev.type == EVENT_META_CHANGED:
+                meta_changed = True
+            elif ev.type == EVENT_JOB_UPDATED:
+                jobs_changed = True
+            elif ev.type == EVENT_THUMB_READY:
+                thumb_keys.add(ev.data['key'])
+            elif ev.type in QUEUE_EVENTS:
+                queue_changed = True
+                self._prune_selection(ev)
+                if ev.type == EVENT_OVERFLOW: jobs_changed = True
+        if thumb_keys and self._swap_thumbs(thumb_keys):
+            queue_changed = True
+        if jobs_changed and self._sync_sending():
+            queue_changed = True
+        # 一批事件只刷一次
+        if queue_changed:
+            self.refresh_review_panel()
+        if meta_changed:
+            for r in self.meta_refreshables: r.refresh()
+        if jobs_changed and self.jobs_panel:
+            self.jobs_panel.refresh()
+
+    def _swap_thumbs(self, keys) -> bool:
+        # 本页正显示着原图/占位图的卡片，缩略图好了就重建成小图
+        grid = self.grids.get('media')
+        if grid is None: return False
+        stale = []
+        for item_id in grid.cards:
+            item = state.queue.get(item_id)
+            if item and item.preview_url and media_cache.key(item.preview_url) in keys: stale.append(item_id)
+        grid.invalidate(stale)
+        return bool(stale)
+
+    def _sync_sending(self) -> bool:
+        # 发送中的集合变了，对应卡片重建一下换上/去掉角标
+        sending = send_jobs.sending_ids()
+        changed = sending ^ self.sending
+        self.sending = sending
+        if not changed: return False
+        for grid in self.grids.values(): grid.invalidate(changed)
+        return True
+
+    def _prune_selection(self, ev):
+        # 别的页面发走/删掉的条目，从本页的勾选里去掉
+        if ev.type == EVENT_ITEM_REMOVED:
+            for sel in self.selected.values(): sel.difference_update(ev.data['ids'])
+        elif ev.type == EVENT_QUEUE_CLEARED:
+            for sel in self.selected.values(): sel.clear()
+        elif ev.type == EVENT_OVERFLOW:
+            for sel in self.selected.values():
+                sel.intersection_update([i for i in sel if i in state.queue])
+
+    async def _pump_events(self):
+        events = self.events
+        while True:
+            batch = [await events.get()]
+            while not events.empty(): batch.append(events.get_nowait())
+            try:
+                with self.client, tracer.span('render.events'):
+                    self.handle_events(batch)
+            except RuntimeError as e:
+                if 'deleted' not in str(e): raise
+
+    # ---------- 勾选 ----------
+    def selected_items(self, kind: str):
+        return state.queue.resolve(self.selected[kind] - self.sending)
+
+    def set_selected(self, kind: str, ids, value: bool):
+        sel = self.selected[kind]
+        if value: sel.update(ids)
+        else: sel.difference_update(ids)
+
+    def toggle_all_type(self, target_type):
+        # 发送中的条目勾不上，全选也跳过它们
+        ids = [i.id for i in state.queue.items(target_type) if i.id not in self.sending]
+        if not ids: return
         
-        if item['type'] == 'image':
-            url = item['previews'][0]['url']
-            ui.image(url).classes('max-w-full max-h-full object-contain').props('referrerpolicy="no-referrer"')
-        elif item['type'] == 'video':
-            url = item['previews'][0]['url']
-            ui.video(url).classes('w-full max-h-full').props('controls autoplay')
-        elif item['type'] == 'forward':
-            with ui.column().classes('items-center justify-center h-full text-white gap-4'):
-                ui.icon('forum', size='6xl').classes('opacity-80')
-                ui.label('聊天记录 (合并转发)').classes('text-3xl font-bold')
-                async def send_now():
-                    success, msg = await send_preview_to_reviewer(item['raw_msg_id'])
-                    ui.notify(msg, type='positive' if success else 'negative')
-                ui.button('发送给审核员', on_click=send_now).props('color=blue icon=send')
-
-def switch_preview(direction):
-    new_index = state.preview_index + direction
-    if new_index < 0: new_index = len(state.pending_list) - 1
-    elif new_index >= len(state.pending_list): new_index = 0
-    state.preview_index = new_index
-    render_global_viewer()
-
-def toggle_all_type(target_type):
-    filter_types = ['image', 'video'] if target_type == 'media' else ['forward']
-    current_items = [i for i in state.pending_list if i['type'] in filter_types]
-    if not current_items: return
-    
-    all_selected = all(i['selected'] for i in current_items)
-    for i in current_items: i['selected'] = not all_selected
-    refresh_review_panel()
-
-def delete_selected(target_type):
-    filter_types = ['image', 'video'] if target_type == 'media' else ['forward']
-    state.pending_list = [i for i in state.pending_list if not (i['selected'] and i['type'] in filter_types)]
-    state.save_reviews()
-    refresh_review_panel()
-    ui.notify(f"清理完毕")
-
-def toggle_select_direct(item, value):
-    item['selected'] = value
-
-def toggle_page_type(target_type):
-    # [新增] 全选本页的逻辑
-    if target_type == 'media':
-        items = [(idx, i) for idx, i in enumerate(state.pending_list) if i['type'] in ['image', 'video']]
-        start = (state.media_page - 1) * 20
-        current_items = [i for _, i in items[start:start+20]]
-    else:
-        items = [(idx, i) for idx, i in enumerate(state.pending_list) if i['type'] == 'forward']
-        start = (state.forward_page - 1) * 20
-        current_items = [i for _, i in items[start:start+20]]
-        
-    if not current_items: return
-    all_selected = all(i['selected'] for i in current_items)
-    for i in current_items: i['selected'] = not all_selected
-    refresh_review_panel()
-
-def refresh_review_panel():
-    try:
-        import math
-        media_all = [(idx, i) for idx, i in enumerate(state.pending_list) if i['type'] in ['image', 'video']]
-        forward_all = [(idx, i) for idx, i in enumerate(state.pending_list) if i['type'] == 'forward']
-        
-        # 动态计算最大页码
-        state.media_page_max = max(1, math.ceil(len(media_all) / 20))
-        state.forward_page_max = max(1, math.ceil(len(forward_all) / 20))
-        if state.media_page > state.media_page_max: state.media_page = state.media_page_max
-        if state.forward_page > state.forward_page_max: state.forward_page = state.forward_page_max
-        if media_pagination: media_pagination.max = state.media_page_max
-        if forward_pagination: forward_pagination.max = state.forward_page_max
+        sel = self.selected[target_type]
+        all_selected = all(i in sel for i in ids)
+        self.set_selected(target_type, ids, not all_selected)
+        self.refresh_review_panel()
+
+    def toggle_page_type(self, target_type):
+        # [新增] 全选本页的逻辑
+        current_ids = [i.id for _, i in self.visible_entries(target_type) if i.id not in self.sending]
+            
+        if not current_ids: return
+        sel = self.selected[target_type]
+        all_selected = all(i in sel for i in current_ids)
+        self.set_selected(target_type, current_ids, not all_selected)
+        self.refresh_review_panel()
+
+    def delete_selected(self, target_type):
+        # 已经进发件箱的不删，等发完由发送流程自己删
+        self._sync_sending()
+        ids = self.selected[target_type] - self.sending
+        self.remove_items(target_type, list(ids))
+        ui.notify(f"清理完毕")
+
+    def mark_sending(self, target_type, ids):
+        # 进了发件箱先留在待审区，发成功了才会被删掉；失败的回到可勾选状态
+        self.set_selected(target_type, ids, False)
+        self._sync_sending()
+        self.refresh_review_panel()
+
+    def remove_items(self, target_type, ids):
+        # 发送完只删真正发出去的那些，发送过程中新勾的留着
+        self.set_selected(target_type, ids, False)
+        state.remove_items(ids)
+        self.refresh_review_panel()
+
+    def on_card_checked(self, item, value):
+        self.set_selected(item.kind, [item.id], value)
+        grid = self.grids.get(item.kind)
+        if grid: grid.mark_selected(item.id, value)
+
+    # ---------- 画廊 ----------
+    def open_global_viewer(self, kind: str, index: int):
+        if index < 0 or index >= state.queue.count(kind): return
+        self.preview_kind = kind
+        self.preview_index = index
+        self.render_global_viewer()
+        self.viewer_dialog.open()
+
+    def open_item_viewer(self, item):
+        if item.id not in state.queue: return
+        self.open_global_viewer(item.kind, state.queue.index_of(item.id))
+
+    def render_global_viewer(self):
+        kind = self.preview_kind
+        item = state.queue.at(kind, self.preview_index)
+        if item is None: return
+        self.viewer_content.clear()
         
-        if badge_media: badge_media.text = str(len(media_all))
-        if badge_forward: badge_forward.text = str(len(forward_all))
-
-        if review_container_left:
-            review_container_left.clear()
-            start_m = (state.media_page - 1) * 20
-            with review_container_left:
-                # [分页] 仅渲染当前页的 20 个项目
-                for abs_idx, item in media_all[start_m : start_m + 20]:
-                    border_cls = 'border-blue-500 bg-blue-50 dark:bg-blue-900' if item['selected'] else 'border-transparent bg-white dark:bg-gray-800 shadow'
-                    with ui.card().classes(f'w-full p-0 rounded border-2 transition-all relative aspect-square {border_cls}'):
-                        # [新增] 绝对序号角标 (位于左上角稍微偏右)
-                        ui.label(str(abs_idx + 1)).classes('absolute top-1 left-7 z-20 text-[10px] bg-black/60 text-white px-1.5 py-0.5 rounded pointer-events-none')
-                        
-                        with ui.row().classes('absolute top-1 left-1 z-20'):
-                            ui.checkbox(value=item['selected'], on_change=lambda e, i=item: toggle_select_direct(i, e.value)).props('size=sm color=blue keep-color')
-                        
-                        with ui.row().classes('absolute top-1 right-1 z-20'):
-                            icon = 'play_circle' if item['type'] == 'video' else 'zoom_in'
-                            ui.button(icon=icon, on_click=lambda _, idx=abs_idx: open_global_viewer(idx)).props('round color=blue dense size=xs shadow stop-propagation')
-
-                        with ui.column().classes('w-full h-full items-center justify-center p-1'):
-                            if item['type'] == 'image':
-                                ui.image(item['previews'][0]['url']).classes('max-h-full max-w-full rounded').props('referrerpolicy="no-referrer"')
-                            else:
-                                ui.icon('movie', size='md').classes('opacity-30 dark:text-gray-400')
-
-        if review_container_right:
-            review_container_right.clear()
-            start_f = (state.forward_page - 1) * 20
-            with review_container_right:
-                for abs_idx, item in forward_all[start_f : start_f + 20]:
-                    border_cls = 'border-purple-500 bg-purple-50 dark:bg-purple-900' if item['selected'] else 'border-transparent bg-white dark:bg-gray-800 shadow'
-                    with ui.card().classes(f'w-full p-2 rounded border-2 transition-all relative {border_cls}'):
-                        # [新增] 绝对序号角标
-                        ui.label(str(abs_idx + 1)).classes('absolute top-1 right-10 z-20 text-[10px] bg-black/60 text-white px-1.5 py-0.5 rounded pointer-events-none')
-                        
-                        with ui.row().classes('w-full items-center justify-between mt-2'):
-                            with ui.row().classes('items-center gap-2'):
-                                ui.checkbox(value=item['selected'], on_change=lambda e, i=item: toggle_select_direct(i, e.value)).props('size=sm color=purple keep-color')
-                                with ui.column().classes('gap-0'):
-                                    ui.label('合并转发记录').classes('text-sm font-bold dark:text-gray-200')
-                                    ui.label(datetime.fromtimestamp(item['timestamp']).strftime('%H:%M:%S')).classes('text-xs opacity-50 dark:text-gray-400')
-                            
-                            async def forward_handler(e, i=item):
-                                success, msg = await send_preview_to_reviewer(i['raw_msg_id'])
-                                ui.notify(msg, type='positive' if success else 'negative')
+        with self.viewer_content:
+            ui.label(f"{self.preview_index + 1} / {state.queue.count(kind)}").classes('absolute top-4 left-4 text-white font-bold z-50 bg-black/50 px-2 rounded')
+            
+            if item.type is ItemType.IMAGE:
+                url = media_src(item.preview_url)
+                ui.image(url).classes('max-w-full max-h-full object-contain').props('referrerpolicy="no-referrer"')
+            elif item.type is ItemType.VIDEO:
+                url = media_src(item.preview_url)
+                ui.video(url).classes('w-full max-h-full').props('controls autoplay')
+            elif item.type is ItemType.FORWARD:
+                with ui.column().classes('items-center justify-center h-full text-white gap-4'):
+                    ui.icon('forum', size='6xl').classes('opacity-80')
+                    ui.label('聊天记录 (合并转发)').classes('text-3xl font-bold')
+                    async def send_now():
+                        success, msg = await send_preview_to_reviewer(item.raw_msg_id)
+                        ui.notify(msg, type='positive' if success else 'negative')
+                    ui.button('发送给审核员', on_click=send_now).props('color=blue icon=send')
+
+    def switch_preview(self, direction):
+        total = state.queue.count(self.preview_kind)
+        if not total: return
+        self.preview_index = (self.preview_index + direction) % total
+        self.render_global_viewer()
+
+    # ---------- 卡片 ----------
+    def build_media_card(self, abs_idx, item) -> CardRef:
+        selected = item.id in self.selected['media']
+        sending = item.id in self.sending
+        with ui.card().classes(f'w-full p-0 rounded border-2 transition-all relative aspect-square {MEDIA_SELECTED_CLS if selected else IDLE_CLS}') as card:
+            # [新增] 绝对序号角标 (位于左上角稍微偏右)
+            index_label = ui.label(str(abs_idx + 1)).classes('absolute top-1 left-7 z-20 text-[10px] bg-black/60 text-white px-1.5 py-0.5 rounded pointer-events-none')
+            if item.near_dup is not None:
+                # [新增] 感知哈希判定的疑似重复
+                ui.label('疑似重复').classes('absolute bottom-1 left-1 z-20 text-[10px] bg-orange-500 text-white px-1.5 py-0.5 rounded pointer-events-none')
+            if sending:
+                ui.label('发送中').classes('absolute bottom-1 right-1 z-20 text-[10px] bg-blue-500 text-white px-1.5 py-0.5 rounded pointer-events-none')
+            
+            with ui.row().classes('absolute top-1 left-1 z-20'):
+                checkbox = ui.checkbox(value=selected, on_change=lambda e, i=item: self.on_card_checked(i, e.value)).props('size=sm color=blue keep-color')
+                if sending: checkbox.disable()
+            
+            with ui.row().classes('absolute top-1 right-1 z-20'):
+                icon = 'play_circle' if item.type is ItemType.VIDEO else 'zoom_in'
+                ui.button(icon=icon, on_click=lambda _, i=item: self.open_item_viewer(i)).props('round color=blue dense size=xs shadow stop-propagation')
+
+            with ui.column().classes('w-full h-full items-center justify-center p-1'):
+                # [优化] 网格里只放缩略图，原图留给全屏画廊；没装 Pillow 时图片退回原来的显示方式
+                thumb = thumb_url(item.preview_url)
+                if item.type is ItemType.IMAGE:
+                    ui.image(thumb or media_src(item.preview_url)).classes('max-h-full max-w-full rounded').props('referrerpolicy="no-referrer"')
+                elif thumb:
+                    ui.image(thumb).classes('max-h-full max-w-full rounded')
+                    ui.icon('play_circle', size='md').classes('absolute text-white opacity-80 pointer-events-none')
+                else:
+                    ui.icon('movie', size='md').classes('opacity-30 dark:text-gray-400')
+        return CardRef(card, checkbox, index_label, abs_idx, selected)
+
+    def build_forward_card(self, abs_idx, item) -> CardRef:
+        selected = item.id in self.selected['forward']
+        sending = item.id in self.sending
+        with ui.card().classes(f'w-full p-2 rounded border-2 transition-all relative {FORWARD_SELECTED_CLS if selected else IDLE_CLS}') as card:
+            # [新增] 绝对序号角标
+            index_label = ui.label(str(abs_idx + 1)).classes('absolute top-1 right-10 z-20 text-[10px] bg-black/60 text-white px-1.5 py-0.5 rounded pointer-events-none')
+            
+            with ui.row().classes('w-full items-center justify-between mt-2'):
+                with ui.row().classes('items-center gap-2'):
+                    checkbox = ui.checkbox(value=selected, on_change=lambda e, i=item: self.on_card_checked(i, e.value)).props('size=sm color=purple keep-color')
+                    if sending: checkbox.disable()
+                    with ui.column().classes('gap-0'):
+                        ui.label('合并转发记录（发送中）' if sending else '合并转发记录').classes('text-sm font-bold dark:text-gray-200')
+                        ui.label(datetime.fromtimestamp(item.timestamp).strftime('%H:%M:%S')).classes('text-xs opacity-50 dark:text-gray-400')
+                
+                async def forward_handler(e, i=item):
+                    success, msg = await send_preview_to_reviewer(i.raw_msg_id)
+                    ui.notify(msg, type='positive' if success else 'negative')
+                    
+                ui.button(icon='send', on_click=forward_handler).props('round color=purple dense size=sm shadow stop-propagation').tooltip('私发给审核员')
+        return CardRef(card, checkbox, index_label, abs_idx, selected)
+
+    # ---------- 网格 ----------
+    def page_of(self, kind: str) -> int:
+        return self.media_page if kind == 'media' else self.forward_page
+
+    def visible_entries(self, kind: str):
+        # [新增] 滚动加载模式下从头显示到当前窗口；分页模式只取当前页
+        if self.virtual_scroll:
+            return state.page_items(kind, 1, self.scroll_window[kind])
+        return state.page_items(kind, self.page_of(kind), PAGE_SIZE)
+
+    def on_grid_scroll(self, kind: str, e):
+        # 滚到底部附近就多加载一屏，网格是增量同步的，只会追加新卡片
+        if not self.virtual_scroll: return
+        if e.vertical_percentage < 0.9: return
+        if self.scroll_window[kind] >= state.queue.count(kind): return
+        self.scroll_window[kind] += SCROLL_STEP
+        self.refresh_review_panel()
+
+    def refresh_review_panel(self):
+        with tracer.span('render.review_panel'):
+            self._refresh_review_panel()
+
+    def _refresh_review_panel(self):
+        try:
+            for kind in ('media', 'forward'):
+                total = state.count_items(kind)
+                # 动态计算最大页码
+                page_max = max(1, math.ceil(total / PAGE_SIZE))
+                self.page_max[kind] = page_max
+                if kind == 'media' and self.media_page > page_max: self.media_page = page_max
+                if kind == 'forward' and self.forward_page > page_max: self.forward_page = page_max
+                if kind in self.paginations: self.paginations[kind].max = page_max
+                if kind in self.badges: self.badges[kind].text = str(total)
+                # [优化] 按 id 增量同步卡片，只动有变化的部分
+                if kind in self.grids: self.grids[kind].sync(self.visible_entries(kind), self.selected[kind])
                                 
-                            ui.button(icon='send', on_click=forward_handler).props('round color=purple dense size=sm shadow stop-propagation').tooltip('私发给审核员')
-                            
-    except RuntimeError as e:
-        if 'deleted' in str(e): pass
-        else: raise e
+        except RuntimeError as e:
+            if 'deleted' not in str(e): raise
 
 @ui.page('/')
 def main_page():
-    global log_view, status_indicator, review_container_left, review_container_right
-    global groups_s_refreshable, groups_t_refreshable, reviewer_panel_refreshable
-    global global_viewer_dialog, global_viewer_content, loading_dialog
-    global badge_media, badge_forward
-    global media_pagination, forward_pagination
-    
+    # [重构] 组件和页码/勾选都挂在本页自己的会话上，多个审核员同时打开互不干扰
+    session = ReviewSession(ui.context.client)
     dark = ui.dark_mode()
     
     def del_grp(gid, g_type, refresh_func):
@@ -196,7 +383,8 @@ def main_page():
         refresh_func.refresh()
 
     def render_group_item(gid, g_type, refresh_func):
-        info = state.group_info_cache.get(gid, {})
+        # 过期的先显示旧名字，后台刷新完会推 meta_changed 重画
+        info = meta.group(gid)
         name = info.get('name', str(gid))
         avatar = info.get('avatar', get_avatar_url(gid))
         with ui.row().classes('w-full items-center justify-between bg-gray-50 dark:bg-gray-700 p-2 rounded'):
@@ -207,17 +395,12 @@ def main_page():
                     ui.label(str(gid)).classes('text-[10px] opacity-60 dark:text-gray-400')
             ui.icon('close', size='xs').classes('cursor-pointer opacity-50 hover:text-red-500').on('click', lambda: del_grp(gid, g_type, refresh_func))
 
-    # 加载蒙版
-    with ui.dialog() as loading_dialog, ui.card().classes('items-center'):
-        ui.spinner(size='lg')
-        ui.label('请求发送中，去喝口水...').classes('text-sm text-gray-500 mt-2')
-
     # 画廊
-    with ui.dialog() as global_viewer_dialog, ui.card().classes('w-full h-full bg-black flex flex-col justify-center items-center p-0 relative'):
-        ui.button(icon='close', on_click=global_viewer_dialog.close).props('flat round color=white').classes('absolute top-4 right-4 z-50')
-        global_viewer_content = ui.element('div').classes('w-full h-full flex justify-center items-center')
-        ui.button(icon='chevron_left', on_click=lambda: switch_preview(-1)).props('flat round color=white size=xl').classes('absolute left-4 top-1/2 -translate-y-1/2 z-50')
-        ui.button(icon='chevron_right', on_click=lambda: switch_preview(1)).props('flat round color=white size=xl').classes('absolute right-4 top-1/2 -translate-y-1/2 z-50')
+    with ui.dialog() as session.viewer_dialog, ui.card().classes('w-full h-full bg-black flex flex-col justify-center items-center p-0 relative'):
+        ui.button(icon='close', on_click=session.viewer_dialog.close).props('flat round color=white').classes('absolute top-4 right-4 z-50')
+        session.viewer_content = ui.element('div').classes('w-full h-full flex justify-center items-center')
+        ui.button(icon='chevron_left', on_click=lambda: session.switch_preview(-1)).props('flat round color=white size=xl').classes('absolute left-4 top-1/2 -translate-y-1/2 z-50')
+        ui.button(icon='chevron_right', on_click=lambda: session.switch_preview(1)).props('flat round color=white size=xl').classes('absolute right-4 top-1/2 -translate-y-1/2 z-50')
 
     def apply_card_theme(card_element):
         card_element.classes('w-full p-4 rounded-xl shadow-lg transition-colors duration-300')
@@ -245,7 +428,7 @@ def main_page():
             with ui.row().classes('items-center gap-4'):
                 with ui.row().classes('items-center gap-2'):
                     ui.label('STATUS').classes('text-xs font-bold opacity-60 dark:text-gray-400')
-                    status_indicator = ui.element('div').classes('w-3 h-3 rounded-full bg-red-500')
+                    session.status_indicator = ui.element('div').classes('w-3 h-3 rounded-full bg-red-500')
                 ui.button(icon='dark_mode', on_click=dark.toggle).props('flat round dense color=grey')
 
         # 核心网格布局
@@ -256,32 +439,66 @@ def main_page():
                 with apply_card_theme(ui.card()):
                     ui.label('运行控制').classes('text-sm font-bold opacity-60 mb-2 dark:text-gray-400')
                     
-                    def on_bot_status(status):
-                        if status == 'connected':
-                            status_indicator.classes('bg-green-500', remove='bg-red-500 bg-yellow-500')
-                        elif status == 'error':
-                            status_indicator.classes('bg-yellow-500', remove='bg-green-500 bg-red-500')
-                        else:
-                            status_indicator.classes('bg-red-500', remove='bg-green-500 bg-yellow-500')
+                    if state.connected: session.on_status('connected')
 
                     async def toggle_run():
                         if not state.running:
                             state.running = True
                             btn_run.props('color=red icon=stop label="断开连接"')
-                            asyncio.create_task(run_bot(on_bot_status))
+                            asyncio.create_task(run_bot())
                         else:
                             state.running = False
                             btn_run.props('color=green icon=play_arrow label="开始找史"')
                     btn_run = ui.button('开始找史', on_click=toggle_run).props('color=green icon=play_arrow un-elevated rounded').classes('w-full h-12')
+                    # 别的页面已经点过开始的话，新打开的页面按钮要对上
+                    if state.running: btn_run.props('color=red icon=stop label="断开连接"')
+
+                # [新增] 发送任务：后台跑，这里看进度、可以取消
+                with apply_card_theme(ui.card()):
+                    ui.label('发送任务').classes('text-sm font-bold opacity-60 mb-2 dark:text-gray-400')
+                    def cancel_job(job_id):
+                        n = send_jobs.cancel(job_id)
+                        ui.notify(f"已取消 {n} 条未发送的消息" if n else "没有可以取消的了")
+                    def retry_job(job_id):
+                        n = send_jobs.retry(job_id)
+                        ui.notify(f"{n} 条失败的消息已重新排队" if n else "没有失败的了")
+                    def discard_job(job_id):
+                        # 失败的消息从发件箱里丢掉，对应的条目留在待审区
+                        n = send_jobs.cancel(job_id)
+                        ui.notify(f"已丢弃 {n} 条失败的消息，内容还在待审区" if n else "没有失败的了")
+                    @ui.refreshable
+                    def render_jobs():
+                        jobs = send_jobs.recent()[:8]
+                        if not jobs:
+                            ui.label('暂无任务').classes('text-xs text-gray-400')
+                            return
+                        for job in jobs:
+                            with ui.column().classes('w-full gap-0 mb-2'):
+                                with ui.row().classes('w-full items-center justify-between no-wrap'):
+                                    ui.label(job.label).classes('text-xs font-bold dark:text-gray-200')
+                                    if not job.finished:
+                                        ui.button(icon='close', on_click=lambda _, j=job.id: cancel_job(j)).props('flat round dense size=xs color=red').tooltip('取消还没发的部分')
+                                    elif any(job.failed.values()):
+                                        with ui.row().classes('gap-0 no-wrap'):
+                                            ui.button(icon='refresh', on_click=lambda _, j=job.id: retry_job(j)).props('flat round dense size=xs color=blue').tooltip('失败的部分重新发')
+                                            ui.button(icon='delete_outline', on_click=lambda _, j=job.id: discard_job(j)).props('flat round dense size=xs color=red').tooltip('丢掉失败的部分')
+                                color = 'red' if any(job.failed.values()) else ('green' if job.finished else 'blue')
+                                ui.linear_progress(value=job.progress, show_value=False).props(f'rounded color={color}')
+                                parts = []
+                                for gid, done, failed, total in job.per_group():
+                                    name = state.group_info_cache.get(gid, {}).get('name', str(gid))
+                                    parts.append(f"{name} {done}/{total}" + (f" 失败{failed}" if failed else ""))
+                                if job.cancelled: parts.append(f"已取消 {job.cancelled}")
+                                ui.label(' · '.join(parts)).classes('text-[10px] opacity-60 dark:text-gray-400')
+                    render_jobs()
+                    session.jobs_panel = render_jobs
 
                 with apply_card_theme(ui.card()):
                     ui.label('审核员设置').classes('text-lg font-bold mb-2 dark:text-white')
                     @ui.refreshable
                     def render_reviewer_info():
-                        global reviewer_panel_refreshable
-                        reviewer_panel_refreshable = render_reviewer_info
                         if state.swordholder_qq:
-                            info = state.user_info_cache.get(state.swordholder_qq, {})
+                            info = meta.user(state.swordholder_qq)
                             name = info.get('name', '加载中...')
                             avatar = info.get('avatar', get_avatar_url(state.swordholder_qq, False))
                             with ui.row().classes('w-full items-center gap-3 bg-blue-50 dark:bg-blue-900 p-2 rounded mb-2'):
@@ -292,10 +509,11 @@ def main_page():
                         else:
                             ui.label('虚位以待').classes('text-xs text-gray-400 mb-2')
                     render_reviewer_info()
+                    session.meta_refreshables.append(render_reviewer_info)
                     ui.number(format='%.0f', placeholder='输入QQ号').bind_value(state, 'swordholder_qq').classes('w-full mb-2')
                     async def save_reviewer():
                         state.save_config()
-                        if state.swordholder_qq: await fetch_user_info(state.swordholder_qq)
+                        if state.swordholder_qq: meta.want_users([state.swordholder_qq], force=True)
                         render_reviewer_info.refresh()
                         ui.notify('已绑定审核员')
                     ui.button('保存绑定', on_click=save_reviewer).props('outline rounded color=blue w-full')
@@ -309,16 +527,15 @@ def main_page():
                             state.source_groups.add(gid)
                             state.save_config()
                             e.sender.value = None
-                            await fetch_group_info(gid) 
+                            meta.want_groups([gid])
                             groups_s.refresh()
                     s_in.on('keydown.enter', add_s)
                     @ui.refreshable
                     def groups_s():
-                        global groups_s_refreshable
-                        groups_s_refreshable = groups_s 
                         with ui.column().classes('w-full gap-2 mt-2'):
                             for gid in state.source_groups: render_group_item(gid, 'source', groups_s)
                     groups_s()
+                    session.meta_refreshables.append(groups_s)
                     
                     ui.separator().classes('my-4 dark:bg-gray-600')
                     
@@ -330,29 +547,61 @@ def main_page():
                             state.target_groups.add(gid)
                             state.save_config()
                             e.sender.value = None
-                            await fetch_group_info(gid)
+                            meta.want_groups([gid])
                             groups_t.refresh()
                     t_in.on('keydown.enter', add_t)
                     @ui.refreshable
                     def groups_t():
-                        global groups_t_refreshable
-                        groups_t_refreshable = groups_t
                         with ui.column().classes('w-full gap-2 mt-2'):
                             for gid in state.target_groups: render_group_item(gid, 'target', groups_t)
                     groups_t()
+                    session.meta_refreshables.append(groups_t)
 
                 with apply_card_theme(ui.card()):
                     ui.label('系统底层').classes('text-sm font-bold opacity-60 mb-2 dark:text-gray-400')
                     ui.input('WebSocket 地址').bind_value(state, 'ws_url').classes('w-full mb-2')
                     # [新增] Token 输入框
                     ui.input('Access Token (可选)').bind_value(state, 'ws_token').classes('w-full mb-2').props('type=password')
+                    # [新增] 备用 NapCat 地址：主地址连不上时自动切过去
+                    def set_backup_urls(e):
+                        state.ws_backup_urls = [u.strip() for u in (e.value or '').split(',') if u.strip()]
+                    ui.input('备用地址 (逗号分隔，可选)', value=','.join(state.ws_backup_urls), on_change=set_backup_urls).classes('w-full mb-2')
                     ui.number('断线多久后清空图库防裂图 (分钟，0为禁用)', format='%.0f').bind_value(state, 'auto_clear_minutes').classes('w-full mb-2').tooltip('设置0即为永不清空')
+                    ui.number('群名/昵称缓存时间 (秒)', format='%.0f').bind_value(state, 'cache_time').classes('w-full mb-2').tooltip('过期后在后台刷新，重连时不会一口气全查')
                     
                     ui.separator().classes('my-2 dark:bg-gray-600')
                     
                     # [新增] 全自动打包开关和阈值
-                    ui.switch('开启全自动打包/转发').bind_value(state, 'auto_pack').classes('w-full mb-1 font-bold text-green-600')
-                    ui.number('自动打包阈值 (累计满多少条发)', format='%.0f').bind_value(state, 'auto_pack_threshold').classes('w-full mb-2').tooltip('推荐设为10-15')
+                    ui.switch('开启全自动打包/转发', on_change=autopacker.poke).bind_value(state, 'auto_pack').classes('w-full mb-1 font-bold text-green-600')
+                    ui.number('自动打包阈值 (累计满多少条发)', format='%.0f', on_change=autopacker.poke).bind_value(state, 'auto_pack_threshold').classes('w-full mb-2').tooltip('推荐设为10-15')
+                    # [新增] 自动打包的时间/体积触发，失败后批量会自动缩小
+                    with ui.row().classes('w-full gap-2 mb-2'):
+                        ui.number('最久等(分)', format='%.0f', on_change=autopacker.poke).bind_value(state, 'auto_pack_max_age_minutes').classes('w-20').tooltip('最老一条等了这么久就发，0为不启用')
+                        ui.number('包上限(MB)', format='%.1f', on_change=autopacker.poke).bind_value(state, 'auto_pack_max_mb').classes('w-20').tooltip('估算体积超过就发，0为不启用')
+                        ui.number('最小批量', format='%.0f').bind_value(state, 'auto_pack_min_batch').classes('w-20').tooltip('批量按最近的打包成功率缩放，最小到这里')
+                    # [新增] 发送节奏：同一个群按间隔发，不同群并行
+                    with ui.row().classes('w-full gap-2 mb-2'):
+                        ui.number('单群间隔(秒)', format='%.1f').bind_value(state, 'send_group_interval').classes('w-20')
+                        ui.number('随机抖动(秒)', format='%.1f').bind_value(state, 'send_jitter').classes('w-20')
+                        ui.number('并发数', format='%.0f').bind_value(state, 'send_concurrency').classes('w-20')
+                    # [新增] 本地媒体缓存
+                    ui.switch('入库时缓存图片/视频到本地 (防裂图)').bind_value(state, 'media_cache_enabled').classes('w-full mb-1')
+                    with ui.row().classes('w-full gap-2 mb-2'):
+                        ui.number('缓存上限(MB)', format='%.0f').bind_value(state, 'media_cache_mb').classes('w-20').tooltip('超过后按最近访问时间淘汰')
+                        ui.number('下载并发', format='%.0f').bind_value(state, 'media_cache_workers').classes('w-20')
+                    ui.switch('用本地文件发送').bind_value(state, 'media_send_local').classes('w-full mb-1').tooltip('NapCat 和本程序在同一台机器上才能开')
+                    # [新增] 审核区滚动加载，代替固定 20 条翻页（只影响本页，默认值取配置里的 ui_virtual_scroll）
+                    ui.switch('审核区滚动加载 (不分页)', on_change=lambda: session.refresh_review_panel()).bind_value(session, 'virtual_scroll').classes('w-full mb-1')
+                    # [新增] 性能排查：卡顿时打开，看日志里哪一步慢；关掉就没有任何开销
+                    with ui.row().classes('w-full gap-2 mb-1 items-center'):
+                        ui.switch('性能追踪', on_change=lambda e: tracer.configure(e.value, state.trace_slow_ms)).bind_value(state, 'trace_enabled').tooltip('记录入库/落盘/渲染/发送各步耗时，超过阈值写日志')
+                        ui.number('慢阈值(ms)', format='%.0f', on_change=lambda e: tracer.configure(state.trace_enabled, e.value)).bind_value(state, 'trace_slow_ms').classes('w-20')
+                    def download_profile():
+                        if not state.profile_endpoint:
+                            ui.notify('先在 config.json 里打开 profile_endpoint', type='warning')
+                            return
+                        ui.download('/admin/profile?seconds=10')
+                    ui.button('抓 10 秒 profile', on_click=download_profile).props('flat dense size=sm color=grey')
                     ui.separator().classes('my-2 dark:bg-gray-600')
                     
                     # [新增] 审核员警告设置
@@ -375,53 +624,41 @@ def main_page():
                             with ui.row().classes('items-center gap-1 flex-nowrap whitespace-nowrap'):
                                 ui.icon('perm_media', size='sm').classes('text-blue-500')
                                 ui.label('多媒体库').classes('font-bold dark:text-white text-sm')
-                                badge_media = ui.badge('0').props('color=blue dense')
+                                session.badges['media'] = ui.badge('0').props('color=blue dense')
                             
                             with ui.row().classes('gap-1 items-center flex-nowrap'):
-                                ui.button('本页', on_click=lambda: toggle_page_type('media')).props('outline dense size=sm color=blue')
-                                ui.button('全部', on_click=lambda: toggle_all_type('media')).props('flat dense size=sm')
+                                ui.button('本页', on_click=lambda: session.toggle_page_type('media')).props('outline dense size=sm color=blue')
+                                ui.button('全部', on_click=lambda: session.toggle_all_type('media')).props('flat dense size=sm')
                                 
-                                @with_lock
                                 async def send_media_direct():
-                                    selected = [i for i in state.pending_list if i['selected'] and i['type'] in ['image', 'video']]
+                                    selected = session.selected_items('media')
                                     if not selected: return
-                                    ui.notify(f"开始直发 {len(selected)} 份媒体，有点慢耐心等...", type='info')
-                                    for item in selected: await execute_direct_media_send(item['content'])
-                                    delete_selected('media')
+                                    enqueue_direct(selected)
+                                    session.mark_sending('media', [i.id for i in selected])
+                                    ui.notify(f"{len(selected)} 份媒体已进发件箱，后台逐条发送", type='info')
                                 ui.button('硬发', on_click=send_media_direct).props('color=orange icon=send size=sm px-2').tooltip('不打包，直接逐条发送')
 
-                                @with_lock
                                 async def send_media_pack():
-                                    selected = [i for i in state.pending_list if i['selected'] and i['type'] in ['image', 'video']]
+                                    selected = session.selected_items('media')
                                     if not selected: return
-                                    ui.notify(f"正在打包 {len(selected)} 份媒体...", type='info')
-                                    pack_list = [i['content'] for i in selected]
-                                    msg_ids = [i['raw_msg_id'] for i in selected]
-                                    failed_groups = await execute_merge_forward(pack_list, msg_ids)
-                                    if not failed_groups:
-                                        delete_selected('media')
-                                        ui.notify("打包发送完成", type='positive')
-                                    else:
-                                        ui.notify(
-                                            "❌ 打包失败！\n"
-                                            "原因：你选中的媒体中包含了已过期或不支持的视频/图片，导致整包崩溃。\n"
-                                            "建议：请分批次(每次3-5个)打包来排查出'坏文件'并将其删除；或者直接点击【硬发】暴力单条推送。", 
-                                            type='negative', 
-                                            timeout=8000, 
-                                            multi_line=True
-                                        )
+                                    # [重构] 交给发件箱就返回，失败会自动重试，彻底失败会弹通知
+                                    enqueue_pack(selected)
+                                    session.mark_sending('media', [i.id for i in selected])
+                                    ui.notify(f"{len(selected)} 份媒体已打包进发件箱", type='info')
                                 ui.button('打包', on_click=send_media_pack).props('color=blue icon=inventory_2 size=sm px-2').tooltip('整合为一条聊天记录发送')
-                                ui.button(icon='delete', on_click=lambda: delete_selected('media')).props('color=red outline size=sm px-2')
+                                ui.button(icon='delete', on_click=lambda: session.delete_selected('media')).props('color=red outline size=sm px-2')
 
                         # 中间滚动内容区
-                        with ui.scroll_area().classes('flex-grow w-full p-2'):
-                            review_container_left = ui.grid(columns=3).classes('w-full gap-2')
-                            refresh_review_panel()
+                        with ui.scroll_area(on_scroll=lambda e: session.on_grid_scroll('media', e)).classes('flex-grow w-full p-2'):
+                            media_container = ui.grid(columns=3).classes('w-full gap-2')
+                            session.grids['media'] = CardGrid(media_container, session.build_media_card, MEDIA_SELECTED_CLS, IDLE_CLS)
                             
-                        # 底部翻页栏
-                        with ui.row().classes('w-full p-1 justify-center border-t dark:border-gray-700 bg-gray-50 dark:bg-gray-900'):
-                            media_pagination = ui.pagination(1, 1).bind_value(state, 'media_page').props('dense color=blue size=sm active-color=blue-8')
-                            media_pagination.on_value_change(refresh_review_panel) # 点击立刻刷新
+                        # 底部翻页栏（滚动加载模式下隐藏）
+                        with ui.row().classes('w-full p-1 justify-center border-t dark:border-gray-700 bg-gray-50 dark:bg-gray-900') \
+                                .bind_visibility_from(session, 'virtual_scroll', backward=lambda v: not v):
+                            media_pagination = ui.pagination(1, 1).bind_value(session, 'media_page').props('dense color=blue size=sm active-color=blue-8')
+                            media_pagination.on_value_change(session.refresh_review_panel) # 点击立刻刷新
+                            session.paginations['media'] = media_pagination
 
                     # 模块 B：聊天记录源
                     with apply_card_theme(ui.card()).classes('flex-1 w-0 h-full flex flex-col p-0 overflow-hidden'):
@@ -430,31 +667,32 @@ def main_page():
                             with ui.row().classes('items-center gap-1 flex-nowrap whitespace-nowrap'):
                                 ui.icon('forum', size='sm').classes('text-purple-500')
                                 ui.label('外网情报').classes('font-bold dark:text-white text-sm')
-                                badge_forward = ui.badge('0').props('color=purple dense')
+                                session.badges['forward'] = ui.badge('0').props('color=purple dense')
                             
                             with ui.row().classes('gap-1 items-center flex-nowrap'):
-                                ui.button('本页', on_click=lambda: toggle_page_type('forward')).props('outline dense size=sm color=purple')
-                                ui.button('全部', on_click=lambda: toggle_all_type('forward')).props('flat dense size=sm')
+                                ui.button('本页', on_click=lambda: session.toggle_page_type('forward')).props('outline dense size=sm color=purple')
+                                ui.button('全部', on_click=lambda: session.toggle_all_type('forward')).props('flat dense size=sm')
                                 
-                                @with_lock
                                 async def send_forwards():
-                                    selected = [i for i in state.pending_list if i['selected'] and i['type'] == 'forward']
+                                    selected = session.selected_items('forward')
                                     if not selected: return
-                                    ui.notify(f"准备转发 {len(selected)} 条记录...", type='info')
-                                    for item in selected: await execute_single_forward(item['raw_msg_id'])
-                                    delete_selected('forward')
+                                    enqueue_forward(selected)
+                                    session.mark_sending('forward', [i.id for i in selected])
+                                    ui.notify(f"{len(selected)} 条记录已进发件箱", type='info')
                                 ui.button('转发', on_click=send_forwards).props('color=green icon=send size=sm px-2')
-                                ui.button(icon='delete', on_click=lambda: delete_selected('forward')).props('color=red outline size=sm px-2')
+                                ui.button(icon='delete', on_click=lambda: session.delete_selected('forward')).props('color=red outline size=sm px-2')
 
                         # 中间滚动内容区
-                        with ui.scroll_area().classes('flex-grow w-full p-2'):
-                            review_container_right = ui.column().classes('w-full gap-2')
-                            refresh_review_panel()
+                        with ui.scroll_area(on_scroll=lambda e: session.on_grid_scroll('forward', e)).classes('flex-grow w-full p-2'):
+                            forward_container = ui.column().classes('w-full gap-2')
+                            session.grids['forward'] = CardGrid(forward_container, session.build_forward_card, FORWARD_SELECTED_CLS, IDLE_CLS)
                             
-                        # 底部翻页栏
-                        with ui.row().classes('w-full p-1 justify-center border-t dark:border-gray-700 bg-gray-50 dark:bg-gray-900'):
-                            forward_pagination = ui.pagination(1, 1).bind_value(state, 'forward_page').props('dense color=purple size=sm active-color=purple-8')
-                            forward_pagination.on_value_change(refresh_review_panel) # 点击立刻刷新
+                        # 底部翻页栏（滚动加载模式下隐藏）
+                        with ui.row().classes('w-full p-1 justify-center border-t dark:border-gray-700 bg-gray-50 dark:bg-gray-900') \
+                                .bind_visibility_from(session, 'virtual_scroll', backward=lambda v: not v):
+                            forward_pagination = ui.pagination(1, 1).bind_value(session, 'forward_page').props('dense color=purple size=sm active-color=purple-8')
+                            forward_pagination.on_value_change(session.refresh_review_panel) # 点击立刻刷新
+                            session.paginations['forward'] = forward_pagination
 
                 # 控制台输出日志
                 log_card = apply_card_theme(ui.card())
@@ -462,37 +700,11 @@ def main_page():
                 with log_card:
                     with ui.row().classes('w-full justify-between items-center mb-1'):
                         ui.label('Console').classes('text-xs font-bold opacity-60 dark:text-gray-400')
-                        ui.button('Clean', on_click=lambda: log_view.clear()).props('flat dense size=xs opacity=50 color=grey')
-                    log_view = ui.log(max_lines=100).classes('w-full h-full font-mono text-[10px] bg-transparent dark:text-gray-300 leading-tight')
-                    
-                    def on_log_msg(msg):
-                        try: log_view.push(msg)
-                        except: pass
-                    if on_log_msg not in log_subscribers:
-                        log_subscribers.append(on_log_msg)
-
-# 简易轮询机制刷UI
-    def auto_refresh():
-        try:
-            while state.notify_queue:
-                msg_type, msg_text = state.notify_queue.pop(0)
-                ui.notify(msg_text, type=msg_type, position='top', timeout=5000)
-
-            if state.ui_needs_refresh:
-                refresh_review_panel()
-                if groups_s_refreshable: groups_s_refreshable.refresh()
-                if groups_t_refreshable: groups_t_refreshable.refresh()
-                if reviewer_panel_refreshable: reviewer_panel_refreshable.refresh()
-                state.ui_needs_refresh = False
-        except RuntimeError as e:
-            if 'deleted' in str(e):
-                pass 
-            else:
-                raise e
-            
-    ui.timer(1.0, auto_refresh)
-
-
-
-
-
+                        ui.button('Clean', on_click=lambda: session.log_view.clear()).props('flat dense size=xs opacity=50 color=grey')
+                    session.log_view = ui.log(max_lines=100).classes('w-full h-full font-mono text-[10px] bg-transparent dark:text-gray-300 leading-tight')
+                    # [新增] 新打开的页面先回填最近的日志
+                    for line in logger.recent(100): session.log_view.push(line)
+
+    session.refresh_review_panel()
+    # [重构] 事件驱动刷新：每个页面一条有界队列，有事件立刻处理，闲着不耗资源；页面断开时事件和日志订阅一起注销
+    session.start()